@@ -1,28 +1,12 @@
-import random
+"""
+Ecosystem phase functions (the list-based reference engine) and the command line entry point.
+
+The functions here are pure: they take the grid, rabbits and RNG explicitly. The run loop and stats
+live in simulation.Simulation; this module only wires the CLI to it.
+"""
+
 import config
-import tui
-
-# Ecosystem variables
-args = config.get_args()
-grid_width = args.width
-grid_height = args.height
-tile_capacity = args.capacity
-total_ticks = args.ticks
-render_every = args.render_every
-seed = args.seed
-regrow_rate = args.regrow
-
-# Rabbit's args
-initial_rabbits = args.rabbits
-starting_energy = args.energy_start
-move_cost = args.move_cost
-idle_cost = args.idle_cost
-eating_gains = args.eat_gain
-reproduction_threshold = args.repro_threshold
-reproduction_cost = args.repro_cost
-initial_energy = reproduction_cost if args.infant_energy is None else args.infant_energy
-
-RNG = random.Random(seed)
+from topology import get as get_topology
 
 
 def init_grid(width, height, cell_cap) -> list[list[list[int, int]]]:
@@ -45,10 +29,13 @@ def place_rabbits(grid, n, rng, energy) -> list[list[int, int, int]]:
     :param energy: initial energy of all rabbits
     :return: list rabbits with their spawning coordinates and initial energy
     """
-    cells = [[x, y, energy] for y in range(len(grid)) for x in range(len(grid[0]))]
-    rabbits = rng.sample(cells, n)
-    for rabbit in rabbits:
-        grid[rabbit[1]][rabbit[0]][1] -= 1
+    width = len(grid[0])
+    rabbits = []
+    # sampling flat cell indices draws exactly what sampling a list of every cell would, without building it
+    for cell in rng.sample(range(width * len(grid)), n):
+        y, x = divmod(cell, width)
+        rabbits.append([x, y, energy])
+        grid[y][x][1] -= 1
     return rabbits
 
 
@@ -66,68 +53,71 @@ def grass_count(grid) -> int:
     return grasses
 
 
-def decide_moves(width, height, rabbits, rng) -> list:
+def decide_moves(width, height, rabbits, rng, topology=None) -> list:
     """
-    For each rabbit, propose target by adding one of [(1,0),(-1,0),(0,1),(0,-1)]. If target is OOB(Out of Bounds), use current pos (stay).
+    For each rabbit, propose the target one step in a random direction of [(1,0),(-1,0),(0,1),(0,-1)] leads to.
+    Off the edge, the topology decides: stay (bounded), wrap (torus) or bounce back (reflect).
     :param rabbits: list of rabbit coordinates
     :param width: width of grid
     :param height: height of grid
     :param rng: RNG for random movements
+    :param topology: topology.Topology of the world (default: bounded)
     :return decisions: list of targeted coordinates for rabbits to move/stay
     """
+    steps = (topology or get_topology(width, height)).steps
+    choice = rng.choice
     decisions = []
 
     for rabbit in rabbits:
-        direction_to_move = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
-        potential_tile = [rabbit[0] + direction_to_move[0], rabbit[1] + direction_to_move[1]]
-
-        # check if new position is within grid bounds
-        if 0 <= potential_tile[0] < width and 0 <= potential_tile[1] < height:
-            decisions.append([potential_tile[0], potential_tile[1]])
-        else:  # if not then remain in same position
-            decisions.append(rabbit[0:2])
+        to_x, to_y = choice(steps)  # step tables of a random direction
+        decisions.append([to_x[rabbit[0]], to_y[rabbit[1]]])
 
     return decisions
 
 
 def resolve_moves_lottery(rabbits, proposals, tile_cap, rng):
     """
-
+    Resolve movement conflicts with one lottery per contested target tile.
+    Proposals are bucketed by target tile in a single pass, so the whole phase is linear in the population.
+    Tiles are settled in the order their first proposal appears, which keeps seeded runs reproducible.
     :param rabbits: list of rabbits
     :param proposals: list of targeted positions proposed by rabbits to move
     :param tile_cap: entity capacity for a tile
     :param rng: RNG randomness generator
     :return final_moves: list of final moves for all rabbits
     """
-    target_dictionary = {}
     rabbit_positions = [[x, y] for x, y, _ in rabbits]
     final_moves = rabbit_positions.copy()
 
-    for i in range(len(proposals)):
-        target_dictionary[i] = proposals[i]
-    target_dictionary_copy = target_dictionary.copy()
+    # count the rabbits already standing on each tile before anybody moves
+    occupants = {}
+    for x, y, _ in rabbits:
+        occupants[(x, y)] = occupants.get((x, y), 0) + 1
+
+    # bucket the rabbit indices by the tile they want to move to (dicts keep first-seen order)
+    applicants_by_tile = {}
+    for index, value in enumerate(proposals):
+        key = (value[0], value[1])
+        if key in applicants_by_tile:
+            applicants_by_tile[key].append(index)
+        else:
+            applicants_by_tile[key] = [index]
 
-    for key, value in target_dictionary.items():
-        if key not in target_dictionary_copy:
+    for key, lottery_appliers in applicants_by_tile.items():
+        same_rabbit_pos = occupants.get(key, 0)
+        if same_rabbit_pos >= tile_cap:  # target tile is already maxed out, everybody stays
             continue
-        same_rabbit_pos = rabbit_positions.count(value)
-        if same_rabbit_pos >= tile_cap:  # check if target value is already max out in original list
-            final_moves[key] = rabbit_positions[key]
-        elif proposals.count(value) - same_rabbit_pos > tile_cap - same_rabbit_pos:  # Get the position lottery winners
-            lottery_appliers = [k for k, v in target_dictionary_copy.items() if v == value]
+        if len(lottery_appliers) > tile_cap:  # Get the position lottery winners
             lottery_winners = rng.sample(lottery_appliers, tile_cap - same_rabbit_pos)
-            for i in lottery_appliers:
-                target_dictionary_copy.pop(i)
-                if i in lottery_winners:
-                    final_moves[i] = value
-                else:
-                    final_moves[i] = rabbit_positions[i]
+            for i in lottery_winners:
+                final_moves[i] = proposals[i]
         else:
-            final_moves[key] = value
+            for i in lottery_appliers:
+                final_moves[i] = proposals[i]
     return final_moves
 
 
-def apply_moves(grid, rabbits, targets, move_cst, idle_cst) -> None:
+def apply_moves(grid, rabbits, targets, move_cst, idle_cst, stats=None) -> None:
     """
     Overwrite each rabbit’s position with its target.
     :param grid: simulation grid
@@ -135,11 +125,17 @@ def apply_moves(grid, rabbits, targets, move_cst, idle_cst) -> None:
     :param targets: list of target positions
     :param move_cst: cost of energy to potentially move rabbit
     :param idle_cst: cost of energy to potentially stay idle
+    :param stats: optional stats.StreamingStats to report the energy changes to
     :return: None
     """
+    # energies after paying, of the rabbits whose energy changed, when reporting to stats
+    idled = [] if stats is not None and idle_cst else None
+    moved = [] if stats is not None and move_cst else None
     for index in range(len(rabbits)):
         if rabbits[index][0:2] == targets[index]:  # Rabbit is staying idle on his tile
             rabbits[index][2] -= idle_cst
+            if idled is not None:
+                idled.append(rabbits[index][2])
         else:  # Rabbit has a new target position to move
             # Add empty space to the tile the rabbit is about to leave. It should not exceed the total tile capacity.
             grid[rabbits[index][1]][rabbits[index][0]][1] += 1
@@ -147,44 +143,78 @@ def apply_moves(grid, rabbits, targets, move_cst, idle_cst) -> None:
             rabbits[index] = [targets[index][0], targets[index][1], rabbits[index][2] - move_cst]
             # Reduce the new tile's entity cap
             grid[rabbits[index][1]][rabbits[index][0]][1] -= 1
+            if moved is not None:
+                moved.append(rabbits[index][2])
+    if idled:
+        stats.shift(idled, -idle_cst)
+    if moved:
+        stats.shift(moved, -move_cst)
 
 
-def eat_cells(grid, rabbits, regrow, energy_gain) -> list[list[int, int]]:
+def eat_cells(grid, rabbits, regrow, energy_gain, stats=None) -> list[list[int, int]]:
     """
     Eats up a cell's grass for all the rabbits and sets the regrow timer for the grass on the cell.
     :param grid: simulation grid
     :param rabbits: list of rabbit's positions
     :param regrow: growth time to be set on eaten tiles
     :param energy_gain: energy to gain after eating grass
+    :param stats: optional stats.StreamingStats to report the energy changes to
     :return: set of tuples of coordinates that have been eaten recently
     """
     newly_eaten = []
+    fed = []  # energies of the rabbits that ate, when reporting to stats
     for index in range(len(rabbits)):
         if grid[rabbits[index][1]][rabbits[index][0]][0] == 0:
             grid[rabbits[index][1]][rabbits[index][0]][0] = regrow  # Set new timer for grass to grow again
             rabbits[index][2] += energy_gain  # Give energy gains to rabbits who have eaten grass
             newly_eaten.append(rabbits[index][0:2])  # Save the newly eaten position on grid for later use
+            if stats is not None:
+                fed.append(rabbits[index][2])
+    if stats is not None:
+        stats.shift(fed, energy_gain)
     return newly_eaten
 
 
-def regrow_step(grid, width, height, newly_eaten) -> None:
+def regrow_step(grid, width, height, newly_eaten) -> int:
     """
     Decrements the timer of every tile on grid by 1, clamped to 0.
+    Grass is counted in the same pass, so callers don't need a second grass_count scan.
     :param grid: simulation grid.
     :param width: width of grid
     :param height: height of grid
     :param newly_eaten: List of tiles to skip the growth.
-    :return: None
+    :return: number of grassy cells after regrowth
     """
+    grasses = 0
     for i in range(height):
         for j in range(width):
-            if [j, i] in newly_eaten:
-                continue  # don't decrement the cell we just set to G this tick
-            if grid[i][j][0] > 0:
-                grid[i][j][0] -= 1
+            cell = grid[i][j]
+            # don't decrement the cell we just set to G this tick
+            if cell[0] > 0 and [j, i] not in newly_eaten:
+                cell[0] -= 1
+            if cell[0] == 0:
+                grasses += 1
+    return grasses
 
 
-def reproduce(grid, rabbits, rng, width, height, threshold, cost, spawn_energy) -> list:
+def fast_forward_timers(grid, ticks) -> dict[int, int]:
+    """
+    Counts every timer down by `ticks` regrow steps at once, as `ticks` calls of regrow_step with nothing eaten would.
+    :param grid: simulation grid
+    :param ticks: number of regrow steps to skip
+    :return: histogram {timer: number of tiles} of the non-zero timers before the jump
+    """
+    timers = {}
+    for row in grid:
+        for cell in row:
+            timer = cell[0]
+            if timer > 0:
+                timers[timer] = timers.get(timer, 0) + 1
+                cell[0] = max(timer - ticks, 0)
+    return timers
+
+
+def reproduce(grid, rabbits, rng, width, height, threshold, cost, spawn_energy, topology=None, stats=None) -> list:
     """
     takes all rabbits and makes it reproduce by cutting some energy and spawning a new rabbit in grid near parent of the rabbit has the reproduction threshold
     :param grid: simulation grid
@@ -195,142 +225,334 @@ def reproduce(grid, rabbits, rng, width, height, threshold, cost, spawn_energy)
     :param threshold: reproduction threshold
     :param cost: reproduction cost of parent
     :param spawn_energy: initial energy of the spawned infant
+    :param topology: topology.Topology of the world (default: bounded)
+    :param stats: optional stats.StreamingStats to report the energy changes to
     :return newly_born: list of newly born rabbits
     """
-    spawnable_directions = [[1, 0], [-1, 0], [0, 1], [0, -1]]
+    steps = (topology or get_topology(width, height)).steps
     newly_born = []
+    paid = []  # energies of the parents after paying, when reporting to stats
 
-    for index in range(len(rabbits)):
-        if rabbits[index][2] >= threshold:
-            rabbits[index][2] -= cost  # drain energy if either it successfully gives birth or fails
-            directions = rng.sample(spawnable_directions, 4)
-            for direction in directions:  # goes through all direction for spawnable conditions
-                potential_tile = [rabbits[index][0] + direction[0], rabbits[index][1] + direction[1]]
-
-                # Only spawn child if the potential tile is within grid bounds and the tile has space for entity
-                if 0 <= potential_tile[0] < width and 0 <= potential_tile[1] < height and \
-                        grid[potential_tile[1]][potential_tile[0]][1] > 0:
-                    spawned_infant = [potential_tile[0], potential_tile[1],
-                                      spawn_energy]  # spawn one if a direction is valid for spawning
-                    grid[potential_tile[1]][potential_tile[0]][1] -= 1  # consume 1 free slot
-                    newly_born.append(spawned_infant)
+    for rabbit in rabbits:
+        if rabbit[2] >= threshold:
+            rabbit[2] -= cost  # drain energy if either it successfully gives birth or fails
+            if stats is not None:
+                paid.append(rabbit[2])
+            x, y = rabbit[0], rabbit[1]
+            for to_x, to_y in rng.sample(steps, 4):  # goes through all direction for spawnable conditions
+                nx, ny = to_x[x], to_y[y]
+
+                # Only spawn child if the step leads to another tile (not off the edge) and it has space for entity
+                if (nx != x or ny != y) and grid[ny][nx][1] > 0:
+                    grid[ny][nx][1] -= 1  # consume 1 free slot
+                    newly_born.append([nx, ny, spawn_energy])  # spawn one if a direction is valid for spawning
                     break
             else:  # If no adjacent tile is possible to spawn then spawn it on parent's tile if there is space for entity
-                if grid[rabbits[index][1]][rabbits[index][0]][1] > 0:
-                    spawned_infant = (rabbits[index][0], rabbits[index][1],
-                                      spawn_energy)  # spawn infant at parent's position if no direction is spawnable
-                    grid[rabbits[index][1]][rabbits[index][0]][1] -= 1  # consume 1 free slot
-                    newly_born.append(spawned_infant)
-
+                if grid[y][x][1] > 0:
+                    grid[y][x][1] -= 1  # consume 1 free slot
+                    # spawn infant at parent's position; a list like every other rabbit, since apply_moves assigns
+                    # into an idle rabbit and compares a loser's list position against it
+                    newly_born.append([x, y, spawn_energy])
+
+    if stats is not None:
+        stats.shift(paid, -cost)
+        stats.add_repeated(spawn_energy, len(newly_born))
     return newly_born
 
 
-def remove_dead_bodies(grid, rabbits) -> None:
+def remove_dead_bodies(grid, rabbits, stats=None) -> None:
     """
     Remove rabbits from grid whose energy levels have reached 0 and so are dead.
     :param grid: simulation grid
     :param rabbits: List of rabbits.
+    :param stats: optional stats.StreamingStats to report the energy changes to
     :return: None
     """
+    dead = []
     for i in range(len(rabbits)):
         if rabbits[i][2] <= 0:
             grid[rabbits[i][1]][rabbits[i][0]][1] += 1
+            dead.append(rabbits[i][2])
+    if stats is not None and dead:
+        stats.remove(dead)
     rabbits[:] = [r for r in rabbits if r[2] > 0]
 
 
 # Simulation start here
-def run_headless():
+def run_headless(sim, render_every, checkpoint_path=None, checkpoint_every=1000, sink=None, recorder=None,
+                 series=None, publisher=None) -> None:
     """
     Main simulation displayed as reports-only in output.
+    :param sim: Simulation to run to completion
+    :param render_every: emit one status record every K ticks; nothing is computed for the ticks in between
+    :param checkpoint_path: optional file to write periodic binary checkpoints to
+    :param checkpoint_every: ticks between checkpoints
+    :param sink: telemetry.TelemetrySink for the status records (default: text lines on stdout)
+    :param recorder: optional replay.Recorder that captures every tick
+    :param series: optional list that gets the (tick, rabbits, grass) of every simulated tick, for the result cache
+    :param publisher: optional shm.ShmPublisher that gets the world for --attach viewers as often as it can afford
+    :return: None
+    """
+    import telemetry
+
+    total_cells = sim.total_cells
+    if sink is None:
+        sink = telemetry.TelemetrySink()
+    if checkpoint_path is not None:
+        import checkpoint
+
+    def report(sim_state, g):
+        if recorder is not None:
+            recorder.capture(sim_state)
+        tick = sim_state.tick - 1
+        if series is not None:
+            series.append((tick, sim_state.population, g))
+        if tick % render_every == 0:  # Emit status of simulation every render_every ticks
+            sink.write(tick, sim_state.population, g, total_cells)
+        if checkpoint_path is not None and sim_state.tick % checkpoint_every == 0:
+            checkpoint.save(sim_state, checkpoint_path)
+        if publisher is not None:
+            publisher.maybe_publish(sim_state)
+
+    with sink:
+        sim.run(on_tick=report)
+        if sim.extinct_at is not None and (sim.tick - 1) % render_every == 0:
+            sink.write(sim.tick - 1, sim.population, sim.grass, total_cells)  # the tick the run jumped to
+    if publisher is not None:
+        publisher.publish(sim, done=True)
+    if checkpoint_path is not None:
+        checkpoint.save(sim, checkpoint_path)
+
+    print_summary(sim.summary(), sim.extinct_at, sim.params.stop_rule)
+    print_profile(sim)
+    print_stats(sim)
+
+
+def report_cached(entry, total_cells, render_every, stop_rule, sink=None) -> None:
+    """
+    Emit the status records and summary of a run from its result cache entry, exactly as run_headless did
+    when it simulated the run.
+    :param entry: cache entry holding the per-tick series (see cache.ResultCache.get)
+    :param total_cells: number of cells in the grid
+    :param render_every: emit one status record every K ticks
+    :param stop_rule: stop rule of the run
+    :param sink: telemetry.TelemetrySink for the status records (default: text lines on stdout)
+    :return: None
+    """
+    import telemetry
+
+    if sink is None:
+        sink = telemetry.TelemetrySink()
+    summary = entry["summary"]
+    with sink:
+        for tick, rabbits, grass in entry["series"]:
+            if tick % render_every == 0:
+                sink.write(tick, rabbits, grass, total_cells)
+        if entry["extinct_at"] is not None and (summary["ticks"] - 1) % render_every == 0:
+            sink.write(summary["ticks"] - 1, summary["rabbits"], entry["grass"], total_cells)
+    print_summary(summary, entry["extinct_at"], stop_rule)
+
+
+def print_summary(summary, extinct_at, stop_rule) -> None:
+    """
+    Post-simulation summary lines.
+    :param summary: Simulation.summary() of the finished run
+    :param extinct_at: tick the run was fast-forwarded from after extinction, or None
+    :param stop_rule: stop rule of the run
     :return: None
     """
-    render_counter = 0
-    sim_ticks = 0
-    sum_coverage = 0.0
-    min_cov = 1.0
-    max_cov = 0.0
-    total_cells = grid_width * grid_height
-    grid = init_grid(grid_width, grid_height, tile_capacity)
-    list_of_rabbits = place_rabbits(grid, initial_rabbits, RNG, starting_energy)
-
-    while sim_ticks < total_ticks:
-
-        # Make every rabbit move in a random possible direction
-        next_moves_proposal = decide_moves(grid_width, grid_height, list_of_rabbits, RNG)
-        next_final_moves = resolve_moves_lottery(list_of_rabbits, next_moves_proposal, tile_capacity, RNG)
-        apply_moves(grid, list_of_rabbits, next_final_moves, move_cost, idle_cost)
-
-        # after movement, rabbits can eat grass
-        recently_eaten = eat_cells(grid, list_of_rabbits, regrow_rate, eating_gains)
-        regrow_step(grid, grid_width, grid_height, recently_eaten)
-
-        # Rabbits can now reproduce if they meet the energy requirement
-        new_born = reproduce(grid, list_of_rabbits, RNG, grid_width, grid_height, reproduction_threshold,
-                             reproduction_cost,
-                             initial_energy)
-        list_of_rabbits += new_born
-
-        # clear any dead rabbits whose energy level reaches 0
-        remove_dead_bodies(grid, list_of_rabbits)
-
-        # Print status of simulation whenever render_counter hits 0.
-        g = grass_count(grid)
-        cov = g / total_cells
-        sum_coverage += g / total_cells
-        min_cov = min(min_cov, cov)
-        max_cov = max(max_cov, cov)
-        if render_counter == 0:
-            print(
-                f"tick={sim_ticks} rabbits={len(list_of_rabbits)} grass={g}/{grid_width * grid_height} coverage={(cov * 100):.1f}%")
-            render_counter = render_every
-
-        # Update tick and render counter
-        sim_ticks += 1
-        render_counter -= 1
-        # time.sleep(1 / 20)
-
-    # Post-simulation summary
+    total_ticks = summary["ticks"]
+    if extinct_at is not None:
+        print(f"extinct: ticks {extinct_at}-{total_ticks - 1} fast-forwarded with no rabbits left")
+    settled_at = summary.get("settled_at")
+    if settled_at is not None:
+        print(f"settled: {stop_rule} at tick {settled_at - 1}, coverage extrapolated over ticks {settled_at}-{total_ticks - 1}")
     print(
-        f"done: ticks={total_ticks} average_grass_coverage = {((sum_coverage / total_ticks) * 100):.1f}% min = {(min_cov * 100):.1f}% max = {(max_cov * 100):.1f}%")
+        f"done: ticks={total_ticks} average_grass_coverage = {(summary['avg_coverage'] * 100):.1f}% min = {(summary['min_coverage'] * 100):.1f}% max = {(summary['max_coverage'] * 100):.1f}%")
+
 
+def print_profile(sim) -> None:
+    """
+    Print the per-phase profile after the summary, if the run was profiled.
+    :param sim: finished Simulation
+    :return: None
+    """
+    if sim.profiler is not None:
+        print(f"profile: {sim.profiler.ticks} ticks, {sim.profiler.total_secs():.3f}s in phases")
+        for line in sim.profiler.report_lines():
+            print(f"  {line}")
 
-def run_curses():
-    grid = init_grid(grid_width, grid_height, tile_capacity)
-    rabbits = place_rabbits(grid, initial_rabbits, RNG, starting_energy)
-    sim_ticks = 0
-    sum_coverage = 0.0
-    min_cov = 1.0
-    max_cov = 0.0
-    total_cells = grid_width * grid_height
+
+def print_stats(sim) -> None:
+    """
+    Print the energy statistics and the population / coverage sparklines after the summary, if the run kept them.
+    :param sim: finished Simulation
+    :return: None
+    """
+    if sim.stats is None:
+        return
+    from stats import sparkline
+    s = sim.stats.summary()
+    print(f"energy: rabbits={s.count} mean={s.mean:.2f} sd={s.sd:.2f} min={s.min} p10={s.p10} p50={s.p50} "
+          f"p90={s.p90} max={s.max}")
+    if s.population:
+        print(f"history: last {len(s.population)} ticks")
+        print(f"  population {sparkline(s.population)} {min(s.population)}..{max(s.population)}")
+        print(f"  coverage   {sparkline(s.coverage)} {min(s.coverage) * 100:.1f}%..{max(s.coverage) * 100:.1f}%")
+
+
+def run_curses(sim, args, recorder=None) -> None:
+    """
+    Run the simulation inside the curses UI, then print the coverage summary.
+    :param sim: Simulation to drive from the UI loop
+    :param args: parsed args (fps, tps, render_every, ...)
+    :param recorder: optional replay.Recorder that captures every tick
+    :return: None
+    """
+    import tui  # curses is only needed for the interactive UI
+    from stats import StreamingStats
+
+    if sim.stats is None:  # the side panel reads the streaming stats instead of scanning the rabbits
+        sim.stats = StreamingStats(sim.rabbits, args.history)
 
     def step_fn():
-        nonlocal sim_ticks, sum_coverage, min_cov, max_cov, grid, rabbits
-        if sim_ticks < total_ticks:
-            next_moves_proposal = decide_moves(grid_width, grid_height, rabbits, RNG)
-            next_final_moves = resolve_moves_lottery(rabbits, next_moves_proposal, tile_capacity, RNG)
-            apply_moves(grid, rabbits, next_final_moves, move_cost, idle_cost)
-            newly = eat_cells(grid, rabbits, regrow_rate, eating_gains)
-            regrow_step(grid, grid_width, grid_height, newly)
-            new_born = reproduce(grid, rabbits, RNG, grid_width, grid_height, reproduction_threshold, reproduction_cost,
-                                 initial_energy)
-            rabbits += new_born
-            remove_dead_bodies(grid, rabbits)
-
-            g = grass_count(grid)
-            cov = g / total_cells
-            sum_coverage += cov
-            if cov < min_cov: min_cov = cov
-            if cov > max_cov: max_cov = cov
-            sim_ticks += 1
-        return sim_ticks, grid, rabbits
-
-    tui.run_curses_loop(args, step_fn, init_state=(grid, rabbits))
+        if not sim.done:
+            sim.step()
+            if recorder is not None:
+                recorder.capture(sim)
+        return sim.tick, sim.grid, sim.rabbits
+
+    tui.run_curses_loop(args, step_fn, init_state=(sim.tick, sim.grid, sim.rabbits),
+                        grass_fn=lambda _grid: sim.grass_count(), profiler=sim.profiler, stats_fn=sim.stats.summary,
+                        ticks=sim.params.ticks)  # stop when sim.done, whatever args say
     # After curses exits, print the same summary as headless
+    total_ticks = sim.params.ticks
     print(
-        f"done: ticks={total_ticks} avg={sum_coverage / total_ticks * 100:.1f}% min={(min_cov * 100):.1f}% max={(max_cov * 100):.1f}%")
+        f"done: ticks={total_ticks} avg={sim.sum_coverage / total_ticks * 100:.1f}% min={(sim.min_cov * 100):.1f}% max={(sim.max_cov * 100):.1f}%")
+    print_profile(sim)
+    if args.energy_stats:
+        print_stats(sim)
+
 
+def run_server(sim, args) -> None:
+    """
+    Run the simulation as a streaming server (see server.py), then print the coverage summary.
+    :param sim: Simulation to run
+    :param args: parsed args (serve, serve_queue, tps, history, ...)
+    :return: None
+    """
+    import server
 
-if args.ui == "curses":
-    run_curses()
-else:
-    run_headless()
+    host, port = args.serve
+    srv = server.StreamServer(sim, host, port, args.tps, args.serve_queue, args.history)
+    srv.serve(on_listen=lambda address: print(f"serving on {address[0]}:{address[1]}", flush=True))
+    print(f"served: {srv.served} viewers, {srv.coalesced} ticks coalesced for slow viewers")
+    print_summary(sim.summary(), sim.extinct_at, sim.params.stop_rule)
+    print_profile(sim)
+    if args.energy_stats:
+        print_stats(sim)
+
+
+def main(argv=None) -> None:
+    """
+    Command line entry point.
+    :param argv: list of arguments, defaults to sys.argv[1:]
+    :return: None
+    """
+    from simulation import SimParams, Simulation  # simulation imports this module for the phase functions
+
+    args = config.get_args(argv)
+    if args.replay is not None:
+        import replay
+        import tui
+        log = replay.Replay(args.replay)
+        args.width, args.height, args.capacity, args.ticks = log.width, log.height, log.capacity, log.last_tick
+        tui.run_curses_loop(args, None, None, replay=log)
+        log.close()
+        return
+    if args.connect is not None:
+        import server
+        import tui
+        client = server.StreamClient(*args.connect, history=args.history)
+        args.width, args.height, args.capacity, args.ticks = client.width, client.height, client.capacity, client.last_tick
+        tui.run_remote(args, client)
+        return
+    if args.attach is not None:
+        import shm
+        import tui
+        reader = shm.ShmReader(args.attach)
+        args.width, args.height, args.capacity, args.ticks = reader.width, reader.height, reader.capacity, reader.last_tick
+        tui.run_curses_loop(args, None, None, shm=reader)
+        reader.close()
+        return
+    if args.cache is not None:
+        import cache
+        import telemetry
+        params = SimParams.from_args(args)
+        results = cache.ResultCache(args.cache, int(args.cache_max_mb * 1024 * 1024))
+        sink = telemetry.TelemetrySink(args.stats_out, args.stats_format, args.stats_batch, args.stats_flush_secs)
+        entry = results.get(params, series=True)
+        if entry is not None:
+            report_cached(entry, params.width * params.height, args.render_every, params.stop_rule, sink)
+            return
+        sim = Simulation(params)
+        series = []
+        run_headless(sim, args.render_every, sink=sink, series=series)
+        results.put(params, sim, series)
+        return
+    if args.replicas:
+        import ensemble
+        import telemetry
+        sink = telemetry.TelemetrySink(args.stats_out, args.stats_format, args.stats_batch, args.stats_flush_secs,
+                                       replicas=True)
+        ensemble.run_ensemble(ensemble.Ensemble(SimParams.from_args(args), args.replicas), args.render_every, sink)
+        return
+    if args.resume is not None:
+        import checkpoint
+        sim = checkpoint.load(args.resume)
+        p = sim.params  # the UI sizes the world and counts ticks from args, as for --replay
+        args.width, args.height, args.capacity, args.ticks = p.width, p.height, p.capacity, p.ticks
+    elif args.shards:
+        from sharded import ShardedSimulation
+        sim = ShardedSimulation(SimParams.from_args(args), args.shards)
+    else:
+        sim = Simulation(SimParams.from_args(args))
+    try:  # the shard workers are stopped whatever happens
+        if args.profile:
+            from profiler import PhaseProfiler
+            sim.profiler = PhaseProfiler()
+        if args.energy_stats:
+            from stats import StreamingStats
+            sim.stats = StreamingStats(sim.rabbits, args.history)
+        recorder = None
+        if args.record is not None:
+            import replay
+            recorder = replay.Recorder(sim, args.record, args.record_keyframe_every)
+            sim.skip_extinct = False  # the log shows the grass regrowing after the last rabbit died
+        if args.serve is not None:
+            run_server(sim, args)
+        elif args.ui == "curses":
+            run_curses(sim, args, recorder)
+        else:
+            import telemetry
+            sink = telemetry.TelemetrySink(args.stats_out, args.stats_format, args.stats_batch, args.stats_flush_secs)
+            publisher = None
+            if args.shm is not None:
+                import shm
+                publisher = shm.ShmPublisher(sim, args.shm, args.shm_interval)
+                print(f"publishing to shared memory {publisher.name}", flush=True)
+            try:
+                run_headless(sim, args.render_every, args.checkpoint, args.checkpoint_every, sink, recorder,
+                             publisher=publisher)
+            finally:
+                if publisher is not None:
+                    publisher.close()
+        if recorder is not None:
+            recorder.close()
+    finally:
+        if args.shards:
+            sim.close()
+
+
+if __name__ == "__main__":
+    main()
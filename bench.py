@@ -0,0 +1,228 @@
+# bench.py
+"""
+Tick-throughput benchmark suite.
+
+Runs every combination of grid size, initial population and tile capacity with a fixed seed, timing
+each phase of the tick pipeline, and records ticks/sec, per-phase seconds and peak traced memory:
+
+    python bench.py --out bench.json
+    python bench.py --store table --regrow-mode wheel --compare bench.json
+
+With --compare, cases slower (or hungrier) than the baseline by more than --tolerance are flagged and
+the exit status is 1, so engine changes can be judged on numbers.
+"""
+import argparse
+import itertools
+import json
+import platform
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from time import perf_counter
+
+from simulation import PHASES, SimParams, Simulation
+
+
+def parse_sizes(text) -> list[tuple]:
+    """
+    Parse '64x64,256x128' into [(64, 64), (256, 128)].
+    """
+    sizes = []
+    for item in text.split(","):
+        width, _, height = item.lower().partition("x")
+        sizes.append((int(width), int(height or width)))
+    return sizes
+
+
+def parse_ints(text) -> list[int]:
+    """
+    Parse '1,2,4' into [1, 2, 4].
+    """
+    return [int(item) for item in text.split(",")]
+
+
+def case_key(params) -> str:
+    """
+    Stable name of a matrix cell, used to match results against a baseline. The engine settings are left
+    out on purpose so a baseline from one engine can be compared against another.
+    """
+    return f"{params.width}x{params.height} rabbits={params.rabbits} cap={params.capacity}"
+
+
+def engine_key(params) -> str:
+    """
+    Engine settings a result was measured with.
+    """
+    return f"{params.engine}/{params.store}/{params.regrow_mode}/{params.rng}"
+
+
+def time_case(params) -> dict:
+    """
+    Run one case with every phase timed separately.
+    :param params: SimParams of the case (ticks = number of ticks to time)
+    :return: dict with ticks/sec, total and per-phase seconds and the final population
+    """
+    sim = Simulation(params)
+    phase_secs = dict.fromkeys(PHASES, 0.0)
+    phases = sim.phases()
+    start = perf_counter()
+    while not sim.done:
+        for name, run_phase in phases:
+            t0 = perf_counter()
+            run_phase()
+            phase_secs[name] += perf_counter() - t0
+        sim.finish_tick()
+    total = perf_counter() - start
+    return {
+        "ticks_per_sec": sim.tick / total if total > 0 else float("inf"),
+        "total_secs": total,
+        "phase_secs": phase_secs,
+        "final_rabbits": len(sim.rabbits),
+    }
+
+
+def measure_memory(params, ticks) -> int:
+    """
+    Peak memory traced while building the world and running a few ticks (run separately, since tracing
+    slows everything down and would skew the timings).
+    :param params: SimParams of the case
+    :param ticks: number of ticks to trace
+    :return: peak traced bytes
+    """
+    tracemalloc.start()
+    try:
+        sim = Simulation(params)
+        sim.run(ticks)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_suite(sizes, populations, capacities, ticks, seed, memory_ticks, engine_settings, log=None) -> list[dict]:
+    """
+    Benchmark the full matrix of cases.
+    :param sizes: list of (width, height)
+    :param populations: list of initial rabbit counts (skipped when larger than the grid)
+    :param capacities: list of tile capacities
+    :param ticks: ticks timed per case
+    :param seed: RNG seed shared by every case
+    :param memory_ticks: ticks traced for peak memory, 0 to skip the memory pass
+    :param engine_settings: dict of engine/store/regrow_mode/rng
+    :param log: optional callback log(line) for progress
+    :return: list of result dicts
+    """
+    results = []
+    for (width, height), rabbits, capacity in itertools.product(sizes, populations, capacities):
+        if rabbits > width * height:
+            continue
+        params = SimParams(width=width, height=height, rabbits=rabbits, capacity=capacity, ticks=ticks, seed=seed,
+                           **engine_settings)
+        result = {"case": case_key(params), "engine": engine_key(params), "params": vars(params).copy()}
+        result.update(time_case(params))
+        if memory_ticks:
+            result["peak_mem_bytes"] = measure_memory(params, memory_ticks)
+        results.append(result)
+        if log is not None:
+            log(format_result(result))
+    return results
+
+
+def format_result(result) -> str:
+    """
+    One progress line: throughput, the slowest phase and its share of the time, and peak memory.
+    """
+    slowest = max(result["phase_secs"], key=result["phase_secs"].get)
+    share = result["phase_secs"][slowest] / result["total_secs"] * 100 if result["total_secs"] else 0.0
+    mem = f" peak={result['peak_mem_bytes'] / 2 ** 20:.1f}MiB" if "peak_mem_bytes" in result else ""
+    return f"{result['engine']} {result['case']}: {result['ticks_per_sec']:.1f} ticks/s (slowest: {slowest} {share:.0f}%){mem}"
+
+
+def compare(results, baseline, tolerance) -> list[str]:
+    """
+    Find cases that regressed against a baseline run.
+    :param results: result dicts of this run
+    :param baseline: result dicts of the stored baseline
+    :param tolerance: allowed relative slowdown / memory growth, e.g. 0.1 for 10%
+    :return: list of regression descriptions (empty when nothing regressed)
+    """
+    base_by_case = {result["case"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        base = base_by_case.get(result["case"])
+        if base is None:
+            continue
+        if result["ticks_per_sec"] < base["ticks_per_sec"] * (1 - tolerance):
+            regressions.append(f"{result['case']}: {result['ticks_per_sec']:.1f} ticks/s ({result['engine']}) vs "
+                               f"baseline {base['ticks_per_sec']:.1f} ({base['engine']})")
+        if "peak_mem_bytes" in result and "peak_mem_bytes" in base and \
+                result["peak_mem_bytes"] > base["peak_mem_bytes"] * (1 + tolerance):
+            regressions.append(f"{result['case']}: peak memory {result['peak_mem_bytes']} bytes vs "
+                               f"baseline {base['peak_mem_bytes']}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark tick throughput across world sizes.")
+    parser.add_argument('--sizes', default='64x64,256x256', type=str, help="Grid sizes WxH (default: 64x64,256x256).")
+    parser.add_argument('--rabbits', default='256,4096', type=str, help="Initial populations (default: 256,4096).")
+    parser.add_argument('--capacities', default='1,4', type=str, help="Tile capacities (default: 1,4).")
+    parser.add_argument('--ticks', default=50, type=int, help="Ticks timed per case (default: 50).")
+    parser.add_argument('--seed', default=12345, type=int, help="Seed shared by every case (default: 12345).")
+    parser.add_argument('--memory-ticks', default=5, type=int,
+                        help="Ticks traced for peak memory, 0 to skip (default: 5).")
+    parser.add_argument('--engine', default='list', choices=['list', 'numpy', 'chunked'], type=str)
+    parser.add_argument('--store', default='list', choices=['list', 'table'], type=str)
+    parser.add_argument('--regrow-mode', default='scan', choices=['scan', 'wheel'], type=str)
+    parser.add_argument('--rng', default='shared', choices=['shared', 'keyed'], type=str)
+    parser.add_argument('--out', default=None, type=str, help="Write the results as JSON to this file.")
+    parser.add_argument('--compare', default=None, type=str, help="Baseline JSON to flag regressions against.")
+    parser.add_argument('--tolerance', default=0.10, type=float,
+                        help="Relative slowdown/memory growth allowed before flagging (default: 0.10).")
+    args = parser.parse_args(argv)
+    if args.ticks < 1:
+        parser.error("Ticks to benchmark cannot be less than 1.")
+    if args.memory_ticks < 0:
+        parser.error("Memory ticks cannot be negative.")
+    try:
+        sizes = parse_sizes(args.sizes)
+        populations = parse_ints(args.rabbits)
+        capacities = parse_ints(args.capacities)
+    except ValueError as e:
+        parser.error(f"Invalid benchmark matrix: {e}")
+
+    engine_settings = {"engine": args.engine, "store": args.store, "regrow_mode": args.regrow_mode, "rng": args.rng}
+    try:
+        results = run_suite(sizes, populations, capacities, args.ticks, args.seed, args.memory_ticks,
+                            engine_settings, log=print)
+    except ValueError as e:  # invalid case settings, e.g. a zero capacity
+        parser.error(str(e))
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "ticks": args.ticks,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.out is not None:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+# cache.py
+"""
+On-disk cache of finished runs, shared by the CLI (--cache) and sweep.py.
+
+An entry is addressed by the sha256 of the run's canonical settings plus simulation.ENGINE_VERSION. The grid
+engine, rabbit store and regrow mode are left out of the key: they give identical results for a seed, so a
+numpy run can answer a later list run. Unseeded runs are never cached. An entry holds the summary, the tick the
+run went extinct at, the final grass count and, when asked for, the per-tick (tick, rabbits, grass) series.
+
+Entries are JSON files in one directory. They are written to a temporary file and renamed into place, so a
+reader never sees half an entry and concurrent workers can share the directory; a hit refreshes the file's
+mtime, which is what least-recently-used eviction goes by. Every store adds its size to a running total kept in
+a small size file, under an exclusive lock file, so a store costs O(1) however many entries there are. The
+directory is only scanned once the total exceeds the size cap, when eviction deletes the least recently used
+entries down to EVICT_TO of the cap, and every RESCAN_EVERY stores to correct any drift of the total (entries
+deleted by hand, stores that raced without a lock).
+"""
+import hashlib
+import json
+import os
+from dataclasses import asdict
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (Windows): concurrent evictions can only delete a few entries too many
+    fcntl = None
+
+from simulation import ENGINE_VERSION, Simulation
+
+# settings that change how a run is computed, not its result
+RESULT_NEUTRAL = ("engine", "store", "regrow_mode")
+SUFFIX = ".json"
+SIZE_FILE = ".size"  # running total of the entries' bytes and the stores since the last scan
+RESCAN_EVERY = 1000  # stores between two full scans of the directory
+EVICT_TO = 0.9  # eviction deletes down to this share of the cap, so the stores after it do not scan again
+
+
+def canonical_params(params) -> dict | None:
+    """
+    The settings that determine a run's result.
+    :param params: SimParams of the run
+    :return: dict of settings, or None for an unseeded (unrepeatable) run
+    """
+    if params.seed is None:
+        return None
+    settings = asdict(params)
+    for name in RESULT_NEUTRAL:
+        del settings[name]
+    settings["infant_energy"] = params.spawn_energy
+    return settings
+
+
+def cache_key(params) -> str | None:
+    """
+    Content address of a run: sha256 of its canonical settings and the engine version.
+    :param params: SimParams of the run
+    :return: hex digest, or None for an unseeded run
+    """
+    settings = canonical_params(params)
+    if settings is None:
+        return None
+    text = json.dumps({"engine_version": ENGINE_VERSION, "params": settings}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Directory of cached run results with a size cap. Cheap to create, so every worker process opens its own.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        """
+        :param path: cache directory, created if missing
+        :param max_bytes: total size of the entries above which the least recently used ones are evicted
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _entry_path(self, key) -> str:
+        return os.path.join(self.path, key + SUFFIX)
+
+    def get(self, params, series=False) -> dict | None:
+        """
+        Look up a run.
+        :param params: SimParams of the run
+        :param series: only accept an entry that holds the per-tick series
+        :return: entry dict (summary, extinct_at, grass and maybe series), or None on a miss
+        """
+        key = cache_key(params)
+        if key is None:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):  # missing, just evicted, or unreadable
+            entry = None
+        if entry is None or (series and "series" not in entry):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, params, sim, series=None) -> None:
+        """
+        Store the result of a finished run, then evict old entries if the cache is over its size cap. Without a
+        series, an existing entry for the run is kept as it is.
+        :param params: SimParams of the run
+        :param sim: the Simulation after run()
+        :param series: optional list of (tick, rabbits, grass) of every simulated tick
+        :return: None
+        """
+        key = cache_key(params)
+        if key is None:
+            return
+        path = self._entry_path(key)
+        if series is None and os.path.exists(path):  # same result; keep the entry, it may hold the series
+            return
+        entry = result_entry(sim, series)
+        entry["params"] = canonical_params(params)
+        try:
+            old_size = os.path.getsize(path)  # replaced by an entry with the series
+        except OSError:
+            old_size = 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, separators=(",", ":"))
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        self._account(size - old_size)
+
+    def _account(self, delta) -> None:
+        """
+        Add delta bytes to the running total, scanning the directory instead when a scan is due or the total
+        goes over the cap.
+        """
+        with self._lock():
+            state = self._read_size()
+            if state is None or state[1] + 1 >= RESCAN_EVERY or state[0] + delta > self.max_bytes:
+                self._evict()
+            else:
+                self._write_size(state[0] + delta, state[1] + 1)
+
+    def evict(self) -> int:
+        """
+        Scan the directory and, if the entries exceed max_bytes, delete the least recently used ones until the
+        rest fit in EVICT_TO of it.
+        :return: number of entries deleted
+        """
+        with self._lock():
+            return self._evict()
+
+    def _evict(self) -> int:
+        """
+        evict() for a caller holding the lock; also resets the running total to what the scan found.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for item in it:
+                if not item.name.endswith(SUFFIX):
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, item.path, stat.st_size))
+                total += stat.st_size
+        deleted = 0
+        if total > self.max_bytes:
+            entries.sort()
+            for _, path, size in entries[:-1]:  # never the newest entry
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                deleted += 1
+                total -= size
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+        self._write_size(total, 0)
+        return deleted
+
+    def _read_size(self) -> tuple | None:
+        """
+        (total bytes, stores since the last scan) from the size file, or None if it is missing or unreadable.
+        """
+        try:
+            with open(os.path.join(self.path, SIZE_FILE), encoding="utf-8") as f:
+                total, stores = map(int, f.read().split())
+        except (OSError, ValueError):
+            return None
+        return total, stores
+
+    def _write_size(self, total, stores) -> None:
+        with open(os.path.join(self.path, SIZE_FILE), "w", encoding="utf-8") as f:
+            f.write(f"{total} {stores}\n")
+
+    def _lock(self):
+        return _FileLock(os.path.join(self.path, ".lock"))
+
+
+class _FileLock:
+    """
+    Exclusive advisory lock on a file for the duration of a with block (a no-op without fcntl).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def result_entry(sim, series=None) -> dict:
+    """
+    Cache entry of a finished run.
+    :param sim: the Simulation after run()
+    :param series: optional list of (tick, rabbits, grass) of every simulated tick
+    :return: dict with the summary, extinct_at, the final grass count and the series if given
+    """
+    entry = {"summary": sim.summary(), "extinct_at": sim.extinct_at, "grass": sim.grass}
+    if series is not None:
+        entry["series"] = [list(row) for row in series]
+    return entry
+
+
+def run_cached(params, cache=None) -> dict:
+    """
+    Summary of a run, from the cache when it holds one, otherwise simulated and stored.
+    :param params: SimParams of the run
+    :param cache: optional ResultCache
+    :return: Simulation.summary() of the run
+    """
+    if cache is not None:
+        entry = cache.get(params)
+        if entry is not None:
+            return entry["summary"]
+    sim = Simulation(params)
+    sim.run()
+    if cache is not None:
+        cache.put(params, sim)
+    return sim.summary()
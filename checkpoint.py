@@ -0,0 +1,257 @@
+# checkpoint.py
+"""
+Binary checkpoint / restore of a full Simulation.
+
+Layout (little-endian): a fixed header, the run's SimParams as JSON, the Mersenne Twister state, then
+the grid timers, grid free slots and the rabbit x / y / energy columns as flat int32 arrays, and the rabbit
+ids as uint64 (keyed-RNG runs only, empty otherwise). Every section starts on a 64-byte boundary and its
+offset is in the header, so CheckpointView can memory-map a large snapshot and read the arrays in place
+without copying them. Version 1 files (no id section) are still read.
+
+Restoring gives bit-identical continuation: same grid, same rabbit order, same coverage accumulators
+and the same RNG state (for keyed runs: the same seed and tick).
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from dataclasses import asdict
+
+from simulation import SimParams, Simulation
+
+MAGIC = b"ECOCKPT1"
+VERSION = 2
+ALIGN = 64
+
+# magic, version, width, height, tick, rabbits, sum/min/max coverage, rng version, has gauss, gauss_next,
+# then offset/length pairs: params JSON, rng state, timers, slots, x, y, energy, ids (version 2)
+HEADERS = {1: struct.Struct("<8sIIIQQdddIId" + "QQ" * 7), 2: struct.Struct("<8sIIIQQdddIId" + "QQ" * 8)}
+HEADER = HEADERS[VERSION]
+PREFIX = struct.Struct("<8sI")  # magic and version, read first to pick the header
+
+
+def _align(offset) -> int:
+    """
+    Round offset up to the next section boundary.
+    """
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _int32(values) -> bytes:
+    """
+    Little-endian int32 bytes of an iterable, array or NumPy array.
+    """
+    if hasattr(values, "astype"):
+        return values.astype("<i4", copy=False).tobytes()
+    data = values if isinstance(values, array) and values.typecode == 'i' else array('i', values)
+    if sys.byteorder != "little":
+        data = array('i', data)
+        data.byteswap()
+    return data.tobytes()
+
+
+def _int32_unsigned(values) -> bytes:
+    """
+    Little-endian uint32 bytes of an iterable (the RNG state words).
+    """
+    data = array('I', values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _uint64(values) -> bytes:
+    """
+    Little-endian uint64 bytes of an array('Q') (the rabbit ids).
+    """
+    if sys.byteorder != "little":
+        values = array('Q', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _grid_columns(sim) -> tuple:
+    """
+    Flattened (timers, slots) of the grid in row-major order, in whatever form _int32 can encode fastest.
+    """
+    grid = sim.grid
+    if sim.params.engine == "numpy":
+        return grid[:, :, 0], grid[:, :, 1]
+    return (array('i', [cell[0] for row in grid for cell in row]),
+            array('i', [cell[1] for row in grid for cell in row]))
+
+
+def _rabbit_columns(sim) -> tuple:
+    """
+    (x, y, energy) columns of the population; the table store's columns are written as they are.
+    """
+    rabbits = sim.rabbits
+    if sim.params.store == "table":
+        return rabbits.x, rabbits.y, rabbits.energy
+    return (array('i', [r[0] for r in rabbits]), array('i', [r[1] for r in rabbits]),
+            array('i', [r[2] for r in rabbits]))
+
+
+def save(sim, path) -> None:
+    """
+    Write a checkpoint of sim to path. The file is written next to path and renamed over it, so a crash
+    mid-write leaves the previous checkpoint intact.
+    :param sim: Simulation to snapshot
+    :param path: checkpoint file path
+    :return: None
+    """
+    if sim.params.engine == "chunked":
+        raise ValueError("Checkpoints store the full grid and are not available for the chunked engine.")
+    if sim.wheel is not None:
+        sim.wheel.sync_timers(sim.grid)  # pending tiles store their exact remaining time in the snapshot
+
+    params = asdict(sim.params)
+    if sim.params.rng == "keyed":
+        params["seed"] = sim.rng.seed  # an unseeded run continues with the seed it picked
+        rng_version, mt_state, gauss_next = 0, (), None
+        ids = _uint64(sim.rabbits.id)
+    else:
+        rng_version, mt_state, gauss_next = sim.rng.getstate()
+        ids = b""
+    sections = [
+        json.dumps(params).encode("utf-8"),
+        _int32_unsigned(mt_state),
+        *(_int32(column) for column in _grid_columns(sim)),
+        *(_int32(column) for column in _rabbit_columns(sim)),
+        ids,
+    ]
+
+    offsets = []
+    offset = _align(HEADER.size)
+    for data in sections:
+        offsets += [offset, len(data)]
+        offset = _align(offset + len(data))
+
+    header = HEADER.pack(MAGIC, VERSION, sim.params.width, sim.params.height, sim.tick, len(sim.rabbits),
+                         sim.sum_coverage, sim.min_cov, sim.max_cov, rng_version, gauss_next is not None,
+                         gauss_next or 0.0, *offsets)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for data, section_offset in zip(sections, offsets[::2]):
+            f.seek(section_offset)
+            f.write(data)
+        f.truncate(offset)
+    os.replace(tmp_path, path)
+
+
+class CheckpointView:
+    """
+    Read-only, memory-mapped view of a checkpoint file. Array sections are exposed as int32 memoryviews
+    over the mapping (wrap them with numpy.frombuffer for vectorized analysis); nothing is copied.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = PREFIX.unpack_from(self._mmap, 0) if len(self._mmap) >= PREFIX.size else (b"", 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an EcoSim checkpoint.")
+        if version not in HEADERS:
+            self.close()
+            raise ValueError(f"{path} has checkpoint version {version}, expected {VERSION}.")
+        fields = HEADERS[version].unpack_from(self._mmap, 0)
+        (_, _, self.width, self.height, self.tick, self.rabbit_count, self.sum_coverage, self.min_cov,
+         self.max_cov, self.rng_version, has_gauss, gauss_next) = fields[:12]
+        self.gauss_next = gauss_next if has_gauss else None
+        sections = fields[12:]
+        buffer = memoryview(self._mmap)
+        (params, mt_state, self.timers, self.slots, self.x, self.y, self.energy, *ids) = (
+            buffer[offset:offset + length] for offset, length in zip(sections[::2], sections[1::2]))
+        self.params = SimParams(**json.loads(bytes(params)))
+        self.mt_state = mt_state.cast('I')
+        self.ids = None  # uint64 ids of keyed-RNG runs
+        if ids and len(ids[0]):
+            self.ids = ids[0].cast('Q') if sys.byteorder == "little" else _swapped(ids[0], 'Q')
+        if sys.byteorder == "little":
+            self.timers, self.slots, self.x, self.y, self.energy = (
+                view.cast('i') for view in (self.timers, self.slots, self.x, self.y, self.energy))
+        else:  # big-endian hosts cannot read the little-endian data in place
+            self.timers, self.slots, self.x, self.y, self.energy = (
+                _swapped(view) for view in (self.timers, self.slots, self.x, self.y, self.energy))
+
+    def rng_state(self) -> tuple:
+        """
+        State tuple for random.Random.setstate().
+        """
+        mt_state = array('I', self.mt_state)
+        if sys.byteorder != "little":
+            mt_state.byteswap()
+        return self.rng_version, tuple(mt_state), self.gauss_next
+
+    def close(self) -> None:
+        """
+        Release the array views and unmap the file.
+        """
+        for name in ("timers", "slots", "x", "y", "energy", "mt_state", "ids"):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _swapped(view, typecode='i') -> array:
+    """
+    Native-order copy of a little-endian section, for big-endian hosts.
+    """
+    data = array(typecode, view.tobytes())
+    data.byteswap()
+    return data
+
+
+def load(path) -> Simulation:
+    """
+    Rebuild a Simulation from a checkpoint so that stepping it continues the original run exactly.
+    :param path: checkpoint file path
+    :return: Simulation positioned at the checkpoint's tick
+    """
+    with CheckpointView(path) as view:
+        params = view.params
+        width, height = view.width, view.height
+
+        if params.engine == "numpy":
+            import numpy as np
+            import npgrid
+            grid = np.empty((height, width, 2), dtype=npgrid.GRID_DTYPE)
+            grid[:, :, 0] = np.frombuffer(view.timers, dtype=np.int32).reshape(height, width)
+            grid[:, :, 1] = np.frombuffer(view.slots, dtype=np.int32).reshape(height, width)
+        else:
+            timers, slots = view.timers, view.slots
+            grid = [[[timers[i], slots[i]] for i in range(row * width, (row + 1) * width)] for row in range(height)]
+
+        if params.store == "table":
+            from population import RabbitTable
+            rabbits = RabbitTable(keyed=params.rng == "keyed")
+            rabbits.x.frombytes(view.x.tobytes())
+            rabbits.y.frombytes(view.y.tobytes())
+            rabbits.energy.frombytes(view.energy.tobytes())
+            if view.ids is not None:
+                rabbits.id.frombytes(view.ids.tobytes())
+        else:
+            rabbits = [[x, y, e] for x, y, e in zip(view.x, view.y, view.energy)]
+
+        sim = Simulation(params, grid=grid, rabbits=rabbits)
+        if params.rng == "keyed":
+            sim.rng.tick = view.tick
+        else:
+            sim.rng.setstate(view.rng_state())
+        sim.tick = view.tick
+        sim.sum_coverage = view.sum_coverage
+        sim.min_cov = view.min_cov
+        sim.max_cov = view.max_cov
+    return sim
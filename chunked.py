@@ -0,0 +1,250 @@
+# chunked.py
+"""
+Sparse chunked grid engine for huge, mostly idle worlds.
+
+The world is split into CHUNK x CHUNK chunks, and a chunk only exists while one of its tiles differs from
+the default state (grass, no rabbits). A chunk is allocated when a rabbit or a regrow timer first writes to
+one of its tiles, and released again once it is fully grown and empty. Reads of tiles in missing chunks
+return the default, so grid[y][x][k] works in the phase functions of EcoSim.py and population.py just as with
+the list grid. A chunk stores its timers and free slots in two typed arrays.
+
+Regrowth only visits chunks with pending timers, and the grass count is kept incrementally.
+"""
+from array import array
+
+CHUNK_BITS = 3
+CHUNK = 1 << CHUNK_BITS  # tiles per chunk side
+CHUNK_MASK = CHUNK - 1
+AREA = CHUNK * CHUNK
+
+
+class Chunk:
+    """
+    CHUNK x CHUNK tiles: tile (x, y) of the chunk is index y * CHUNK + x of both columns.
+    """
+    __slots__ = ("timers", "slots", "pending", "occupied")
+
+    def __init__(self, capacity):
+        self.timers = array('i', [0]) * AREA
+        self.slots = array('i', [capacity]) * AREA
+        self.pending = 0  # tiles with a non-zero timer
+        self.occupied = 0  # tiles whose free slots differ from the capacity
+
+
+class ChunkedGrid:
+    """
+    Sparse stand-in for the nested-list grid: grid[y] is a row view and grid[y][x] a tile view whose [0] is the
+    grass timer and [1] the free slots. Views are created on access and hold no state of their own.
+    """
+
+    def __init__(self, width, height, capacity):
+        """
+        :param width: width of grid
+        :param height: height of grid
+        :param capacity: entity holding capacity of every tile
+        """
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.chunks = {}  # (chunk row << 32 | chunk column) -> Chunk
+        self.active = set()  # chunks with pending timers, the only ones regrow_step visits
+        self.idle = set()  # chunks that may have become fully grown and empty, checked by release_idle()
+        self.pending = 0  # tiles with a non-zero timer in the whole world
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [_Row(self, row) for row in range(*y.indices(self.height))]
+        if not 0 <= y < self.height:
+            raise IndexError("grid row out of range")
+        return _Row(self, y)
+
+    def __iter__(self):
+        return (_Row(self, y) for y in range(self.height))
+
+    def copy(self) -> "ChunkedGrid":
+        """
+        Independent copy of the grid (its allocated chunks and bookkeeping).
+        :return: ChunkedGrid
+        """
+        grid = ChunkedGrid(self.width, self.height, self.capacity)
+        for key, chunk in self.chunks.items():
+            twin = grid.chunks[key] = Chunk.__new__(Chunk)
+            twin.timers = array('i', chunk.timers)
+            twin.slots = array('i', chunk.slots)
+            twin.pending = chunk.pending
+            twin.occupied = chunk.occupied
+        grid.active = set(self.active)
+        grid.idle = set(self.idle)
+        grid.pending = self.pending
+        return grid
+
+    def chunk(self, key) -> Chunk:
+        """
+        The chunk with the given key, allocated on first use.
+        """
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = Chunk(self.capacity)
+            self.idle.add(key)  # released again if the write leaves it in the default state
+        return chunk
+
+    def release_idle(self) -> int:
+        """
+        Drop the chunks that are fully grown and hold no rabbits; they are stored implicitly from now on.
+        :return: number of chunks released
+        """
+        released = 0
+        for key in self.idle:
+            chunk = self.chunks.get(key)
+            if chunk is not None and chunk.pending == 0 and chunk.occupied == 0:
+                del self.chunks[key]
+                released += 1
+        self.idle.clear()
+        return released
+
+
+class _Row:
+    """
+    View of one grid row.
+    """
+    __slots__ = ("grid", "y")
+
+    def __init__(self, grid, y):
+        self.grid = grid
+        self.y = y
+
+    def __len__(self):
+        return self.grid.width
+
+    def __getitem__(self, x):
+        if isinstance(x, slice):
+            return [self[column] for column in range(*x.indices(self.grid.width))]
+        if not 0 <= x < self.grid.width:
+            raise IndexError("grid column out of range")
+        y = self.y
+        return _Tile(self.grid, (y >> CHUNK_BITS) << 32 | (x >> CHUNK_BITS), (y & CHUNK_MASK) << CHUNK_BITS | (x & CHUNK_MASK))
+
+    def __iter__(self):
+        return (self[x] for x in range(self.grid.width))
+
+
+class _Tile:
+    """
+    View of one tile: [0] is the grass timer, [1] the free slots. Writing allocates the tile's chunk.
+    """
+    __slots__ = ("grid", "key", "index")
+
+    def __init__(self, grid, key, index):
+        self.grid = grid
+        self.key = key
+        self.index = index
+
+    def __getitem__(self, k):
+        chunk = self.grid.chunks.get(self.key)
+        if chunk is None:
+            return (0, self.grid.capacity)[k]
+        return (chunk.timers, chunk.slots)[k][self.index]
+
+    def __setitem__(self, k, value):
+        grid = self.grid
+        chunk = grid.chunk(self.key)
+        index = self.index
+        if k == 0:
+            old = chunk.timers[index]
+            chunk.timers[index] = value
+            if (old != 0) != (value != 0):
+                delta = 1 if value != 0 else -1
+                chunk.pending += delta
+                grid.pending += delta
+                if chunk.pending:
+                    grid.active.add(self.key)
+                else:
+                    grid.idle.add(self.key)
+        else:
+            old = chunk.slots[index]
+            chunk.slots[index] = value
+            capacity = grid.capacity
+            if (old != capacity) != (value != capacity):
+                chunk.occupied += 1 if value != capacity else -1
+                if chunk.occupied == 0:
+                    grid.idle.add(self.key)
+
+    def __iter__(self):
+        return iter((self[0], self[1]))
+
+
+def init_grid(width, height, cell_cap) -> ChunkedGrid:
+    """
+    Grid generation for simulation; nothing is allocated until tiles are touched.
+    :param width: width of grid
+    :param height: height of grid
+    :param cell_cap: entity holding capacity
+    :return: empty ChunkedGrid
+    """
+    return ChunkedGrid(width, height, cell_cap)
+
+
+def grass_count(grid) -> int:
+    """
+    Counts the total number of cells which has grass on them, from the running count of pending timers.
+    :param grid: generation grid
+    :return: number of grassy cells in the grid
+    """
+    return grid.width * grid.height - grid.pending
+
+
+def regrow_step(grid, width, height, newly_eaten) -> int:
+    """
+    Decrements every non-zero timer by 1, visiting only the chunks that have any, then releases the chunks
+    that ended up fully grown and empty.
+    :param grid: simulation grid
+    :param width: width of grid
+    :param height: height of grid
+    :param newly_eaten: List of tiles to skip the growth.
+    :return: number of grassy cells after regrowth
+    """
+    chunks = grid.chunks
+    for x, y in newly_eaten:
+        chunk = chunks[(y >> CHUNK_BITS) << 32 | (x >> CHUNK_BITS)]
+        index = (y & CHUNK_MASK) << CHUNK_BITS | (x & CHUNK_MASK)
+        if chunk.timers[index] > 0:
+            chunk.timers[index] += 1  # don't decrement the cell we just set to G this tick
+
+    for key in list(grid.active):
+        chunk = chunks[key]
+        regrown = chunk.timers.count(1)
+        chunk.timers = array('i', [timer - 1 if timer > 0 else 0 for timer in chunk.timers])
+        chunk.pending -= regrown
+        grid.pending -= regrown
+        if chunk.pending == 0:
+            grid.active.discard(key)
+            grid.idle.add(key)
+
+    grid.release_idle()
+    return grass_count(grid)
+
+
+def fast_forward_timers(grid, ticks) -> dict[int, int]:
+    """
+    Counts every timer down by `ticks` regrow steps at once, as `ticks` calls of regrow_step with nothing eaten would.
+    :param grid: simulation grid
+    :param ticks: number of regrow steps to skip
+    :return: histogram {timer: number of tiles} of the non-zero timers before the jump
+    """
+    timers = {}
+    for key in list(grid.active):
+        chunk = grid.chunks[key]
+        for timer in chunk.timers:
+            if timer > 0:
+                timers[timer] = timers.get(timer, 0) + 1
+        chunk.timers = array('i', [max(timer - ticks, 0) for timer in chunk.timers])
+        chunk.pending = AREA - chunk.timers.count(0)
+        if chunk.pending == 0:
+            grid.active.discard(key)
+            grid.idle.add(key)
+    grid.pending = sum(grid.chunks[key].pending for key in grid.active)
+    grid.release_idle()
+    return timers
@@ -1,58 +1,280 @@
 import argparse
+import os
+import sys
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--width', default=30, type=int, help="Defines the width of the simulation grid (default: 30).")
-parser.add_argument('--height', default=15, type=int, help="Defines the height of the simulation grid (default: 15).")
-parser.add_argument('--ticks', default=200, type=int,
-                    help="Defines the total simulation ticks/steps to run (default: 200).")
-parser.add_argument('--capacity', default=1, type=int,
-                    help="Max rabbits allowed on a cell after movement and after births (default: 1).")
-parser.add_argument('--render-every', default=1, type=int, help="Print one status line every K ticks (default: 1).")
-parser.add_argument('--rabbits', default=20, type=int,
-                    help="Number of rabbits in a simulation at a time (default: 20).")
-parser.add_argument('--regrow', default=10, type=int, help="Defines grass regrowth delay in ticks (default: 10).")
-parser.add_argument('--seed', default=None, type=int, help="Random seed for random generations (default: None).")
-parser.add_argument('--ui', default='curses', choices=['none', 'curses'], type=str,
-                    help="Way of how the render would be displayed (default: 'curses').")
-parser.add_argument('--fps', default=60.0, type=float, help="frames to display per second (default: 60.0).")
-parser.add_argument('--tps', default=8.0, type=float, help="simulation tick rate (ticks per second, default: 8.0)")
-
-# rabbit's args
-parser.add_argument('--energy-start', default=5, type=int, help="initial energy for each rabbit (default: 5).")
-parser.add_argument('--move-cost', default=2, type=int, help="energy cost when a rabbit moves (N/E/S/W) (default: 2).")
-parser.add_argument('--idle-cost', default=0, type=int, help="energy cost if it stays (default: 0).")
-parser.add_argument('--eat-gain', default=4, type=int, help="energy gained when eating grass (default: 4).")
-parser.add_argument('--repro-threshold', default=10, type=int, help="minimum energy to reproduce (default: 10).")
-parser.add_argument('--repro-cost', default=5, type=int,
-                    help="energy deducted from parent while giving birth(default: 5).")
-parser.add_argument('--infant-energy', default=None, type=int,
-                    help="energy given to a newly born child (default: repro_cost if no value passed, None is placeholder for default).")
-
-args = parser.parse_args()
-
-if args.width < 1 or args.height < 1:
-    parser.error("The width and height should be greater than or equal to 1.")
-if args.capacity <= 0:
-    parser.error("Grid's tile capacity must be greater than 0.")
-if args.rabbits > args.width * args.height:
-    parser.error("Number of rabbits should be less than total number of cells.")
-if args.regrow < 0:
-    parser.error("Regrow rate cannot be negative.")
-if args.ticks < 1:
-    parser.error("Ticks to simulate cannot be less than 1.")
-if args.render_every < 1:
-    parser.error("Rendering time cannot be less than 1.")
-if args.fps <= 0:
-    parser.error("fps must be greater than 0.")
-if args.tps <= 0:
-    parser.error("tps must be > 0.")
-if args.repro_threshold < 0:
-    parser.error("reproduction threshold cannot be less than 0.")
-if args.repro_cost < 0:
-    parser.error("reproduction cost cannot be less than 0.")
-if args.infant_energy is not None and args.infant_energy <= 0:
-    parser.error("Infant energy must be a positive integer.")
-
-
-def get_args():
+
+def address(text) -> tuple[str, int]:
+    """
+    Parse a '[host:]port' network address; the host defaults to the loopback interface.
+    :param text: address as given on the command line
+    :return: (host, port)
+    """
+    host, _, port = text.rpartition(":")
+    try:
+        port = int(port)
+    except ValueError:
+        port = -1
+    if not 0 <= port <= 65535:
+        raise argparse.ArgumentTypeError(f"invalid address {text!r}, expected [host:]port")
+    return host or "127.0.0.1", port
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the command line parser. Nothing is parsed at import time, so the engine can be embedded.
+    :return: argument parser for every simulation flag
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', default=30, type=int, help="Defines the width of the simulation grid (default: 30).")
+    parser.add_argument('--height', default=15, type=int, help="Defines the height of the simulation grid (default: 15).")
+    parser.add_argument('--ticks', default=200, type=int,
+                        help="Defines the total simulation ticks/steps to run (default: 200).")
+    parser.add_argument('--capacity', default=1, type=int,
+                        help="Max rabbits allowed on a cell after movement and after births (default: 1).")
+    parser.add_argument('--render-every', default=1, type=int, help="Print one status line every K ticks (default: 1).")
+    parser.add_argument('--rabbits', default=20, type=int,
+                        help="Number of rabbits in a simulation at a time (default: 20).")
+    parser.add_argument('--regrow', default=10, type=int, help="Defines grass regrowth delay in ticks (default: 10).")
+    parser.add_argument('--seed', default=None, type=int, help="Random seed for random generations (default: None).")
+    parser.add_argument('--ui', default='curses', choices=['none', 'curses'], type=str,
+                        help="Way of how the render would be displayed (default: 'curses').")
+    parser.add_argument('--fps', default=60.0, type=float, help="frames to display per second (default: 60.0).")
+    parser.add_argument('--tps', default=8.0, type=float, help="simulation tick rate (ticks per second, default: 8.0)")
+    parser.add_argument('--engine', default='list', choices=['list', 'numpy', 'chunked'], type=str,
+                        help="Grid storage backend: nested Python lists, NumPy arrays, or sparse chunks allocated only "
+                             "where tiles are touched, for huge mostly idle worlds (default: 'list').")
+    parser.add_argument('--store', default='list', choices=['list', 'table'], type=str,
+                        help="Rabbit storage: one [x, y, energy] list per rabbit or parallel typed columns (default: 'list').")
+    parser.add_argument('--regrow-mode', default='scan', choices=['scan', 'wheel'], type=str,
+                        help="Regrowth: decrement every tile each tick or only touch tiles due via a timer wheel (default: 'scan').")
+    parser.add_argument('--rng', default='shared', choices=['shared', 'keyed'], type=str,
+                        help="Random draws: one shared generator in loop order, or keyed by (seed, tick, rabbit id, "
+                             "purpose) so draws can be made in bulk and in any order; keyed needs --store table "
+                             "(default: 'shared').")
+    parser.add_argument('--boundary', default='bounded', choices=['bounded', 'torus', 'reflect'], type=str,
+                        help="What a step off the edge of the world does: stay on the tile, wrap around to the "
+                             "opposite edge, or bounce back off the wall (default: 'bounded').")
+    parser.add_argument('--shards', default=0, type=int,
+                        help="Split the grid into N horizontal strips run by N worker processes; keyed RNG, so results "
+                             "do not depend on N but differ from the single-process engines (default: 0, off).")
+    parser.add_argument('--replicas', default=0, type=int,
+                        help="Run N replicas with seeds seed, seed+1, ... together in one vectorized NumPy state; "
+                             "keyed RNG, so replica r matches '--rng keyed --store table --seed seed+r' (default: 0, off).")
+    parser.add_argument('--stop-rule', default='none', choices=['none', 'steady', 'cycle'], type=str,
+                        help="End a headless run early once its grass / population series settles into a steady "
+                             "state or repeats with a fixed period, and estimate the rest of the summary by "
+                             "extrapolating that series to the last tick (default: 'none'). The world itself is not "
+                             "compared, so the summary is an extrapolation. Extinct runs always jump to the end, "
+                             "exactly.")
+    parser.add_argument('--stop-window', default=100, type=int,
+                        help="Ticks that must look settled before the stop rule fires (default: 100).")
+    parser.add_argument('--stop-tol', default=0.01, type=float,
+                        help="Steady-state tolerance: allowed spread of coverage (fraction of the grid) and of the "
+                             "population (relative to its mean) over the window (default: 0.01).")
+    parser.add_argument('--profile', action='store_true',
+                        help="Time each tick phase and count lottery contests, births, deaths and regrown cells.")
+    parser.add_argument('--energy-stats', action='store_true',
+                        help="Keep streaming energy statistics (mean, spread, quantiles, histogram) and a population / "
+                             "coverage history, printed after the headless summary; the curses UI always keeps them "
+                             "for its side panel.")
+    parser.add_argument('--history', default=120, type=int,
+                        help="Ticks of population and coverage history kept for the sparklines (default: 120).")
+    parser.add_argument('--stats-out', default='-', type=str,
+                        help="Where headless runs write per-tick stats, '-' for stdout (default: '-').")
+    parser.add_argument('--stats-format', default='text', choices=['text', 'csv', 'jsonl', 'bin'], type=str,
+                        help="Per-tick stats format: status lines, CSV, JSON Lines or packed binary (default: 'text').")
+    parser.add_argument('--stats-batch', default=4096, type=int,
+                        help="Buffered stats records that force a write (default: 4096).")
+    parser.add_argument('--stats-flush-secs', default=1.0, type=float,
+                        help="Maximum seconds a stats record stays buffered (default: 1.0).")
+    parser.add_argument('--checkpoint', default=None, type=str,
+                        help="Write a binary checkpoint to this path during headless runs (default: None).")
+    parser.add_argument('--checkpoint-every', default=1000, type=int,
+                        help="Ticks between checkpoints when --checkpoint is set; one is also written at the end (default: 1000).")
+    parser.add_argument('--record', default=None, type=str,
+                        help="Write a replay log (keyframes plus one delta per tick) to this path (default: None).")
+    parser.add_argument('--record-keyframe-every', default=100, type=int,
+                        help="Ticks between replay keyframes; smaller seeks faster, larger files (default: 100).")
+    parser.add_argument('--replay', default=None, type=str,
+                        help="Play a replay log in the curses UI instead of simulating; world flags come from the "
+                             "log (default: None).")
+    parser.add_argument('--cache', default=None, type=str,
+                        help="Result cache directory for headless seeded runs: a run already in it is reported from "
+                             "the cache instead of simulated, a new one is added (default: None, off).")
+    parser.add_argument('--cache-max-mb', default=256.0, type=float,
+                        help="Size cap of the result cache; least recently used entries are evicted (default: 256).")
+    parser.add_argument('--serve', default=None, type=address, metavar='[HOST:]PORT',
+                        help="Run the simulation as a TCP server streaming per-tick deltas and stats to any number of "
+                             "viewers instead of showing it; host defaults to 127.0.0.1 (default: None, off).")
+    parser.add_argument('--serve-queue', default=8, type=int,
+                        help="Ticks a viewer may fall behind before its pending frames are coalesced into one "
+                             "keyframe (default: 8).")
+    parser.add_argument('--connect', default=None, type=address, metavar='[HOST:]PORT',
+                        help="Watch a --serve run in the curses UI; world flags come from the server (default: None).")
+    parser.add_argument('--shm', default=None, type=str, metavar='NAME',
+                        help="Publish a headless run into the shared memory segment NAME for --attach viewers and "
+                             "analysis scripts; it takes 8 bytes a tile plus 24 a living rabbit, re-created larger "
+                             "if the population outgrows it (default: None, off).")
+    parser.add_argument('--shm-interval', default=0.05, type=float,
+                        help="Minimum seconds between two --shm publications (default: 0.05).")
+    parser.add_argument('--attach', default=None, type=str, metavar='NAME',
+                        help="Watch the --shm run publishing into segment NAME in the curses UI; world flags come "
+                             "from the segment (default: None).")
+    parser.add_argument('--resume', default=None, type=str,
+                        help="Continue from a checkpoint file; world and rabbit flags are taken from the checkpoint (default: None).")
+
+    # rabbit's args
+    parser.add_argument('--energy-start', default=5, type=int, help="initial energy for each rabbit (default: 5).")
+    parser.add_argument('--move-cost', default=2, type=int, help="energy cost when a rabbit moves (N/E/S/W) (default: 2).")
+    parser.add_argument('--idle-cost', default=0, type=int, help="energy cost if it stays (default: 0).")
+    parser.add_argument('--eat-gain', default=4, type=int, help="energy gained when eating grass (default: 4).")
+    parser.add_argument('--repro-threshold', default=10, type=int, help="minimum energy to reproduce (default: 10).")
+    parser.add_argument('--repro-cost', default=5, type=int,
+                        help="energy deducted from parent while giving birth(default: 5).")
+    parser.add_argument('--infant-energy', default=None, type=int,
+                        help="energy given to a newly born child (default: repro_cost if no value passed, None is placeholder for default).")
+    return parser
+
+
+def world_error(params):
+    """
+    Check the world and rabbit settings shared by the CLI and the Simulation API.
+    :param params: parsed args or SimParams, anything with the matching attribute names
+    :return: error message for the first invalid setting, or None if all are valid
+    """
+    if params.width < 1 or params.height < 1:
+        return "The width and height should be greater than or equal to 1."
+    if params.capacity <= 0:
+        return "Grid's tile capacity must be greater than 0."
+    if params.rabbits > params.width * params.height:
+        return "Number of rabbits should be less than total number of cells."
+    if params.regrow < 0:
+        return "Regrow rate cannot be negative."
+    if params.ticks < 1:
+        return "Ticks to simulate cannot be less than 1."
+    if params.repro_threshold < 0:
+        return "reproduction threshold cannot be less than 0."
+    if params.repro_cost < 0:
+        return "reproduction cost cannot be less than 0."
+    if params.infant_energy is not None and params.infant_energy <= 0:
+        return "Infant energy must be a positive integer."
+    if params.engine == "chunked" and params.regrow_mode == "wheel":
+        return "The chunked engine already regrows only its active chunks; use --regrow-mode scan."
+    if params.rng == "keyed" and params.store != "table":
+        return "Keyed RNG needs the table store (--store table), which carries the rabbit ids."
+    if params.stop_rule not in ("none", "steady", "cycle"):
+        return "Stop rule must be one of none, steady or cycle."
+    if params.boundary not in ("bounded", "torus", "reflect"):
+        return "Boundary must be one of bounded, torus or reflect."
+    if params.stop_window < 2:
+        return "Stop window cannot be less than 2 ticks."
+    if params.stop_tol < 0:
+        return "Stop tolerance cannot be negative."
+    return None
+
+
+def validate(parser, args) -> None:
+    """
+    Validate parsed args, exiting through parser.error on the first invalid value.
+    :param parser: parser that produced args
+    :param args: parsed args
+    :return: None
+    """
+    error = world_error(args)
+    if error is not None:
+        parser.error(error)
+    if args.render_every < 1:
+        parser.error("Rendering time cannot be less than 1.")
+    if args.fps <= 0:
+        parser.error("fps must be greater than 0.")
+    if args.tps <= 0:
+        parser.error("tps must be > 0.")
+    if args.stats_batch < 1:
+        parser.error("Stats batch size cannot be less than 1.")
+    if args.stats_flush_secs < 0:
+        parser.error("Stats flush interval cannot be negative.")
+    if args.stats_format == 'bin' and args.stats_out == '-' and args.ui == 'none' and sys.stdout.isatty():
+        parser.error("Refusing to write binary stats to a terminal; pass --stats-out FILE.")
+    if args.checkpoint_every < 1:
+        parser.error("Checkpoint interval cannot be less than 1.")
+    if args.resume is not None and not os.path.isfile(args.resume):
+        parser.error(f"Checkpoint file not found: {args.resume}")
+    if args.engine == 'chunked' and (args.checkpoint is not None or args.resume is not None):
+        parser.error("Checkpoints store the full grid and are not available with --engine chunked.")
+    if args.record_keyframe_every < 1:
+        parser.error("Replay keyframe interval cannot be less than 1.")
+    if args.record is not None and (args.engine == 'chunked' or args.shards or args.replicas):
+        parser.error("--record is not available with --engine chunked, --shards or --replicas.")
+    if args.replay is not None and not os.path.isfile(args.replay):
+        parser.error(f"Replay log not found: {args.replay}")
+    if args.replay is not None and (args.ui != 'curses' or args.record is not None):
+        parser.error("--replay plays in the curses UI (--ui curses) and cannot be combined with --record.")
+    if args.cache_max_mb <= 0:
+        parser.error("Cache size cap must be greater than 0.")
+    if args.cache is not None and (args.ui != 'none' or args.seed is None):
+        parser.error("--cache only applies to headless runs (--ui none) with a --seed.")
+    if args.cache is not None and (args.shards or args.replicas or args.profile or args.checkpoint is not None
+                                   or args.resume is not None or args.record is not None):
+        parser.error("--cache is not available with --shards, --replicas, --profile, --checkpoint, --resume or "
+                     "--record.")
+    if args.history < 1:
+        parser.error("History length cannot be less than 1.")
+    if args.energy_stats and (args.shards or args.replicas or args.cache is not None):
+        parser.error("--energy-stats is not available with --shards, --replicas or --cache.")
+    if args.serve_queue < 1:
+        parser.error("Viewer queue length cannot be less than 1.")
+    if args.serve is not None and (args.engine == 'chunked' or args.shards or args.replicas or args.cache is not None
+                                   or args.record is not None or args.replay is not None
+                                   or args.checkpoint is not None or args.stop_rule != 'none'):
+        parser.error("--serve is not available with --engine chunked, --shards, --replicas, --cache, --record, "
+                     "--replay, --checkpoint or --stop-rule.")
+    if args.connect is not None and (args.ui != 'curses' or args.serve is not None or args.record is not None
+                                     or args.replay is not None):
+        parser.error("--connect shows a server's run in the curses UI (--ui curses) and cannot be combined with "
+                     "--serve, --record or --replay.")
+    if args.shm_interval < 0:
+        parser.error("Shared memory publish interval cannot be negative.")
+    if args.shm is not None and (args.ui != 'none' or args.engine == 'chunked' or args.shards or args.replicas
+                                 or args.cache is not None or args.serve is not None):
+        parser.error("--shm publishes headless runs (--ui none) and is not available with --engine chunked, "
+                     "--shards, --replicas, --cache or --serve.")
+    if args.attach is not None and (args.ui != 'curses' or args.shm is not None or args.serve is not None
+                                    or args.connect is not None or args.record is not None
+                                    or args.replay is not None):
+        parser.error("--attach shows a --shm run in the curses UI (--ui curses) and cannot be combined with "
+                     "--shm, --serve, --connect, --record or --replay.")
+    if args.boundary != 'bounded' and (args.shards or args.replicas):
+        parser.error("--shards and --replicas only support --boundary bounded.")
+    if args.shards < 0:
+        parser.error("Number of shards cannot be negative.")
+    if args.shards and (args.ui != 'none' or args.profile or args.checkpoint is not None or args.resume is not None):
+        parser.error("--shards only runs headless (--ui none) and without --profile, --checkpoint or --resume.")
+    if args.replicas < 0:
+        parser.error("Number of replicas cannot be negative.")
+    if args.replicas and (args.ui != 'none' or args.shards or args.profile or args.checkpoint is not None
+                          or args.resume is not None or args.stop_rule != 'none'):
+        parser.error("--replicas only runs headless (--ui none) and without --shards, --profile, --checkpoint, "
+                     "--resume or --stop-rule.")
+    if args.stop_rule != 'none' and (args.ui != 'none' or args.shards or args.checkpoint is not None):
+        parser.error("--stop-rule only applies to headless single-process runs without --checkpoint.")
+    if (args.engine == 'numpy' or args.replicas or args.replay is not None or args.connect is not None
+            or args.attach is not None):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            flag = ('--engine numpy' if args.engine == 'numpy' else '--replicas' if args.replicas
+                    else '--replay' if args.replay is not None else '--connect' if args.connect is not None
+                    else '--attach')
+            parser.error(f"{flag} requires NumPy (pip install numpy).")
+
+
+def get_args(argv=None):
+    """
+    Parse and validate command line args.
+    :param argv: list of arguments, defaults to sys.argv[1:]
+    :return: parsed args
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    validate(parser, args)
     return args
@@ -0,0 +1,153 @@
+# crng.py
+"""
+Counter-based random draws.
+
+Instead of pulling numbers from one shared generator in loop order, every draw is a hash of
+(seed, tick, agent id, purpose). A rabbit gets the same draw on the same tick no matter which process
+computes it or in which order the population is visited:
+
+    key = stream(seed, tick, MOVE)          # one key per (seed, tick, purpose)
+    dx, dy = DIRECTIONS[below(key, rabbit_id, 4)]
+
+The hash is the splitmix64 finalizer, which is cheap and passes the usual statistical test batteries.
+Since no draw depends on the ones before it, a whole phase can draw in one call: draw_array() and
+below_array() compute the same numbers as draw() and below() over a NumPy array of ids.
+"""
+import itertools
+import random
+
+try:
+    import numpy as np
+except ImportError:  # bulk draws are optional; callers fall back to draw() / below()
+    np = None
+
+MASK64 = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+# purposes: each one is an independent stream, so e.g. a rabbit's move and its lottery ticket are unrelated
+MOVE = 1
+LOTTERY = 2
+BIRTH_ORDER = 3
+BIRTH_CLAIM = 4
+CHILD_ID = 5
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+DIRECTION_ORDERS = tuple(itertools.permutations(DIRECTIONS))  # the 24 orders a parent can try its neighbours in
+
+
+def mix64(z) -> int:
+    """
+    splitmix64 finalizer: a bijective scramble of a 64-bit integer.
+    """
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EB & MASK64
+    return z ^ (z >> 31)
+
+
+def stream(seed, tick, purpose) -> int:
+    """
+    Key of the (seed, tick, purpose) stream. Computed once per tick and phase; draw() then derives each agent's
+    number from it.
+    :param seed: run seed (any int)
+    :param tick: tick the draws belong to
+    :param purpose: one of the purpose constants (MOVE, LOTTERY, ...)
+    :return: 64-bit stream key
+    """
+    return mix64((mix64((seed * GOLDEN + purpose) & MASK64) + tick) & MASK64)
+
+
+def draw(key, agent) -> int:
+    """
+    Uniform 64-bit draw of one agent from a stream.
+    :param key: stream key from stream()
+    :param agent: agent id (non-negative int below 2**64)
+    :return: integer in [0, 2**64)
+    """
+    return mix64((key + agent * GOLDEN) & MASK64)
+
+
+def below(key, agent, n) -> int:
+    """
+    Uniform integer in [0, n) for one agent (multiply-shift, so no modulo bias worth measuring for small n).
+    """
+    return draw(key, agent) * n >> 64
+
+
+def child_id(seed, tick, parent) -> int:
+    """
+    Id of the rabbit a parent gives birth to on a tick. Derived from the parent, so any worker computes the same id.
+    """
+    return draw(stream(seed, tick, CHILD_ID), parent)
+
+
+class Streams:
+    """
+    Stand-in for random.Random in keyed mode: the run's seed plus the tick the next draws belong to.
+    The owner advances tick after every simulated tick.
+    """
+
+    def __init__(self, seed=None):
+        """
+        :param seed: run seed; None picks a random one, so an unseeded run still has a seed to key by
+        """
+        self.seed = seed if seed is not None else random.randrange(1 << 63)
+        self.tick = 0
+
+    def key(self, purpose) -> int:
+        """
+        Stream key of purpose for the current tick.
+        """
+        return stream(self.seed, self.tick, purpose)
+
+
+def stream_bases(seeds, purpose):
+    """
+    Per-seed part of stream() for many seeds, computed once; stream_array() adds the tick. Needs NumPy.
+    :param seeds: iterable of run seeds (any ints)
+    :param purpose: one of the purpose constants
+    :return: uint64 array of bases
+    """
+    return np.array([mix64((seed * GOLDEN + purpose) & MASK64) for seed in seeds], dtype=np.uint64)
+
+
+def stream_array(bases, tick):
+    """
+    stream() of one tick for many seeds at once.
+    :param bases: uint64 array from stream_bases()
+    :param tick: tick the draws belong to
+    :return: uint64 array of stream keys
+    """
+    return _mix64_array(bases + np.uint64(tick))
+
+
+def _mix64_array(z):
+    """
+    mix64 over a uint64 array (wrapping multiplication, as in the scalar version).
+    """
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def draw_array(key, agents):
+    """
+    draw() for many agents at once. Needs NumPy.
+    :param key: stream key from stream(), or an array of keys (e.g. stream_array()) broadcast against agents
+    :param agents: uint64 array of agent ids
+    :return: uint64 array of draws
+    """
+    agents = np.asarray(agents, dtype=np.uint64)
+    return _mix64_array(agents * np.uint64(GOLDEN) + np.asarray(key, dtype=np.uint64))
+
+
+def below_array(key, agents, n):
+    """
+    below() for many agents at once (n < 2**32). The 128-bit product of the scalar version is rebuilt from
+    32-bit halves, so both give the same numbers.
+    :return: int64 array with values in [0, n)
+    """
+    d = draw_array(key, agents)
+    hi = d >> np.uint64(32)
+    lo = d & np.uint64(0xFFFFFFFF)
+    n = np.uint64(n)
+    return ((hi * n + ((lo * n) >> np.uint64(32))) >> np.uint64(32)).astype(np.int64)
@@ -0,0 +1,328 @@
+# ensemble.py
+"""
+Batched ensemble engine: R replicas of one configuration advanced together.
+
+Every replica has its own seed, but all of them live in one set of arrays:
+
+- grid state: timers and free slots as (replica, height, width) arrays
+- rabbits: ragged columns (replica, id, x, y, energy) holding the rabbits of all replicas, in no particular order
+
+A tick runs each phase once for the whole ensemble as NumPy operations, so the interpreter overhead is paid
+per tick instead of per replica and rabbit. The draws come from crng streams keyed by (seed, tick, rabbit id,
+purpose), as with --rng keyed, which makes replica r with seed s give exactly the result of a single-process
+`--rng keyed --store table --seed s` run. Needs NumPy.
+
+    ens = Ensemble(SimParams(width=50, height=50, seed=1), replicas=200)   # seeds 1..200
+    ens.run()
+    for summary in ens.summaries():
+        print(summary)
+"""
+import random
+
+import numpy as np
+
+import crng
+from keyed import BIRTH_ROUNDS
+
+ORDERS = np.array(crng.DIRECTION_ORDERS, dtype=np.intp)  # (24, 4, 2): the neighbour orders a parent can try
+STEPS = np.array(crng.DIRECTIONS, dtype=np.intp)
+
+
+def _group_ranks(groups, *keys):
+    """
+    Rank of every element within its group, ordered by keys (last key first, as in np.lexsort).
+    Most groups hold a single element, so only the crowded ones are sorted by the keys.
+    :param groups: int array of group labels
+    :param keys: tie-breaking sort keys, most significant last
+    :return: (ranks, sizes): 0 for the lowest element of each group, 1 for the next, ..., and the size of each
+             element's group
+    """
+    order = np.argsort(groups)
+    ranked = groups[order]
+    starts = np.flatnonzero(np.r_[True, ranked[1:] != ranked[:-1]])
+    lengths = np.diff(np.r_[starts, len(order)])
+    sizes = np.empty(len(order), dtype=np.intp)
+    sizes[order] = np.repeat(lengths, lengths)
+    ranks = np.zeros(len(order), dtype=np.intp)
+
+    crowded = np.flatnonzero(sizes > 1)
+    if len(crowded):
+        order = crowded[np.lexsort(tuple(key[crowded] for key in keys) + (groups[crowded],))]
+        ranked = groups[order]
+        starts = np.flatnonzero(np.r_[True, ranked[1:] != ranked[:-1]])
+        lengths = np.diff(np.r_[starts, len(order)])
+        ranks[order] = np.arange(len(order)) - np.repeat(starts, lengths)
+    return ranks, sizes
+
+
+class Ensemble:
+    """
+    R replicas of one SimParams configuration with per-replica coverage accumulators, stepped together.
+    """
+
+    def __init__(self, params, replicas, seeds=None):
+        """
+        :param params: SimParams shared by every replica (engine, store, regrow_mode and rng do not apply)
+        :param replicas: number of replicas
+        :param seeds: one seed per replica (default: params.seed, params.seed + 1, ..., or random seeds
+                      when params.seed is None)
+        """
+        if seeds is None:
+            if params.seed is None:
+                seeds = [random.randrange(1 << 63) for _ in range(replicas)]
+            else:
+                seeds = [params.seed + r for r in range(replicas)]
+        if len(seeds) != replicas:
+            raise ValueError("An ensemble needs exactly one seed per replica.")
+        if params.boundary != "bounded":
+            raise ValueError("Ensembles only support the bounded topology.")
+        self.params = params
+        self.replicas = replicas
+        self.seeds = list(seeds)
+        self.profiler = None  # phase profiling is not available for ensembles
+        self._bases = {purpose: crng.stream_bases(self.seeds, purpose)
+                       for purpose in (crng.MOVE, crng.LOTTERY, crng.BIRTH_ORDER, crng.BIRTH_CLAIM, crng.CHILD_ID)}
+
+        p = params
+        self.timers = np.zeros((replicas, p.height, p.width), dtype=np.int32)
+        self.slots = np.full((replicas, p.height, p.width), p.capacity, dtype=np.int32)
+
+        # same cells as keyed.place_rabbits: rabbit i of replica r gets id i
+        cells = [random.Random(seed).sample(range(p.width * p.height), p.rabbits) for seed in self.seeds]
+        cells = np.array(cells, dtype=np.intp).reshape(replicas, p.rabbits)
+        self.replica = np.repeat(np.arange(replicas, dtype=np.intp), p.rabbits)
+        self.id = np.tile(np.arange(p.rabbits, dtype=np.uint64), replicas)
+        self.y, self.x = np.divmod(cells.ravel(), p.width)
+        self.energy = np.full(len(self.id), p.energy_start, dtype=np.int64)
+        np.subtract.at(self.slots.reshape(-1), self._tiles(), 1)
+
+        self.tick = 0
+        self.total_cells = p.width * p.height
+        self.grass = np.full(replicas, self.total_cells, dtype=np.int64)
+        self.population = np.bincount(self.replica, minlength=replicas)
+        self.sum_coverage = np.zeros(replicas)
+        self.min_cov = np.ones(replicas)
+        self.max_cov = np.zeros(replicas)
+
+    @property
+    def done(self) -> bool:
+        """
+        True once the configured number of ticks has been simulated.
+        """
+        return self.tick >= self.params.ticks
+
+    def _tiles(self, x=None, y=None):
+        """
+        Flat index into the (replica, height, width) arrays of every rabbit's tile, or of the given positions.
+        """
+        p = self.params
+        x = self.x if x is None else x
+        y = self.y if y is None else y
+        return (self.replica * p.height + y) * p.width + x
+
+    def _keys(self, purpose, replica):
+        """
+        This tick's stream key of purpose for each entry of a replica column.
+        """
+        return crng.stream_array(self._bases[purpose], self.tick)[replica]
+
+    def step(self):
+        """
+        Advance every replica by one tick: propose moves -> resolve conflicts -> move -> eat -> regrow -> reproduce -> cull.
+        :return: (replicas,) array of grass counts after the tick
+        """
+        tiles = self._move()
+        eaten = self._eat(tiles)
+        self._regrow(eaten)
+        self._reproduce()
+        self._cull()
+        return self._finish_tick()
+
+    def _move(self):
+        p = self.params
+        # decide: one keyed direction per rabbit; out of bounds means staying
+        step = STEPS[crng.below_array(self._keys(crng.MOVE, self.replica), self.id, 4)]
+        nx = self.x + step[:, 0]
+        ny = self.y + step[:, 1]
+        inside = (nx >= 0) & (nx < p.width) & (ny >= 0) & (ny < p.height)
+        nx = np.where(inside, nx, self.x)
+        ny = np.where(inside, ny, self.y)
+
+        # lottery per target tile: a full tile admits nobody, a crowded one its lowest tickets
+        slots = self.slots.reshape(-1)
+        here = self._tiles()
+        target = self._tiles(nx, ny)
+        tickets = crng.draw_array(self._keys(crng.LOTTERY, self.replica), self.id)
+        ranks, applicants = _group_ranks(target, self.id, tickets)
+        same = p.capacity - slots[target]  # rabbits already on the target tile
+        admitted = (same < p.capacity) & ((applicants <= p.capacity) | (ranks < p.capacity - same))
+
+        moved = admitted & (target != here)
+        np.add.at(slots, np.concatenate((here[moved], target[moved])),
+                  np.repeat(np.array([1, -1], dtype=slots.dtype), np.count_nonzero(moved)))
+        self.x = np.where(moved, nx, self.x)
+        self.y = np.where(moved, ny, self.y)
+        self.energy -= np.where(moved, p.move_cost, p.idle_cost)
+        return np.where(moved, target, here)
+
+    def _eat(self, tiles):
+        p = self.params
+        timers = self.timers.reshape(-1)
+        on_grass = np.flatnonzero(timers[tiles] == 0)
+        if p.regrow == 0:  # the grass never goes, so everybody on it eats
+            self.energy[on_grass] += p.eat_gain
+            return tiles[:0]
+        # the lowest id on a grassy tile eats it
+        eaters = on_grass[_group_ranks(tiles[on_grass], self.id[on_grass])[0] == 0]
+        eaten = tiles[eaters]
+        timers[eaten] = p.regrow
+        self.energy[eaters] += p.eat_gain
+        return eaten
+
+    def _regrow(self, eaten):
+        timers = self.timers.reshape(-1)
+        np.subtract(timers, 1, out=timers, where=timers > 0)
+        timers[eaten] = self.params.regrow  # don't decrement the cells we just set to G this tick
+        self.grass = np.count_nonzero(self.timers == 0, axis=(1, 2))
+
+    def _reproduce(self):
+        p = self.params
+        parents = np.flatnonzero(self.energy >= p.repro_threshold)
+        if not len(parents):
+            return
+        self.energy[parents] -= p.repro_cost  # drain energy if either it successfully gives birth or fails
+        replica = self.replica[parents]
+        ids = self.id[parents]
+        x = self.x[parents]
+        y = self.y[parents]
+
+        # candidate tiles per parent: in-bounds neighbours in its keyed order, then its own tile; -1 pads
+        order = ORDERS[crng.below_array(self._keys(crng.BIRTH_ORDER, replica), ids, len(ORDERS))]
+        nx = x[:, None] + order[:, :, 0]
+        ny = y[:, None] + order[:, :, 1]
+        inside = (nx >= 0) & (nx < p.width) & (ny >= 0) & (ny < p.height)
+        candidates = np.full((len(parents), BIRTH_ROUNDS), -1, dtype=np.intp)
+        rows, _ = np.nonzero(inside)
+        column = np.cumsum(inside, axis=1) - 1
+        candidates[rows, column[inside]] = ((replica[:, None] * p.height + ny) * p.width + nx)[inside]
+        candidates[np.arange(len(parents)), inside.sum(axis=1)] = (replica * p.height + y) * p.width + x
+
+        slots = self.slots.reshape(-1)
+        claim_keys = self._keys(crng.BIRTH_CLAIM, replica)
+        child_keys = self._keys(crng.CHILD_ID, replica)
+        pending = np.arange(len(parents))
+        born_tiles = []
+        born_parents = []
+        for attempt in range(BIRTH_ROUNDS):
+            claims = candidates[pending, attempt]
+            # a tile grants as many claims as it has free slots, lowest tickets first
+            ranks, _ = _group_ranks(claims, ids[pending], crng.draw_array(claim_keys[pending], ids[pending]))
+            granted = ranks < slots[claims]
+            np.subtract.at(slots, claims[granted], 1)
+            born_tiles.append(claims[granted])
+            born_parents.append(pending[granted])
+            if attempt + 1 == BIRTH_ROUNDS:
+                break
+            pending = pending[~granted]
+            pending = pending[candidates[pending, attempt + 1] >= 0]
+
+        born_tiles = np.concatenate(born_tiles)
+        born_parents = np.concatenate(born_parents)
+        born_replica, tile = np.divmod(born_tiles, self.total_cells)
+        born_y, born_x = np.divmod(tile, p.width)
+        self.replica = np.concatenate((self.replica, born_replica))
+        self.id = np.concatenate((self.id, crng.draw_array(child_keys[born_parents], ids[born_parents])))
+        self.x = np.concatenate((self.x, born_x))
+        self.y = np.concatenate((self.y, born_y))
+        self.energy = np.concatenate((self.energy, np.full(len(born_tiles), p.spawn_energy, dtype=np.int64)))
+
+    def _cull(self):
+        # clear any dead rabbits whose energy level reaches 0
+        dead = self.energy <= 0
+        np.add.at(self.slots.reshape(-1), self._tiles()[dead], 1)
+        alive = ~dead
+        self.replica = self.replica[alive]
+        self.id = self.id[alive]
+        self.x = self.x[alive]
+        self.y = self.y[alive]
+        self.energy = self.energy[alive]
+
+    def _finish_tick(self):
+        cov = self.grass / self.total_cells
+        self.sum_coverage += cov
+        np.minimum(self.min_cov, cov, out=self.min_cov)
+        np.maximum(self.max_cov, cov, out=self.max_cov)
+        self.population = np.bincount(self.replica, minlength=self.replicas)
+        self.tick += 1
+        return self.grass
+
+    def run(self, n=None, on_tick=None) -> None:
+        """
+        Advance n ticks, or until the configured tick count is reached.
+        :param n: number of ticks to run (default: all remaining ticks)
+        :param on_tick: optional callback on_tick(ensemble, grass) after every tick, grass being per replica
+        :return: None
+        """
+        end = self.params.ticks if n is None else min(self.params.ticks, self.tick + n)
+        while self.tick < end:
+            g = self.step()
+            if on_tick is not None:
+                on_tick(self, g)
+
+    def summaries(self) -> list[dict]:
+        """
+        Simulation.summary() of every replica, plus its seed.
+        :return: list of dicts with seed, ticks, avg/min/max coverage (fractions) and rabbits
+        """
+        return [{
+            "seed": self.seeds[r],
+            "ticks": self.tick,
+            "avg_coverage": float(self.sum_coverage[r] / self.tick) if self.tick else 0.0,
+            "min_coverage": float(self.min_cov[r]),
+            "max_coverage": float(self.max_cov[r]),
+            "rabbits": int(self.population[r]),
+        } for r in range(self.replicas)]
+
+    def world(self, r):
+        """
+        The world of one replica, for inspection and comparisons.
+        :param r: replica index
+        :return: (timers, slots, rabbits): two (height, width) arrays and a list of (id, x, y, energy) sorted by id
+        """
+        mine = self.replica == r
+        rabbits = sorted(zip(self.id[mine].tolist(), self.x[mine].tolist(), self.y[mine].tolist(),
+                             self.energy[mine].tolist()))
+        return self.timers[r].copy(), self.slots[r].copy(), rabbits
+
+
+def run_ensemble(ensemble, render_every, sink=None) -> None:
+    """
+    Headless run of an ensemble: the status records of run_headless, one per replica and reported tick, then one
+    summary line per replica and the ensemble mean.
+    :param ensemble: Ensemble to run to completion
+    :param render_every: emit the status records every K ticks
+    :param sink: telemetry.TelemetrySink opened with replicas=True (default: text lines on stdout)
+    :return: None
+    """
+    import telemetry
+
+    total_cells = ensemble.total_cells
+    if sink is None:
+        sink = telemetry.TelemetrySink(replicas=True)
+
+    def report(ens, grass):
+        tick = ens.tick - 1
+        if tick % render_every == 0:
+            for r, (population, g) in enumerate(zip(ens.population.tolist(), grass.tolist())):
+                sink.write(tick, population, g, total_cells, replica=r)
+
+    with sink:
+        ensemble.run(on_tick=report)
+
+    total_ticks = ensemble.params.ticks
+    for r, s in enumerate(ensemble.summaries()):
+        print(f"done: replica={r} seed={s['seed']} ticks={total_ticks} average_grass_coverage = "
+              f"{s['avg_coverage'] * 100:.1f}% min = {s['min_coverage'] * 100:.1f}% max = {s['max_coverage'] * 100:.1f}%")
+    averages = ensemble.sum_coverage / total_ticks * 100
+    print(f"ensemble: replicas={ensemble.replicas} average_grass_coverage mean = {averages.mean():.1f}% "
+          f"sd = {averages.std():.1f}% extinct = {int(np.count_nonzero(ensemble.population == 0))}")
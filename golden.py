@@ -0,0 +1,274 @@
+# golden.py
+"""
+Golden-trajectory determinism harness.
+
+A faster engine is only safe to adopt if it reproduces the reference exactly: the nested-list grid, the list
+store and the full regrow scan, i.e. the phase functions in EcoSim.py. `record` runs the reference on a
+library of seeded cases (CASES) and writes one hash of the grid and one of the rabbits per tick to a JSON
+file; `check` runs a candidate on the same cases and compares its hashes tick by tick:
+
+    python golden.py record golden.json
+    python golden.py check golden.json --engine numpy --store table --regrow-mode wheel
+    python golden.py check golden.json --candidate mymodule:make_sim
+
+Both sides are hashed in one canonical form, whatever the engine: the grid as int32 (timer, free slots) pairs
+in row-major order and the rabbits as x / y / energy int32 columns in store order (the order decides the
+RNG draws of later ticks, so it has to match too). Timers are exact (a regrow wheel is synced before hashing).
+At the first tick that differs the reference is re-run to that tick and the two worlds are compared to name
+the first cell or rabbit that differs. The exit status is 1 if any case differs.
+
+A candidate factory takes a SimParams and returns an object with step(), grid and rabbits (and wheel, if
+it keeps timers out of the grid), like Simulation. The cases use the shared RNG: the keyed RNG and the
+sharded engine draw differently by design and never match the reference.
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import platform
+import sys
+from array import array
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timezone
+from itertools import chain
+from operator import itemgetter
+
+from simulation import ENGINE_VERSION, SimParams, Simulation
+
+# the reference implementation the golden hashes are recorded from
+REFERENCE = {"engine": "list", "store": "list", "regrow_mode": "scan", "rng": "shared"}
+
+# seeded cases covering the rules that trajectories are sensitive to, kept small enough to record in minutes
+CASES = {
+    "default": dict(width=30, height=15, ticks=200, rabbits=20, seed=1),
+    "crowded": dict(width=40, height=30, ticks=150, capacity=3, rabbits=1000, seed=2),
+    "boom-bust": dict(width=48, height=32, ticks=300, capacity=2, rabbits=200, regrow=3, eat_gain=6,
+                      repro_threshold=8, seed=3),
+    "extinction": dict(width=32, height=24, ticks=150, rabbits=100, regrow=25, move_cost=3, seed=4),
+    "infant-energy": dict(width=40, height=20, ticks=200, capacity=2, rabbits=150, idle_cost=1, infant_energy=3,
+                          seed=5),
+    "torus": dict(width=37, height=23, ticks=200, capacity=2, rabbits=200, boundary="torus", seed=6),
+    "reflect": dict(width=37, height=23, ticks=200, capacity=2, rabbits=200, boundary="reflect", seed=7),
+    "strip": dict(width=120, height=2, ticks=200, capacity=2, rabbits=60, regrow=6, seed=8),
+}
+
+
+@dataclass(frozen=True)
+class Mismatch:
+    """
+    First difference between a candidate and the golden trajectory of a case.
+    """
+    tick: int  # ticks stepped when the states differed (0 = the initial placement)
+    detail: str  # the first cell or rabbit that differs
+
+
+def _le(column) -> array:
+    """
+    int32 array of column, little-endian whatever the platform, so golden files travel between machines.
+    """
+    data = array('i', column)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def grid_cells(sim) -> array:
+    """
+    Canonical grid of any engine: int32 (timer, free slots) pairs in row-major order, with exact timers.
+    """
+    grid = sim.grid
+    if getattr(sim, "wheel", None) is not None:
+        sim.wheel.sync_timers(grid)
+    if hasattr(grid, "shape"):
+        return _le(grid.astype("=i4", copy=False).tobytes())
+    return _le(chain.from_iterable(chain.from_iterable(grid)))
+
+
+def rabbit_rows(sim) -> tuple:
+    """
+    Canonical rabbits of either store: (x, y, energy) int32 columns in store order.
+    """
+    rabbits = sim.rabbits
+    if hasattr(rabbits, "energy"):
+        return _le(rabbits.x), _le(rabbits.y), _le(rabbits.energy)
+    return tuple(_le(map(itemgetter(i), rabbits)) for i in range(3))
+
+
+def state_hashes(sim) -> tuple:
+    """
+    :return: (grid hash, rabbits hash) hex digests of the current state
+    """
+    rabbits = hashlib.blake2b(digest_size=8)
+    for column in rabbit_rows(sim):
+        rabbits.update(column)
+    return hashlib.blake2b(grid_cells(sim), digest_size=8).hexdigest(), rabbits.hexdigest()
+
+
+def record_case(params) -> dict:
+    """
+    Run the reference on one case and hash every tick.
+    :param params: SimParams of the case; the engine settings are replaced by REFERENCE
+    :return: golden entry with the params and the per-tick grid / rabbits hashes, tick 0 first
+    """
+    params = replace(params, **REFERENCE)
+    sim = Simulation(params)
+    grid, rabbits = [], []
+    for _ in range(params.ticks + 1):
+        if grid:
+            sim.step()  # extinct ticks are stepped too: the grid keeps changing
+        g, r = state_hashes(sim)
+        grid.append(g)
+        rabbits.append(r)
+    return {"params": asdict(params), "grid": grid, "rabbits": rabbits}
+
+
+def check_case(entry, make_sim) -> Mismatch | None:
+    """
+    Run a candidate on one golden case.
+    :param entry: golden entry from record_case()
+    :param make_sim: make_sim(SimParams) returning the candidate, see the module docstring
+    :return: the first Mismatch, or None if every tick matches
+    """
+    params = SimParams(**entry["params"])
+    sim = make_sim(params)
+    for tick, (grid_hash, rabbits_hash) in enumerate(zip(entry["grid"], entry["rabbits"])):
+        if tick:
+            sim.step()
+        if state_hashes(sim) != (grid_hash, rabbits_hash):
+            return Mismatch(tick, first_difference(params, tick, sim))
+    return None
+
+
+def first_difference(params, tick, candidate) -> str:
+    """
+    Re-run the reference to tick and describe the first cell or rabbit where candidate differs from it.
+    """
+    ref = Simulation(replace(params, **REFERENCE))
+    for _ in range(tick):
+        ref.step()
+    want, got = grid_cells(ref), grid_cells(candidate)
+    if len(want) != len(got):
+        return f"grid has {len(got) // 2} cells, expected {len(want) // 2}"
+    for i, (a, b) in enumerate(zip(want, got)):
+        if a != b:
+            cell = i // 2
+            y, x = divmod(cell, params.width)
+            return (f"cell ({x}, {y}): timer={got[2 * cell]} free={got[2 * cell + 1]}, "
+                    f"expected timer={want[2 * cell]} free={want[2 * cell + 1]}")
+    want, got = list(zip(*rabbit_rows(ref))), list(zip(*rabbit_rows(candidate)))
+    for i, (a, b) in enumerate(zip(want, got)):
+        if a != b:
+            return f"rabbit #{i}: (x, y, energy)={b}, expected {a}"
+    if len(want) != len(got):
+        i = min(len(want), len(got))
+        extra = f"rabbit #{i}: {got[i]} is extra" if len(got) > i else f"rabbit #{i}: {want[i]} is missing"
+        return f"population {len(got)}, expected {len(want)}; {extra}"
+    return "states match on a re-run; the candidate is not deterministic"
+
+
+def load_candidate(spec):
+    """
+    Import a candidate factory given as 'module:function'.
+    """
+    module, _, name = spec.partition(":")
+    if not module or not name:
+        raise ValueError(f"Candidate must be given as module:function, got {spec!r}.")
+    return getattr(importlib.import_module(module), name)
+
+
+def select_cases(text) -> dict:
+    """
+    Parse 'default,torus' into those CASES (all of them for None).
+    """
+    if text is None:
+        return CASES
+    names = text.split(",")
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        raise ValueError(f"unknown case(s) {', '.join(unknown)}; choose from {', '.join(CASES)}")
+    return {name: CASES[name] for name in names}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Record and check golden per-tick trajectories.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="Hash the reference implementation's trajectories.")
+    record.add_argument('golden', type=str, help="JSON file to write.")
+    record.add_argument('--cases', default=None, type=str,
+                        help=f"Comma-separated cases to record (default: all of {', '.join(CASES)}).")
+    check = commands.add_parser("check", help="Compare a candidate engine against a golden file.")
+    check.add_argument('golden', type=str, help="JSON file written by record.")
+    check.add_argument('--cases', default=None, type=str, help="Comma-separated cases to check (default: all).")
+    check.add_argument('--engine', default='list', choices=['list', 'numpy', 'chunked'], type=str)
+    check.add_argument('--store', default='list', choices=['list', 'table'], type=str)
+    check.add_argument('--regrow-mode', default='scan', choices=['scan', 'wheel'], type=str)
+    check.add_argument('--candidate', default=None, type=str, metavar='MODULE:FUNCTION',
+                       help="Factory building the candidate from a SimParams; replaces the engine flags.")
+    args = parser.parse_args(argv)
+    try:
+        cases = select_cases(args.cases)
+    except ValueError as e:
+        parser.error(f"Invalid case list: {e}")
+
+    if args.command == "record":
+        entries = {}
+        for name, overrides in cases.items():
+            entries[name] = record_case(SimParams(**overrides))
+            print(f"recorded {name}: {len(entries[name]['grid']) - 1} ticks", flush=True)
+        report = {
+            "meta": {
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "engine_version": ENGINE_VERSION,
+                "reference": REFERENCE,
+            },
+            "cases": entries,
+        }
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        return 0
+
+    with open(args.golden, encoding="utf-8") as f:
+        golden = json.load(f)
+    if golden["meta"]["engine_version"] != ENGINE_VERSION:
+        parser.error(f"{args.golden} was recorded for engine version {golden['meta']['engine_version']}, "
+                     f"this is version {ENGINE_VERSION}; record it again.")
+    if args.candidate is not None:
+        try:
+            make_sim = load_candidate(args.candidate)
+        except (ImportError, AttributeError, ValueError) as e:
+            parser.error(f"Cannot load candidate: {e}")
+        label = args.candidate
+    else:
+        settings = {"engine": args.engine, "store": args.store, "regrow_mode": args.regrow_mode}
+        try:
+            SimParams(**settings)
+        except ValueError as e:  # e.g. the chunked engine with the wheel
+            parser.error(str(e))
+
+        def make_sim(params):
+            return Simulation(replace(params, **settings))
+        label = "{engine}/{store}/{regrow_mode}".format(**settings)
+
+    failed = 0
+    for name in cases:
+        if name not in golden["cases"]:
+            print(f"SKIP {name}: not in {args.golden}")
+            continue
+        entry = golden["cases"][name]
+        mismatch = check_case(entry, make_sim)
+        if mismatch is None:
+            print(f"ok   {name}: {len(entry['grid']) - 1} ticks match", flush=True)
+        else:
+            failed += 1
+            print(f"DIFF {name}: first difference at tick {mismatch.tick}: {mismatch.detail}", flush=True)
+    if failed:
+        print(f"{label}: {failed} of {len(cases)} cases differ from the reference")
+        return 1
+    print(f"{label}: all cases match the reference")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+# keyed.py
+"""
+Phase functions for --rng keyed.
+
+The tick pipeline is the usual one, but every draw comes from crng streams keyed by (seed, tick, rabbit id,
+purpose) instead of one shared random.Random, so no result depends on the order the population is visited in:
+
+- moves: one keyed direction per rabbit, drawn for the whole population in one bulk call
+- lottery: a contested tile admits the rabbits holding its lowest keyed tickets
+- eating: the rabbit with the lowest id on a grassy tile eats it
+- births: a parent claims its neighbours in a keyed order, then its own tile; a tile grants as many
+  claims per round as it has free slots, lowest tickets first
+
+Rabbits live in a RabbitTable with an id column; the rng argument is a crng.Streams. A seeded run matches
+sharded.ShardedSimulation with any number of workers.
+"""
+import random
+from array import array
+
+import crng
+from population import COLUMN_TYPE, RabbitTable, apply_moves, remove_dead_bodies  # noqa: F401 (same in both modes)
+from topology import get as get_topology
+
+BIRTH_ROUNDS = 5  # four neighbours, then the parent's own tile
+
+
+def lowest_tickets(key, applicants, n, rabbit_id=None) -> list:
+    """
+    Winners of a move lottery or a birth claim round: the n applicants holding the lowest keyed tickets, ties
+    going to the lower id. Shared with sharded.py, whose strips must pick exactly the same winners.
+    :param key: crng key of the round
+    :param applicants: applicants for one tile
+    :param n: places the tile grants
+    :param rabbit_id: optional rabbit_id(applicant) (default: the applicants are rabbit ids)
+    :return: list of the winning applicants
+    """
+    if rabbit_id is None:
+        return sorted(applicants, key=lambda a: (crng.draw(key, a), a))[:n]
+    return sorted(applicants, key=lambda a: (crng.draw(key, rabbit_id(a)), rabbit_id(a)))[:n]
+
+
+def birth_orders(topology) -> list:
+    """
+    Step tables of the four directions of every crng.DIRECTION_ORDERS entry, in that order.
+    :param topology: topology.Topology of the world
+    :return: list of [(to_x, to_y), ...] per order
+    """
+    step = topology.step
+    return [[step[direction] for direction in order] for order in crng.DIRECTION_ORDERS]
+
+
+def birth_tiles(order, x, y) -> list:
+    """
+    Tiles a parent at (x, y) claims, one per round: the neighbours its keyed order leads to (skipping steps that
+    stay on its tile, i.e. off a bounded edge), then its own tile.
+    :param order: the parent's entry of birth_orders()
+    :return: list of (x, y) tiles, at most BIRTH_ROUNDS
+    """
+    tiles = [(to_x[x], to_y[y]) for to_x, to_y in order if to_x[x] != x or to_y[y] != y]
+    tiles.append((x, y))
+    return tiles
+
+
+def place_rabbits(grid, n, rng, energy) -> RabbitTable:
+    """
+    Random placement of rabbits on the grid, on the same cells the shared-RNG engines pick; rabbit i gets id i.
+    :param grid: simulation grid
+    :param n: number of rabbits to place
+    :param rng: crng.Streams of the run
+    :param energy: initial energy of all rabbits
+    :return: table of rabbits with ids, spawning coordinates and initial energy
+    """
+    width = len(grid[0])
+    table = RabbitTable(keyed=True)
+    for rabbit_id, cell in enumerate(random.Random(rng.seed).sample(range(width * len(grid)), n)):
+        y, x = divmod(cell, width)
+        table.append(x, y, energy, rabbit_id)
+        grid[y][x][1] -= 1
+    return table
+
+
+def decide_moves(width, height, rabbits, rng, topology=None) -> tuple:
+    """
+    For each rabbit, propose the target one keyed step of [(1,0),(-1,0),(0,1),(0,-1)] leads to (see topology.py).
+    :param width: width of grid
+    :param height: height of grid
+    :param rabbits: RabbitTable of rabbits with ids
+    :param rng: crng.Streams of the run
+    :param topology: topology.Topology of the world (default: bounded)
+    :return: (xs, ys) columns of targeted coordinates for rabbits to move/stay
+    """
+    topology = topology or get_topology(width, height)
+    key = rng.key(crng.MOVE)
+    np = crng.np
+    if np is not None and len(rabbits):
+        directions = crng.below_array(key, np.frombuffer(rabbits.id, np.uint64), 4)
+        x_to, y_to = topology.step_arrays()
+        nx = x_to[directions, np.frombuffer(rabbits.x, np.int32)]
+        ny = y_to[directions, np.frombuffer(rabbits.y, np.int32)]
+        return array(COLUMN_TYPE, nx.tobytes()), array(COLUMN_TYPE, ny.tobytes())
+
+    steps = topology.steps
+    xs = array(COLUMN_TYPE, rabbits.x)
+    ys = array(COLUMN_TYPE, rabbits.y)
+    for index, rabbit_id in enumerate(rabbits.id):
+        to_x, to_y = steps[crng.below(key, rabbit_id, 4)]
+        xs[index] = to_x[xs[index]]
+        ys[index] = to_y[ys[index]]
+    return xs, ys
+
+
+def resolve_moves_lottery(rabbits, proposals, tile_cap, rng) -> tuple:
+    """
+    Resolve movement conflicts with one lottery per contested target tile, as population.resolve_moves_lottery
+    does, except that the winners are the applicants with the lowest keyed tickets.
+    :param rabbits: RabbitTable of rabbits with ids
+    :param proposals: (xs, ys) columns of targeted positions proposed by rabbits to move
+    :param tile_cap: entity capacity for a tile
+    :param rng: crng.Streams of the run
+    :return: (xs, ys) columns of final moves for all rabbits
+    """
+    px, py = proposals
+    ids = rabbits.id
+    key = rng.key(crng.LOTTERY)
+    final_x = array(COLUMN_TYPE, rabbits.x)
+    final_y = array(COLUMN_TYPE, rabbits.y)
+
+    occupants = {}
+    for x, y in zip(rabbits.x, rabbits.y):
+        tile = y << 32 | x
+        occupants[tile] = occupants.get(tile, 0) + 1
+
+    applicants_by_tile = {}
+    for index in range(len(px)):
+        tile = py[index] << 32 | px[index]
+        if tile in applicants_by_tile:
+            applicants_by_tile[tile].append(index)
+        else:
+            applicants_by_tile[tile] = [index]
+
+    for tile, lottery_appliers in applicants_by_tile.items():
+        same_rabbit_pos = occupants.get(tile, 0)
+        if same_rabbit_pos >= tile_cap:
+            continue
+        if len(lottery_appliers) > tile_cap:
+            lottery_appliers = lowest_tickets(key, lottery_appliers, tile_cap - same_rabbit_pos, ids.__getitem__)
+        for i in lottery_appliers:
+            final_x[i] = px[i]
+            final_y[i] = py[i]
+    return final_x, final_y
+
+
+def eat_cells(grid, rabbits, regrow, energy_gain, stats=None) -> list[list[int, int]]:
+    """
+    Eats up a cell's grass and sets the regrow timer. On a shared tile the rabbit with the lowest id eats,
+    whatever its place in the table (with regrow 0 the grass never goes, so everybody on it eats).
+    :param grid: simulation grid
+    :param rabbits: RabbitTable of rabbits with ids
+    :param regrow: growth time to be set on eaten tiles
+    :param energy_gain: energy to gain after eating grass
+    :param stats: optional stats.StreamingStats to report the energy changes to
+    :return: list of coordinates that have been eaten recently
+    """
+    xs, ys, es, ids = rabbits.x, rabbits.y, rabbits.energy, rabbits.id
+    eaters = {}  # grassy tile -> index of the rabbit that eats it
+    newly_eaten = []
+    fed = []
+    for index in range(len(es)):
+        x, y = xs[index], ys[index]
+        if grid[y][x][0] == 0:
+            if regrow == 0:
+                es[index] += energy_gain
+                newly_eaten.append([x, y])
+                fed.append(index)
+                continue
+            tile = y << 32 | x
+            other = eaters.get(tile)
+            if other is None or ids[index] < ids[other]:
+                eaters[tile] = index
+    for index in eaters.values():
+        x, y = xs[index], ys[index]
+        grid[y][x][0] = regrow
+        es[index] += energy_gain
+        newly_eaten.append([x, y])
+    if stats is not None:
+        stats.shift([es[i] for i in fed or eaters.values()], energy_gain)
+    return newly_eaten
+
+
+def reproduce(grid, rabbits, rng, width, height, threshold, cost, spawn_energy, topology=None,
+              stats=None) -> RabbitTable:
+    """
+    Parents pay the reproduction cost and claim a tile for their infant in BIRTH_ROUNDS rounds: first their
+    neighbours (see topology.py) in a keyed random order, then their own tile.
+    :param grid: simulation grid
+    :param rabbits: RabbitTable of rabbits with ids
+    :param rng: crng.Streams of the run
+    :param width: width of grid
+    :param height: height of grid
+    :param threshold: reproduction threshold
+    :param cost: reproduction cost of parent
+    :param spawn_energy: initial energy of the spawned infant
+    :param topology: topology.Topology of the world (default: bounded)
+    :param stats: optional stats.StreamingStats to report the energy changes to
+    :return newly_born: table of newly born rabbits with their ids
+    """
+    newly_born = RabbitTable(keyed=True)
+    xs, ys, es, ids = rabbits.x, rabbits.y, rabbits.energy, rabbits.id
+    parents = [index for index in range(len(es)) if es[index] >= threshold]
+    if not parents:
+        return newly_born
+
+    order_key = rng.key(crng.BIRTH_ORDER)
+    claim_key = rng.key(crng.BIRTH_CLAIM)
+    child_key = rng.key(crng.CHILD_ID)
+    orders = len(crng.DIRECTION_ORDERS)
+    np = crng.np
+    if np is not None:
+        choices = crng.below_array(order_key, [ids[i] for i in parents], orders).tolist()
+    else:
+        choices = [crng.below(order_key, ids[i], orders) for i in parents]
+
+    step_orders = birth_orders(topology or get_topology(width, height))
+    pending = []
+    for index, choice in zip(parents, choices):
+        es[index] -= cost  # drain energy if either it successfully gives birth or fails
+        pending.append((ids[index], birth_tiles(step_orders[choice], xs[index], ys[index])))
+
+    for attempt in range(BIRTH_ROUNDS):
+        claims_by_tile = {}
+        for parent, tiles in pending:
+            claims_by_tile.setdefault(tiles[attempt], []).append(parent)
+        granted = set()
+        for (x, y), claimants in claims_by_tile.items():
+            cell = grid[y][x]
+            if cell[1] <= 0:
+                continue
+            if len(claimants) > cell[1]:
+                claimants = lowest_tickets(claim_key, claimants, cell[1])
+            for parent in claimants:
+                cell[1] -= 1  # consume 1 free slot
+                newly_born.append(x, y, spawn_energy, crng.draw(child_key, parent))
+                granted.add(parent)
+        pending = [(parent, tiles) for parent, tiles in pending if parent not in granted and attempt + 1 < len(tiles)]
+
+    if stats is not None:
+        stats.shift([es[i] for i in parents], -cost)
+        stats.add_repeated(spawn_energy, len(newly_born))
+    return newly_born
@@ -0,0 +1,66 @@
+# npgrid.py
+"""
+NumPy-backed grid engine.
+
+The world is one contiguous (height, width, 2) integer array where [..., 0] holds the grass timers and
+[..., 1] the free slots, so grid[y][x][k] keeps working in the per-rabbit phases of EcoSim.py while the
+whole-grid phases below run as single vectorized operations.
+"""
+import numpy as np
+
+GRID_DTYPE = np.int32
+
+
+def init_grid(width, height, cell_cap) -> np.ndarray:
+    """
+    Grid generation for simulation
+    :param width: width of grid
+    :param height: height of grid
+    :param cell_cap: entity holding capacity
+    :return: array of shape (height, width, 2) storing each tile's [grass growth level, entity holding capacity]
+    """
+    grid = np.zeros((height, width, 2), dtype=GRID_DTYPE)
+    grid[:, :, 1] = cell_cap
+    return grid
+
+
+def grass_count(grid) -> int:
+    """
+    Counts the total number of cells which has grass on them.
+    :param grid: generation grid
+    :return: number of grassy cells in the grid
+    """
+    return int(np.count_nonzero(grid[:, :, 0] == 0))
+
+
+def regrow_step(grid, width, height, newly_eaten) -> int:
+    """
+    Decrements the timer of every tile on grid by 1, clamped to 0.
+    :param grid: simulation grid.
+    :param width: width of grid
+    :param height: height of grid
+    :param newly_eaten: List of tiles to skip the growth.
+    :return: number of grassy cells after regrowth
+    """
+    timers = grid[:, :, 0]
+    if newly_eaten:
+        xs, ys = np.asarray(newly_eaten, dtype=np.intp).T
+        held = timers[ys, xs]  # fancy indexing copies, so these survive the decrement below
+        np.subtract(timers, 1, out=timers, where=timers > 0)
+        timers[ys, xs] = held  # don't decrement the cells we just set to G this tick
+    else:
+        np.subtract(timers, 1, out=timers, where=timers > 0)
+    return int(np.count_nonzero(timers == 0))
+
+
+def fast_forward_timers(grid, ticks) -> dict[int, int]:
+    """
+    Counts every timer down by `ticks` regrow steps at once, as `ticks` calls of regrow_step with nothing eaten would.
+    :param grid: simulation grid
+    :param ticks: number of regrow steps to skip
+    :return: histogram {timer: number of tiles} of the non-zero timers before the jump
+    """
+    timers = grid[:, :, 0]
+    values, counts = np.unique(timers[timers > 0], return_counts=True)
+    np.maximum(timers - ticks, 0, out=timers)
+    return dict(zip(values.tolist(), counts.tolist()))
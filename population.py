@@ -0,0 +1,322 @@
+# population.py
+"""
+Struct-of-arrays rabbit store.
+
+RabbitTable keeps the population in three parallel typed columns (x, y, energy) instead of one
+[x, y, energy] list per rabbit. The phase functions below mirror the list-based ones in EcoSim.py
+draw for draw, so a seeded run gives the same results with either store.
+"""
+from array import array
+
+from topology import get as get_topology
+
+COLUMN_TYPE = 'i'
+ID_TYPE = 'Q'  # rabbit ids are 64-bit (see crng.child_id)
+
+
+class RabbitTable:
+    """
+    Compact population container: rabbit i is (x[i], y[i], energy[i]).
+    Iterating yields (x, y, energy) tuples so renderers can treat it like the list store.
+    Tables built with keyed=True also carry an id column (--rng keyed); otherwise id is None.
+    """
+    __slots__ = ("x", "y", "energy", "id")
+
+    def __init__(self, rabbits=(), keyed=False):
+        self.x = array(COLUMN_TYPE)
+        self.y = array(COLUMN_TYPE)
+        self.energy = array(COLUMN_TYPE)
+        self.id = array(ID_TYPE) if keyed else None
+        for rabbit in rabbits:
+            self.append(*rabbit)
+
+    def __len__(self):
+        return len(self.energy)
+
+    def __iter__(self):
+        return zip(self.x, self.y, self.energy)
+
+    def __getitem__(self, index):
+        return self.x[index], self.y[index], self.energy[index]
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def append(self, x, y, energy, rabbit_id=None) -> None:
+        """
+        Add one rabbit at the end of the table.
+        :param x: column of the rabbit
+        :param y: row of the rabbit
+        :param energy: energy of the rabbit
+        :param rabbit_id: id of the rabbit, for tables with an id column
+        :return: None
+        """
+        self.x.append(x)
+        self.y.append(y)
+        self.energy.append(energy)
+        if self.id is not None:
+            self.id.append(rabbit_id)
+
+    def extend(self, other) -> None:
+        """
+        Bulk-append every rabbit of another table (e.g. the births of a tick) column by column.
+        :param other: RabbitTable to append
+        :return: None
+        """
+        self.x.extend(other.x)
+        self.y.extend(other.y)
+        self.energy.extend(other.energy)
+        if self.id is not None:
+            self.id.extend(other.id)
+
+    def copy(self) -> "RabbitTable":
+        """
+        Independent copy of the table, column by column.
+        :return: RabbitTable
+        """
+        table = RabbitTable(keyed=self.id is not None)
+        table.extend(self)
+        return table
+
+    def swap_remove(self, index) -> None:
+        """
+        Remove one rabbit in O(1) by moving the last rabbit into its slot. This does not keep the order.
+        :param index: index of the rabbit to remove
+        :return: None
+        """
+        last = len(self.energy) - 1
+        if index != last:
+            self.x[index] = self.x[last]
+            self.y[index] = self.y[last]
+            self.energy[index] = self.energy[last]
+            if self.id is not None:
+                self.id[index] = self.id[last]
+        del self.x[last], self.y[last], self.energy[last]
+        if self.id is not None:
+            del self.id[last]
+
+    def compact(self) -> int:
+        """
+        Drop every rabbit whose energy is <= 0 in place, without allocating new columns.
+        Survivors keep their relative order, which the seeded RNG draws of the next tick depend on.
+        :return: number of rabbits removed
+        """
+        xs, ys, es, ids = self.x, self.y, self.energy, self.id
+        write = 0
+        for read in range(len(es)):
+            e = es[read]
+            if e > 0:
+                if write != read:
+                    xs[write] = xs[read]
+                    ys[write] = ys[read]
+                    es[write] = e
+                    if ids is not None:
+                        ids[write] = ids[read]
+                write += 1
+        removed = len(es) - write
+        if removed:
+            del xs[write:], ys[write:], es[write:]
+            if ids is not None:
+                del ids[write:]
+        return removed
+
+
+def place_rabbits(grid, n, rng, energy) -> RabbitTable:
+    """
+    Random placement of rabbits on the grid, drawing exactly what EcoSim.place_rabbits draws.
+    :param grid: simulation grid
+    :param n: number of rabbits to place
+    :param rng: RNG for random placements
+    :param energy: initial energy of all rabbits
+    :return: table of rabbits with their spawning coordinates and initial energy
+    """
+    width = len(grid[0])
+    table = RabbitTable()
+    for cell in rng.sample(range(width * len(grid)), n):
+        y, x = divmod(cell, width)
+        table.append(x, y, energy)
+        grid[y][x][1] -= 1
+    return table
+
+
+def decide_moves(width, height, rabbits, rng, topology=None) -> tuple:
+    """
+    For each rabbit, propose the target one step in a random direction leads to, as EcoSim.decide_moves does.
+    :param width: width of grid
+    :param height: height of grid
+    :param rabbits: RabbitTable of rabbits
+    :param rng: RNG for random movements
+    :param topology: topology.Topology of the world (default: bounded)
+    :return: (xs, ys) columns of targeted coordinates for rabbits to move/stay
+    """
+    steps = (topology or get_topology(width, height)).steps
+    choice = rng.choice
+    picks = [choice(steps) for _ in range(len(rabbits.x))]  # one direction per rabbit, in table order
+    xs = array(COLUMN_TYPE, [to_x[x] for (to_x, _), x in zip(picks, rabbits.x)])
+    ys = array(COLUMN_TYPE, [to_y[y] for (_, to_y), y in zip(picks, rabbits.y)])
+    return xs, ys
+
+
+def resolve_moves_lottery(rabbits, proposals, tile_cap, rng) -> tuple:
+    """
+    Resolve movement conflicts with one lottery per contested target tile, as EcoSim.resolve_moves_lottery does.
+    Tiles are keyed by packing (x, y) into a single int so no tuple is built per rabbit.
+    :param rabbits: RabbitTable of rabbits
+    :param proposals: (xs, ys) columns of targeted positions proposed by rabbits to move
+    :param tile_cap: entity capacity for a tile
+    :param rng: RNG randomness generator
+    :return: (xs, ys) columns of final moves for all rabbits
+    """
+    px, py = proposals
+    final_x = array(COLUMN_TYPE, rabbits.x)
+    final_y = array(COLUMN_TYPE, rabbits.y)
+
+    occupants = {}
+    for x, y in zip(rabbits.x, rabbits.y):
+        key = y << 32 | x
+        occupants[key] = occupants.get(key, 0) + 1
+
+    applicants_by_tile = {}
+    for index in range(len(px)):
+        key = py[index] << 32 | px[index]
+        if key in applicants_by_tile:
+            applicants_by_tile[key].append(index)
+        else:
+            applicants_by_tile[key] = [index]
+
+    for key, lottery_appliers in applicants_by_tile.items():
+        same_rabbit_pos = occupants.get(key, 0)
+        if same_rabbit_pos >= tile_cap:
+            continue
+        if len(lottery_appliers) > tile_cap:
+            lottery_appliers = rng.sample(lottery_appliers, tile_cap - same_rabbit_pos)
+        for i in lottery_appliers:
+            final_x[i] = px[i]
+            final_y[i] = py[i]
+    return final_x, final_y
+
+
+def apply_moves(grid, rabbits, targets, move_cst, idle_cst, stats=None) -> None:
+    """
+    Overwrite each rabbit's position with its target, in place.
+    :param grid: simulation grid
+    :param rabbits: RabbitTable of rabbits
+    :param targets: (xs, ys) columns of target positions
+    :param move_cst: cost of energy to potentially move rabbit
+    :param idle_cst: cost of energy to potentially stay idle
+    :param stats: optional stats.StreamingStats to report the energy changes to
+    :return: None
+    """
+    tx, ty = targets
+    xs, ys, es = rabbits.x, rabbits.y, rabbits.energy
+    idled = [] if stats is not None and idle_cst else None  # energies after paying, when reporting to stats
+    moved = [] if stats is not None and move_cst else None
+    for index in range(len(es)):
+        x, y, nx, ny = xs[index], ys[index], tx[index], ty[index]
+        if x == nx and y == ny:  # Rabbit is staying idle on his tile
+            es[index] -= idle_cst
+            if idled is not None:
+                idled.append(es[index])
+        else:
+            grid[y][x][1] += 1
+            xs[index] = nx
+            ys[index] = ny
+            es[index] -= move_cst
+            grid[ny][nx][1] -= 1
+            if moved is not None:
+                moved.append(es[index])
+    if idled:
+        stats.shift(idled, -idle_cst)
+    if moved:
+        stats.shift(moved, -move_cst)
+
+
+def eat_cells(grid, rabbits, regrow, energy_gain, stats=None) -> list[list[int, int]]:
+    """
+    Eats up a cell's grass for all the rabbits and sets the regrow timer for the grass on the cell.
+    :param grid: simulation grid
+    :param rabbits: RabbitTable of rabbits
+    :param regrow: growth time to be set on eaten tiles
+    :param energy_gain: energy to gain after eating grass
+    :param stats: optional stats.StreamingStats to report the energy changes to
+    :return: list of coordinates that have been eaten recently
+    """
+    newly_eaten = []
+    fed = []
+    xs, ys, es = rabbits.x, rabbits.y, rabbits.energy
+    for index in range(len(es)):
+        x, y = xs[index], ys[index]
+        cell = grid[y][x]
+        if cell[0] == 0:
+            cell[0] = regrow
+            es[index] += energy_gain
+            newly_eaten.append([x, y])
+            if stats is not None:
+                fed.append(es[index])
+    if stats is not None:
+        stats.shift(fed, energy_gain)
+    return newly_eaten
+
+
+def reproduce(grid, rabbits, rng, width, height, threshold, cost, spawn_energy, topology=None,
+              stats=None) -> RabbitTable:
+    """
+    Same birth rules as EcoSim.reproduce; the infants are collected in their own table for one bulk append.
+    :param grid: simulation grid
+    :param rabbits: RabbitTable of rabbits
+    :param rng: RNG for randomness
+    :param width: width of grid
+    :param height: height of grid
+    :param threshold: reproduction threshold
+    :param cost: reproduction cost of parent
+    :param spawn_energy: initial energy of the spawned infant
+    :param topology: topology.Topology of the world (default: bounded)
+    :param stats: optional stats.StreamingStats to report the energy changes to
+    :return newly_born: table of newly born rabbits
+    """
+    steps = (topology or get_topology(width, height)).steps
+    newly_born = RabbitTable()
+    paid = []
+    xs, ys, es = rabbits.x, rabbits.y, rabbits.energy
+
+    for index in range(len(es)):
+        if es[index] >= threshold:
+            es[index] -= cost
+            if stats is not None:
+                paid.append(es[index])
+            x, y = xs[index], ys[index]
+            for to_x, to_y in rng.sample(steps, 4):
+                nx, ny = to_x[x], to_y[y]
+                if (nx != x or ny != y) and grid[ny][nx][1] > 0:
+                    grid[ny][nx][1] -= 1
+                    newly_born.append(nx, ny, spawn_energy)
+                    break
+            else:
+                if grid[y][x][1] > 0:
+                    grid[y][x][1] -= 1
+                    newly_born.append(x, y, spawn_energy)
+
+    if stats is not None:
+        stats.shift(paid, -cost)
+        stats.add_repeated(spawn_energy, len(newly_born))
+    return newly_born
+
+
+def remove_dead_bodies(grid, rabbits, stats=None) -> None:
+    """
+    Remove rabbits from grid whose energy levels have reached 0 and so are dead.
+    :param grid: simulation grid
+    :param rabbits: RabbitTable of rabbits
+    :param stats: optional stats.StreamingStats to report the energy changes to
+    :return: None
+    """
+    xs, ys, es = rabbits.x, rabbits.y, rabbits.energy
+    dead = []
+    for i in range(len(es)):
+        if es[i] <= 0:
+            grid[ys[i]][xs[i]][1] += 1
+            dead.append(es[i])
+    if stats is not None and dead:
+        stats.remove(dead)
+    rabbits.compact()
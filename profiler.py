@@ -0,0 +1,96 @@
+# profiler.py
+"""
+Per-phase profiling of the tick pipeline.
+
+Attach a PhaseProfiler to a Simulation (sim.profiler = PhaseProfiler()) and every step() is routed
+through profile_step(), which times each phase and keeps running counters. With no profiler attached
+step() only pays one attribute check per tick.
+"""
+from collections import Counter
+from time import perf_counter
+
+from simulation import PHASES
+
+COUNTERS = ("contests", "blocked", "births", "deaths", "regrown")
+
+
+class PhaseProfiler:
+    """
+    Running per-phase timers plus event counters:
+      - contests: target tiles whose movers were settled by a lottery draw
+      - blocked:  rabbits that asked to move but stayed (lost a lottery or the tile was full)
+      - births / deaths: rabbits added by reproduce / removed by the cull
+      - regrown:  tiles that turned back into grass
+    """
+
+    def __init__(self):
+        self.ticks = 0
+        self.secs = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+
+    def profile_step(self, sim) -> int:
+        """
+        Run one Simulation tick with every phase timed and the counters updated.
+        :param sim: Simulation to advance
+        :return: grass count after the tick, like Simulation.step()
+        """
+        secs = self.secs
+        counts = self.counts
+        grass_before = sim.grass
+        for name, run_phase in sim.phases():
+            if name == "cull":
+                population = len(sim.rabbits)
+            t0 = perf_counter()
+            run_phase()
+            secs[name] += perf_counter() - t0
+            if name == "resolve_moves":
+                contests, blocked = _lottery_counts(sim)
+                counts["contests"] += contests
+                counts["blocked"] += blocked
+        counts["births"] += len(sim.born)
+        counts["deaths"] += population - len(sim.rabbits)
+        turned_dirt = len(sim.eaten) if sim.params.regrow > 0 else 0
+        counts["regrown"] += sim.grass - grass_before + turned_dirt
+        self.ticks += 1
+        return sim.finish_tick()
+
+    def total_secs(self) -> float:
+        """
+        Seconds spent in all phases so far.
+        """
+        return sum(self.secs.values())
+
+    def report_lines(self) -> list[str]:
+        """
+        Human-readable profile: time share per phase, then counter totals and per-tick averages.
+        """
+        total = self.total_secs() or 1.0
+        ticks = self.ticks or 1
+        lines = [f"{name:<14}{secs * 1000 / ticks:>9.3f} ms/tick {secs / total * 100:>5.1f}%"
+                 for name, secs in self.secs.items()]
+        lines += [f"{name:<14}{count:>9} total {count / ticks:>9.2f}/tick" for name, count in self.counts.items()]
+        return lines
+
+
+def _lottery_counts(sim) -> tuple:
+    """
+    Recount this tick's movement lottery from the proposals and final moves left on the Simulation.
+    Only runs while profiling, so the phase functions themselves stay untouched.
+    :return: (contested tiles, blocked movers)
+    """
+    rabbits = sim.rabbits
+    if sim.params.store == "table":
+        positions = list(zip(rabbits.x, rabbits.y))
+        proposals = list(zip(*sim.proposals))
+        finals = list(zip(*sim.final_moves))
+    else:
+        positions = [(r[0], r[1]) for r in rabbits]
+        proposals = [(p[0], p[1]) for p in sim.proposals]
+        finals = [(f[0], f[1]) for f in sim.final_moves]
+
+    cap = sim.params.capacity
+    occupants = Counter(positions)
+    applicants = Counter(proposals)
+    contests = sum(1 for tile, n in applicants.items() if n > cap and occupants[tile] < cap)
+    blocked = sum(1 for here, wanted, final in zip(positions, proposals, finals) if wanted != here and final == here)
+    return contests, blocked
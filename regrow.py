@@ -0,0 +1,66 @@
+# regrow.py
+"""
+Timer-wheel regrowth scheduler.
+
+Instead of decrementing every tile each tick, eaten tiles are dropped into the wheel slot of the tick
+they finish regrowing on. A tick only touches the tiles that turn back into grass, and the wheel keeps
+a running grass count so coverage needs no grid scan.
+
+Grid timers are not counted down while a tile waits in the wheel: they keep the value eat_cells wrote
+and are set to 0 when the tile regrows, so `timer == 0` still means grass. sync_timers() writes the exact
+remaining timers back when the full grid state is needed.
+"""
+
+
+class RegrowWheel:
+    """
+    Ring of `regrow` slots; slot (k % regrow) holds the tiles that regrow on regrow step k.
+    """
+
+    def __init__(self, grid, regrow):
+        """
+        :param grid: simulation grid, scanned once to seed the grass counter and pending timers
+        :param regrow: growth time set on eaten tiles
+        """
+        self.regrow = regrow
+        self.tick = 0
+        self.slots = [[] for _ in range(regrow)]
+        self.grass = 0
+        for y, row in enumerate(grid):
+            for x, cell in enumerate(row):
+                timer = cell[0]
+                if timer == 0:
+                    self.grass += 1
+                else:
+                    # a timer t reaches 0 on the t-th regrow step from now
+                    self.slots[(timer - 1) % regrow].append([x, y])
+
+    def step(self, grid, newly_eaten) -> int:
+        """
+        Replacement for regrow_step: regrow the tiles due this tick and schedule the ones just eaten.
+        :param grid: simulation grid
+        :param newly_eaten: tiles eaten this tick, as returned by eat_cells
+        :return: number of tiles that regrew this tick
+        """
+        self.tick += 1
+        if self.regrow == 0:
+            return 0  # eaten tiles never leave the grass state
+        slot = (self.tick - 1) % self.regrow
+        due = self.slots[slot]
+        for x, y in due:
+            grid[y][x][0] = 0
+        # eaten tiles regrow `regrow` steps from now, which is this same slot on the next turn of the wheel
+        self.slots[slot] = newly_eaten
+        self.grass += len(due) - len(newly_eaten)
+        return len(due)
+
+    def sync_timers(self, grid) -> None:
+        """
+        Write the exact remaining timer of every pending tile into the grid, matching what regrow_step would hold.
+        :param grid: simulation grid
+        :return: None
+        """
+        for offset in range(self.regrow):
+            remaining = offset + 1
+            for x, y in self.slots[(self.tick + offset) % self.regrow]:
+                grid[y][x][0] = remaining
@@ -0,0 +1,404 @@
+# replay.py
+"""
+Delta-encoded replay logs (--record) and the player behind the curses replay mode (--replay).
+
+Layout (little-endian): a header, then one frame per record. A frame is a kind byte, the tick and the
+length of its zlib-compressed payload:
+
+- K keyframe: number of rabbits, the grass bitmap (one byte per tile, row-major, 1 = grass) and the rabbit
+  x / y / energy columns as int32
+- D delta, the tick after the previous frame: moved rabbits (index, x, y), births (x, y), deaths, the energy
+  change of every survivor, eaten tiles and regrown tiles (flat y * width + x), all as int32
+- X index: the last tick, then the (tick, offset) of every keyframe as uint64, followed by a fixed trailer
+  that points at it
+
+The log starts with a keyframe and repeats one every `keyframe_every` ticks, right after that tick's delta,
+so a seek loads the closest keyframe before the target and applies at most keyframe_every - 1 deltas. A log
+whose writer died before the index was written is still played: the frames are scanned instead.
+
+Deaths are indices into the rabbits before the cull: the survivors of the previous tick in table order (after
+their moves), followed by the tick's newborns. Survivors keep their relative order in both stores, so the
+recorder finds the dead by matching the new table against that list in order.
+
+DeltaEncoder and DeltaDecoder make and apply the keyframe and delta payloads; server.py streams the same
+payloads to remote viewers.
+"""
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_right
+from operator import itemgetter
+
+MAGIC = b"ECOREPL1"
+END_MAGIC = b"ECOREPLX"
+HEADER = struct.Struct("<8sIIIIQ")  # magic, width, height, capacity, keyframe_every, first tick
+FRAME = struct.Struct("<cQI")  # kind, tick, payload length
+TRAILER = struct.Struct("<Q8s")  # offset of the index frame, END_MAGIC
+COUNTS = struct.Struct("<6I")  # moves, births, deaths, survivors, eaten, regrown
+KEYFRAME, DELTA, INDEX = b"K", b"D", b"X"
+
+
+def _int32(values) -> bytes:
+    """
+    Little-endian int32 bytes of an iterable.
+    """
+    data = array('i', values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _read_int32(data, start, count) -> tuple:
+    """
+    count int32 values from data at byte offset start.
+    :return: (array('i'), offset after the values)
+    """
+    end = start + 4 * count
+    values = array('i', data[start:end])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values, end
+
+
+def _columns(rabbits) -> tuple:
+    """
+    (xs, ys, energies) of either rabbit store, or of a final_moves result ((xs, ys) or a list of [x, y]).
+    """
+    if isinstance(rabbits, tuple):
+        return rabbits[0], rabbits[1], None
+    if hasattr(rabbits, "energy"):
+        return rabbits.x, rabbits.y, rabbits.energy
+    xs = list(map(itemgetter(0), rabbits))
+    ys = list(map(itemgetter(1), rabbits))
+    energies = list(map(itemgetter(2), rabbits)) if rabbits and len(rabbits[0]) > 2 else []
+    return xs, ys, energies
+
+
+class DeltaEncoder:
+    """
+    Encodes a Simulation tick by tick: keyframe() describes the world as of the last encoded tick, delta(sim)
+    the tick sim just finished against it. Keeps its own copy of the grass bitmap and the rabbit columns, so it
+    only reads the grid on the tiles that were eaten or are regrowing. Shared by the replay log and server.py.
+    """
+
+    def __init__(self, sim):
+        """
+        :param sim: Simulation to encode, in its current state
+        """
+        self.width = sim.params.width
+        self.tick = sim.tick
+        grid = sim.grid
+        if hasattr(grid, "shape"):
+            self.grass = bytearray((grid[:, :, 0] == 0).astype("u1").tobytes())
+        else:
+            self.grass = bytearray(cell[0] == 0 for row in grid for cell in row)
+        self.dirt = {i for i, g in enumerate(self.grass) if not g}
+        xs, ys, es = _columns(sim.rabbits)
+        self.x, self.y, self.e = list(xs), list(ys), list(es)
+
+    def keyframe(self) -> bytes:
+        """
+        Uncompressed keyframe payload of the current tick.
+        """
+        return struct.pack("<I", len(self.x)) + bytes(self.grass) + _int32(self.x) + _int32(self.y) + _int32(self.e)
+
+    def delta(self, sim) -> bytes:
+        """
+        Uncompressed delta payload of the tick sim just finished; the encoder moves on to that tick.
+        :param sim: the encoded Simulation, right after step()
+        :return: payload bytes
+        """
+        width = self.width
+        grid = sim.grid
+        old_x, old_y, old_e = self.x, self.y, self.e
+        fx, fy, _ = _columns(sim.final_moves)
+        moves = [i for i in range(len(old_x)) if fx[i] != old_x[i] or fy[i] != old_y[i]]
+        bx, by, _ = _columns(sim.born)
+
+        # the cull keeps survivors in order: match them against moved rabbits + newborns to find the dead
+        cand_x = list(fx) + list(bx)
+        cand_y = list(fy) + list(by)
+        cand_e = old_e + [0] * len(bx)
+        xs, ys, es = _columns(sim.rabbits)
+        deaths = []
+        deltas = []
+        c = 0
+        for x, y, e in zip(xs, ys, es):
+            while cand_x[c] != x or cand_y[c] != y:
+                deaths.append(c)
+                c += 1
+            deltas.append(e - cand_e[c])
+            c += 1
+        deaths.extend(range(c, len(cand_x)))
+
+        regrown = [i for i in self.dirt if grid[i // width][i % width][0] == 0]
+        for i in regrown:
+            self.grass[i] = 1
+        self.dirt.difference_update(regrown)
+        eaten = [y * width + x for x, y in sim.eaten if grid[y][x][0] != 0]
+        for i in eaten:
+            self.grass[i] = 0
+        self.dirt.update(eaten)
+
+        self.tick = sim.tick
+        self.x, self.y, self.e = list(xs), list(ys), list(es)
+        return b"".join((
+            COUNTS.pack(len(moves), len(bx), len(deaths), len(deltas), len(eaten), len(regrown)),
+            _int32(moves), _int32(fx[i] for i in moves), _int32(fy[i] for i in moves),
+            _int32(bx), _int32(by), _int32(deaths), _int32(deltas), _int32(eaten), _int32(regrown),
+        ))
+
+
+class Recorder:
+    """
+    Writes the replay log of a Simulation: call capture(sim) after every tick and close() at the end.
+    """
+
+    def __init__(self, sim, path, keyframe_every=100):
+        """
+        :param sim: Simulation to record, in its current state (the first keyframe)
+        :param path: log file to write
+        :param keyframe_every: ticks between keyframes
+        """
+        p = sim.params
+        self.keyframe_every = keyframe_every
+        self.keyframes = []  # (tick, offset)
+        self._encoder = DeltaEncoder(sim)
+        self._out = open(path, "wb")
+        self._out.write(HEADER.pack(MAGIC, p.width, p.height, p.capacity, keyframe_every, sim.tick))
+        self._write_keyframe()
+
+    @property
+    def tick(self) -> int:
+        return self._encoder.tick
+
+    def _write_frame(self, kind, payload) -> int:
+        offset = self._out.tell()
+        data = zlib.compress(payload)
+        self._out.write(FRAME.pack(kind, self.tick, len(data)))
+        self._out.write(data)
+        return offset
+
+    def _write_keyframe(self) -> None:
+        self.keyframes.append((self.tick, self._write_frame(KEYFRAME, self._encoder.keyframe())))
+
+    def capture(self, sim) -> None:
+        """
+        Append the delta of the tick sim just finished (and a keyframe when one is due).
+        :param sim: the recorded Simulation, right after step()
+        :return: None
+        """
+        self._write_frame(DELTA, self._encoder.delta(sim))
+        if self.tick % self.keyframe_every == 0:
+            self._write_keyframe()
+
+    def close(self) -> None:
+        """
+        Write the keyframe index and the trailer, then close the file.
+        :return: None
+        """
+        if self._out.closed:
+            return
+        index = array('Q', [self.tick])
+        for tick, offset in self.keyframes:
+            index.extend((tick, offset))
+        if sys.byteorder != "little":
+            index.byteswap()
+        offset = self._write_frame(INDEX, index.tobytes())
+        self._out.write(TRAILER.pack(offset, END_MAGIC))
+        self._out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DeltaDecoder:
+    """
+    The world described by a sequence of keyframe and delta payloads: after load_keyframe() or apply_delta(),
+    grid and rabbits hold it in formats tui.draw_frame takes (a NumPy grid and [x, y, energy] lists, each built
+    when first read) and grass its grass count. The payloads are applied as NumPy operations on the rabbit
+    columns and the grass bitmap; no simulation code runs. Needs NumPy.
+    """
+
+    def __init__(self, width, height, capacity):
+        """
+        :param width: width of grid
+        :param height: height of grid
+        :param capacity: max rabbits per tile
+        """
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.tick = None
+        self.grass = 0
+        self._grid = None  # views of the current tick, built on first access
+        self._rabbits = None
+
+    def load_keyframe(self, tick, data) -> None:
+        """
+        Replace the world with a keyframe.
+        :param tick: tick of the keyframe
+        :param data: uncompressed keyframe payload
+        :return: None
+        """
+        import numpy as np
+        (n,) = struct.unpack_from("<I", data)
+        cells = self.width * self.height
+        self._bitmap = np.frombuffer(data, dtype=np.uint8, count=cells, offset=4).copy()
+        self._x, self._y, self._e = np.frombuffer(data, dtype="<i4", count=3 * n, offset=4 + cells).reshape(3, n)
+        self.grass = int(np.count_nonzero(self._bitmap))
+        self.tick = tick
+        self._grid = self._rabbits = None
+
+    def apply_delta(self, tick, data) -> None:
+        """
+        Advance the world by the delta of the next tick.
+        :param tick: tick the delta ends on
+        :param data: uncompressed delta payload
+        :return: None
+        """
+        import numpy as np
+        counts = COUNTS.unpack_from(data)
+        n_moves, n_births, n_deaths, n_survivors, n_eaten, n_regrown = counts
+        columns = np.split(np.frombuffer(data, dtype="<i4", offset=COUNTS.size),
+                           np.cumsum((n_moves, n_moves, n_moves, n_births, n_births, n_deaths, n_survivors, n_eaten)))
+        moves, mx, my, bx, by, deaths, deltas, eaten, regrown = columns
+
+        x = self._x.copy()
+        y = self._y.copy()
+        x[moves] = mx
+        y[moves] = my
+        keep = np.ones(len(x) + n_births, dtype=bool)
+        keep[deaths] = False
+        self._x = np.concatenate((x, bx))[keep]
+        self._y = np.concatenate((y, by))[keep]
+        self._e = np.concatenate((self._e, np.zeros(n_births, dtype=self._e.dtype)))[keep] + deltas
+        self._bitmap[regrown] = 1
+        self._bitmap[eaten] = 0
+        self.grass += n_regrown - n_eaten
+        self.tick = tick
+        self._grid = self._rabbits = None
+
+    @property
+    def population(self) -> int:
+        return len(self._x)
+
+    @property
+    def grid(self):
+        """
+        (height, width, 2) array: [..., 0] is 0 on grass and 1 elsewhere, [..., 1] the free slots. A new array
+        per tick, so it can be handed to another thread.
+        """
+        if self._grid is None:
+            import numpy as np
+            grid = np.empty((self.height, self.width, 2), dtype=np.int32)
+            grid[:, :, 0] = 1 - self._bitmap.reshape(self.height, self.width)  # grass or not; timers are not sent
+            occupants = np.bincount(self._y.astype(np.intp) * self.width + self._x,
+                                    minlength=self.width * self.height)
+            grid[:, :, 1] = self.capacity - occupants.reshape(self.height, self.width)
+            self._grid = grid
+        return self._grid
+
+    @property
+    def rabbits(self) -> list:
+        """
+        [x, y, energy] of every rabbit, in table order.
+        """
+        if self._rabbits is None:
+            import numpy as np
+            self._rabbits = np.column_stack((self._x, self._y, self._e)).tolist()
+        return self._rabbits
+
+
+class Replay(DeltaDecoder):
+    """
+    Player of a replay log. After seek(tick), grid, rabbits and grass describe the world as it was after that
+    tick (see DeltaDecoder). Needs NumPy.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: log written by Recorder
+        """
+        self._file = open(path, "rb")
+        magic, width, height, capacity, self.keyframe_every, self.first_tick = HEADER.unpack(
+            self._file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an EcoSim replay log.")
+        super().__init__(width, height, capacity)
+        self.keyframes, self.last_tick = self._read_index()
+        if not self.keyframes:
+            raise ValueError(f"{path} holds no keyframe.")
+        self._keyframe_ticks = [tick for tick, _ in self.keyframes]
+        self._next = None  # offset of the frame after the current tick
+        self.seek(self.first_tick)
+
+    def _read_index(self) -> tuple:
+        """
+        Keyframes and last tick from the trailer, or by scanning the frames of an unfinished log.
+        """
+        f = self._file
+        size = f.seek(0, os.SEEK_END)
+        if size >= HEADER.size + TRAILER.size:
+            f.seek(size - TRAILER.size)
+            offset, end = TRAILER.unpack(f.read(TRAILER.size))
+            if end == END_MAGIC:
+                kind, _, length = self._frame_at(offset)
+                index = array('Q', zlib.decompress(f.read(length)))
+                if sys.byteorder != "little":
+                    index.byteswap()
+                return list(zip(index[1::2], index[2::2])), index[0]
+
+        keyframes = []
+        last_tick = self.first_tick
+        offset = HEADER.size
+        while offset + FRAME.size <= size:
+            kind, tick, length = self._frame_at(offset)
+            if kind == INDEX or offset + FRAME.size + length > size:
+                break
+            if kind == KEYFRAME:
+                keyframes.append((tick, offset))
+            last_tick = tick
+            offset += FRAME.size + length
+        return keyframes, last_tick
+
+    def _frame_at(self, offset) -> tuple:
+        self._file.seek(offset)
+        return FRAME.unpack(self._file.read(FRAME.size))
+
+    def close(self) -> None:
+        self._file.close()
+
+    def seek(self, tick) -> int:
+        """
+        Move to the world after `tick` (clamped to the recorded range). Forward seeks within the current
+        keyframe interval apply deltas from where the player is; anything else starts from a keyframe.
+        :param tick: tick to show
+        :return: the tick the player is on
+        """
+        tick = max(self.first_tick, min(tick, self.last_tick))
+        if tick == self.tick:
+            return tick
+        k = bisect_right(self._keyframe_ticks, tick) - 1
+        keyframe_tick, offset = self.keyframes[k]
+        if self.tick is None or not keyframe_tick <= self.tick <= tick:
+            self._load_keyframe(offset)
+        while self.tick < tick:
+            kind, frame_tick, length = self._frame_at(self._next)
+            payload = self._file.read(length)
+            self._next += FRAME.size + length
+            if kind == DELTA:
+                self.apply_delta(frame_tick, zlib.decompress(payload))
+            elif kind != KEYFRAME:
+                break
+        return self.tick
+
+    def _load_keyframe(self, offset) -> None:
+        kind, tick, length = self._frame_at(offset)
+        self.load_keyframe(tick, zlib.decompress(self._file.read(length)))
+        self._next = offset + FRAME.size + length
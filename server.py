@@ -0,0 +1,300 @@
+# server.py
+"""
+Streaming server (--serve) and remote viewer (--connect).
+
+The server advances a Simulation at the target tick rate and streams every tick to any number of TCP viewers.
+Protocol (little-endian): the server opens with HELLO (magic, width, height, capacity, last tick), then sends
+frames in the replay.py layout (kind, tick, payload length, zlib-compressed payload):
+
+- K keyframe and D delta: the replay.py payloads (grass changes, rabbit moves, births, deaths, energy changes)
+- S stats: the energy summary of the tick (see stats.StatsSummary) and its grass count; ends every tick
+- E end: the run is over and the server closes the connection
+
+Each tick is encoded and compressed once and shared by all viewers. Every viewer has its own queue of pending
+ticks, emptied by its own writer task as fast as the socket's flow control (drain()) allows, so a slow viewer
+only holds up its own queue. Once a queue holds `max_pending` ticks it is dropped and replaced by a keyframe
+of the latest tick: a viewer that cannot keep up gets coalesced frames and the simulation never waits for it.
+A new viewer starts with a keyframe too.
+
+The simulation steps in a worker thread, so the event loop keeps accepting viewers and writing to them while
+a big world computes a tick.
+"""
+import asyncio
+import socket
+import struct
+import threading
+import zlib
+from collections import deque
+
+from replay import DELTA, FRAME, KEYFRAME, DeltaDecoder, DeltaEncoder
+from stats import HIST_BINS, HISTORY, StatsSummary, StreamingStats
+from stepper import CATCH_UP_SECS, Snapshot
+
+MAGIC = b"ECOSTRM1"
+HELLO = struct.Struct("<8sIIIQ")  # magic, width, height, capacity, last tick
+STATS_PAYLOAD = struct.Struct(f"<IddiiiiiI{HIST_BINS}I")  # count, mean, sd, min, max, p10, p50, p90, grass, hist
+STATS, END = b"S", b"E"
+LINGER_SECS = 5.0  # how long the end of a run waits for viewers to take their last frames
+SEND_BUFFER = 256 * 1024  # bytes buffered per viewer below the queue; more only adds lag for a slow viewer
+
+
+def _frame(kind, tick, payload) -> bytes:
+    data = zlib.compress(payload)
+    return FRAME.pack(kind, tick, len(data)) + data
+
+
+def encode_stats(summary, grass) -> bytes:
+    """
+    S payload of a tick.
+    :param summary: stats.StatsSummary of the tick
+    :param grass: grass count of the tick
+    :return: payload bytes
+    """
+    s = summary
+    return STATS_PAYLOAD.pack(s.count, s.mean, s.sd, s.min, s.max, s.p10, s.p50, s.p90, grass, *s.hist)
+
+
+class _Connection:
+    """
+    Server side of one viewer: its writer and the frames waiting for it, one bytes object per tick.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = deque()
+        self.wake = asyncio.Event()
+        self.needs_keyframe = True
+        self.closing = False
+        self.task = asyncio.current_task()
+
+
+class StreamServer:
+    """
+    Steps a Simulation to its last tick while streaming every tick to the connected viewers.
+    """
+
+    def __init__(self, sim, host, port, tps, max_pending=8, history=HISTORY):
+        """
+        :param sim: Simulation to run
+        :param host: interface to listen on
+        :param port: TCP port (0 picks a free one, see address)
+        :param tps: target ticks per second
+        :param max_pending: ticks a viewer may fall behind before its queue is coalesced into one keyframe
+        :param history: population / coverage history kept by the stats when sim has none yet
+        """
+        self.sim = sim
+        self.host = host
+        self.port = port
+        self.tps = tps
+        self.max_pending = max_pending
+        if sim.stats is None:
+            sim.stats = StreamingStats(sim.rabbits, history)
+        self._encoder = DeltaEncoder(sim)
+        self._connections = set()
+        self._ended = False
+        self.address = None  # (host, port) once listening
+        self.served = 0  # viewers that connected
+        self.coalesced = 0  # ticks dropped from the queues of slow viewers
+
+    def serve(self, on_listen=None) -> None:
+        """
+        Run the server until the simulation is done and the viewers have their last frames.
+        :param on_listen: optional on_listen((host, port)) callback once the socket is listening
+        :return: None
+        """
+        asyncio.run(self.run(on_listen))
+
+    async def run(self, on_listen=None) -> None:
+        loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._accept, self.host, self.port)
+        self.address = server.sockets[0].getsockname()[:2]
+        if on_listen is not None:
+            on_listen(self.address)
+        async with server:
+            tick_dt = 1.0 / self.tps
+            next_tick = loop.time()
+            while not self.sim.done:
+                delay = next_tick - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_tick = max(next_tick + tick_dt, loop.time() - CATCH_UP_SECS)
+                delta, stats = await loop.run_in_executor(None, self._advance)
+                self._broadcast(delta, stats)
+
+            self._ended = True
+            end = _frame(END, self.sim.tick, b"")
+            for conn in self._connections:
+                if conn.needs_keyframe:  # connected during the last tick
+                    conn.pending.append(self._keyframe())
+                conn.pending.append(end)
+                conn.closing = True
+                conn.wake.set()
+            tasks = [conn.task for conn in self._connections]
+            if tasks:
+                await asyncio.wait(tasks, timeout=LINGER_SECS)
+            for conn in list(self._connections):  # still behind: drop what they have not taken
+                conn.pending.clear()
+                conn.writer.transport.abort()
+            if tasks:
+                await asyncio.wait(tasks)
+
+    def _advance(self) -> tuple:
+        """
+        Step one tick and encode it. Runs in a worker thread; nothing else touches the world meanwhile.
+        :return: (delta frame, stats frame)
+        """
+        sim = self.sim
+        sim.step()
+        delta = _frame(DELTA, sim.tick, self._encoder.delta(sim))
+        return delta, _frame(STATS, sim.tick, encode_stats(sim.stats.summary(), sim.grass))
+
+    def _keyframe(self) -> bytes:
+        sim = self.sim
+        return (_frame(KEYFRAME, sim.tick, self._encoder.keyframe())
+                + _frame(STATS, sim.tick, encode_stats(sim.stats.summary(), sim.grass)))
+
+    def _broadcast(self, delta, stats) -> None:
+        keyframe = None  # built once per tick, for the viewers that need one
+        for conn in self._connections:
+            if conn.needs_keyframe or len(conn.pending) >= self.max_pending:
+                if not conn.needs_keyframe:
+                    self.coalesced += len(conn.pending)
+                conn.pending.clear()
+                if keyframe is None:
+                    keyframe = self._keyframe()
+                conn.pending.append(keyframe)
+                conn.needs_keyframe = False
+            else:
+                conn.pending.append(delta + stats)
+            conn.wake.set()
+
+    async def _accept(self, reader, writer) -> None:
+        conn = _Connection(writer)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+        writer.transport.set_write_buffer_limits(high=SEND_BUFFER)
+        p = self.sim.params
+        writer.write(HELLO.pack(MAGIC, p.width, p.height, p.capacity, p.ticks))
+        self.served += 1
+        if self._ended:
+            conn.pending.extend((self._keyframe(), _frame(END, self.sim.tick, b"")))
+            conn.closing = True
+        self._connections.add(conn)
+        try:
+            while True:
+                while conn.pending:
+                    writer.write(conn.pending.popleft())
+                    await writer.drain()
+                if conn.closing:
+                    break
+                conn.wake.clear()
+                await conn.wake.wait()
+        except OSError:  # the viewer went away
+            pass
+        finally:
+            self._connections.discard(conn)
+            writer.close()
+
+
+def _read_exact(f, n) -> bytes:
+    data = f.read(n)
+    if len(data) < n:
+        raise ConnectionError("stream ended in the middle of a frame")
+    return data
+
+
+class StreamClient:
+    """
+    Viewer side of the stream: reads frames on a background thread, applies them to a replay.DeltaDecoder and
+    publishes a stepper.Snapshot of every received tick in `latest` (grid, grass and a stats summary whose
+    history holds the ticks this viewer received).
+    """
+
+    def __init__(self, host, port, history=HISTORY):
+        """
+        :param host: server host
+        :param port: server port
+        :param history: population / coverage history to keep for the sparklines
+        """
+        self.host = host
+        self.port = port
+        self._sock = socket.create_connection((host, port))
+        self._file = self._sock.makefile("rb")
+        magic, width, height, capacity, self.last_tick = HELLO.unpack(_read_exact(self._file, HELLO.size))
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{host}:{port} is not an EcoSim server.")
+        self.world = DeltaDecoder(width, height, capacity)
+        self.population = deque(maxlen=history)
+        self.coverage = deque(maxlen=history)
+        self.latest = None
+        self.skipped = 0  # ticks coalesced away by the server
+        self.ended = False  # the server sent the end of the run
+        self.error = None  # exception that stopped the reader, if any
+        self.finished = False  # the reader thread has exited
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="ecosim-viewer", daemon=True)
+
+    @property
+    def width(self) -> int:
+        return self.world.width
+
+    @property
+    def height(self) -> int:
+        return self.world.height
+
+    @property
+    def capacity(self) -> int:
+        return self.world.capacity
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Disconnect and wait for the reader thread.
+        """
+        self._closing = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        if self._thread.is_alive():
+            self._thread.join()
+        self._file.close()
+        self._sock.close()
+
+    def _run(self) -> None:
+        world = self.world
+        total = world.width * world.height
+        try:
+            while True:
+                head = self._file.read(FRAME.size)
+                if not head:
+                    break
+                if len(head) < FRAME.size:
+                    raise ConnectionError("stream ended in the middle of a frame")
+                kind, tick, length = FRAME.unpack(head)
+                data = zlib.decompress(_read_exact(self._file, length))
+                if kind == KEYFRAME:
+                    if world.tick is not None:
+                        self.skipped += max(0, tick - world.tick - 1)
+                    world.load_keyframe(tick, data)
+                elif kind == DELTA:
+                    world.apply_delta(tick, data)
+                elif kind == STATS:
+                    count, mean, sd, emin, emax, p10, p50, p90, grass, *hist = STATS_PAYLOAD.unpack(data)
+                    self.population.append(count)
+                    self.coverage.append(grass / total)
+                    stats = StatsSummary(count, mean, sd, emin, emax, p10, p50, p90, tuple(hist),
+                                         tuple(self.population), tuple(self.coverage))
+                    self.latest = Snapshot(tick, world.grid, None, world.grass, stats)
+                elif kind == END:
+                    self.ended = True
+                    break
+        except Exception as e:  # handed to the UI thread, which re-raises it once curses is shut down
+            if not self._closing:
+                self.error = e
+        finally:
+            self.finished = True
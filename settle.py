@@ -0,0 +1,73 @@
+# settle.py
+"""
+Stop rules for runs that have settled.
+
+A SettleDetector watches the (grass, population) series of a run and reports when the last `window` ticks
+look settled:
+
+- steady: coverage varies by at most `tol` (as a fraction of the grid) and the population by at most `tol`
+  relative to its mean
+- cycle:  the window repeats exactly with some period p <= window // 2
+
+Simulation.run() then stops and extrapolates the coverage accumulators to the last tick by repeating the
+settled pattern. Unlike the fast-forward after extinction this is an estimate, so it is opt-in.
+"""
+from collections import deque
+
+RULES = ("none", "steady", "cycle")
+
+
+class SettleDetector:
+    """
+    Sliding window over the last `window` ticks of (grass, population).
+    """
+
+    def __init__(self, rule, window, tol, cells):
+        """
+        :param rule: 'steady' or 'cycle'
+        :param window: number of ticks that have to look settled
+        :param tol: steady-state tolerance (fraction of the grid for coverage, relative for the population)
+        :param cells: number of cells in the grid
+        """
+        self.rule = rule
+        self.window = window
+        self.tol = tol
+        self.cells = cells
+        self.history = deque(maxlen=window)
+
+    def observe(self, grass, population) -> int | None:
+        """
+        Add one tick to the window.
+        :param grass: grassy cells after the tick
+        :param population: living rabbits after the tick
+        :return: length of the pattern to repeat (the period, or the window for a steady state), or None
+        """
+        history = self.history
+        history.append((grass, population))
+        if len(history) < self.window:
+            return None
+        if self.rule == "steady":
+            return self.window if self._steady() else None
+        return self._period()
+
+    def pattern(self, period) -> list[int]:
+        """
+        Grass counts of the last `period` ticks, oldest first: the pattern the rest of the run repeats.
+        """
+        return [grass for grass, _ in list(self.history)[-period:]]
+
+    def _steady(self) -> bool:
+        grass = [g for g, _ in self.history]
+        population = [p for _, p in self.history]
+        if max(grass) - min(grass) > self.tol * self.cells:
+            return False
+        return max(population) - min(population) <= self.tol * sum(population) / len(population)
+
+    def _period(self) -> int | None:
+        history = list(self.history)
+        last = len(history) - 1
+        for period in range(1, len(history) // 2 + 1):
+            if history[last] == history[last - period] and all(
+                    history[i] == history[i - period] for i in range(period, last)):
+                return period
+        return None
@@ -0,0 +1,426 @@
+# sharded.py
+"""
+Multi-process engine: the grid is split into horizontal strips, each owned by one worker process.
+
+Every tick a strip runs the usual pipeline on its own rows. Rabbits whose move or birth crosses into a
+neighbouring strip are sent to that strip in a border (halo) exchange, and the owner of the target row
+settles them together with its own rabbits, with the rules of EcoSim.resolve_moves_lottery and
+EcoSim.reproduce (the ticket lotteries and birth tile orders are keyed.py's own functions):
+
+- moves: nobody moves onto a tile that is already full; when more rabbits apply for a tile than its
+  capacity, only (capacity - occupants) of them move in, the ones holding the lowest lottery tickets
+- births: a parent tries its in-bounds neighbours in a random order, then its own tile. Each try is a claim
+  on the target tile and a tile grants as many claims as it has free slots, lowest tickets first;
+  refused parents try their next tile in the following round
+- eating: when several rabbits stand on a grassy tile, the one with the lowest id eats it
+
+Every draw comes from crng, keyed by (seed, tick, rabbit id, purpose), and each strip keeps its rabbits in
+id order, so a seeded run gives identical results for any number of workers. It does not reproduce the
+shared-RNG engines, whose draws depend on the loop order of the whole population.
+
+    with ShardedSimulation(SimParams(width=2000, height=2000, rabbits=200000, seed=1), workers=8) as sim:
+        sim.run()
+        print(sim.summary())
+"""
+import multiprocessing
+import os
+import random
+from operator import itemgetter
+
+import crng
+import topology
+from keyed import BIRTH_ROUNDS, birth_orders, birth_tiles, lowest_tickets
+
+
+def strip_bounds(height, workers) -> list[tuple]:
+    """
+    Split the rows into contiguous strips of (almost) equal height.
+    :param height: grid height
+    :param workers: number of strips, at most height
+    :return: list of (first row, end row) pairs, top to bottom
+    """
+    return [(height * i // workers, height * (i + 1) // workers) for i in range(workers)]
+
+
+def initial_cells(params, seed) -> list[int]:
+    """
+    Flat cell index of every initial rabbit, drawn as the other engines place them; rabbit i gets id i.
+    """
+    return random.Random(seed).sample(range(params.width * params.height), params.rabbits)
+
+
+class Strip:
+    """
+    Rows [y0, y1) of the world and the rabbits standing on them.
+    The grid holds only the strip's rows (row y is grid[y - y0]); rabbits are [id, x, y, energy] lists in id
+    order with world coordinates. up / down are connections to the neighbouring strips, None at the edges.
+    """
+
+    def __init__(self, params, seed, y0, y1, up=None, down=None):
+        self.params = params
+        self.seed = seed
+        self.y0 = y0
+        self.y1 = y1
+        self.up = up
+        self.down = down
+        self.tick = 0
+        self.birth_orders = birth_orders(topology.get(params.width, params.height))
+        self.grid = [[[0, params.capacity] for _ in range(params.width)] for _ in range(y1 - y0)]
+        self.rabbits = []
+        for rabbit_id, cell in enumerate(initial_cells(params, seed)):
+            y, x = divmod(cell, params.width)
+            if y0 <= y < y1:
+                self.rabbits.append([rabbit_id, x, y, params.energy_start])
+                self.grid[y - y0][x][1] -= 1
+
+    def _exchange(self, to_up, to_down) -> tuple:
+        """
+        Swap one message with each neighbour. Between two strips the upper one always sends first, so two
+        strips never block each other by both sending a message larger than the pipe buffer.
+        :return: (message from the strip above, message from the strip below)
+        """
+        from_up = from_down = []
+        if self.up is not None:
+            from_up = self.up.recv()
+            self.up.send(to_up)
+        if self.down is not None:
+            self.down.send(to_down)
+            from_down = self.down.recv()
+        return from_up, from_down
+
+    def _route(self, y, item, local, to_up, to_down) -> None:
+        """
+        File item under the strip that owns row y.
+        """
+        if y < self.y0:
+            to_up.append(item)
+        elif y >= self.y1:
+            to_down.append(item)
+        else:
+            local.append(item)
+
+    def step(self) -> tuple:
+        """
+        Advance the strip by one tick, in lockstep with its neighbours.
+        :return: (grass cells, rabbits) of the strip after the tick
+        """
+        self._move()
+        eaten = self._eat()
+        grass = self._regrow(eaten)
+        self._reproduce()
+        self._cull()
+        self.tick += 1
+        return grass, len(self.rabbits)
+
+    def _move(self) -> None:
+        """
+        Decide, resolve and apply this tick's moves, handing border crossers to the neighbouring strips.
+        """
+        p = self.params
+        grid, y0, cap = self.grid, self.y0, p.capacity
+        move_key = crng.stream(self.seed, self.tick, crng.MOVE)
+        lottery_key = crng.stream(self.seed, self.tick, crng.LOTTERY)
+
+        occupants = {}
+        applicants = []
+        to_up, to_down = [], []
+        for rabbit in self.rabbits:
+            _, x, y, _ = rabbit
+            occupants[(x, y)] = occupants.get((x, y), 0) + 1
+            dx, dy = crng.DIRECTIONS[crng.below(move_key, rabbit[0], 4)]
+            if 0 <= x + dx < p.width and 0 <= y + dy < p.height:  # out of bounds: propose to stay
+                x, y = x + dx, y + dy
+            self._route(y, (rabbit, x, y), applicants, to_up, to_down)
+        from_up, from_down = self._exchange(to_up, to_down)
+
+        # bucket by target tile; a tile is settled by its owner with everybody who applied for it
+        by_tile = {}
+        for application in applicants + from_up + from_down:
+            by_tile.setdefault(application[1:], []).append(application)
+        winners = []
+        for tile, bucket in by_tile.items():
+            same = occupants.get(tile, 0)
+            if same >= cap:  # target tile is already maxed out, everybody stays
+                continue
+            if len(bucket) > cap:
+                bucket = lowest_tickets(lottery_key, bucket, cap - same, lambda a: a[0][0])
+            winners += bucket
+
+        # tell the neighbours which of their rabbits moved in, and learn which of ours left
+        incoming = [(rabbit, x, y) for rabbit, x, y in winners if not self.y0 <= rabbit[2] < self.y1]
+        accepted_up = [rabbit[0] for rabbit, _, _ in incoming if rabbit[2] < self.y0]
+        accepted_down = [rabbit[0] for rabbit, _, _ in incoming if rabbit[2] >= self.y1]
+        left_up, left_down = self._exchange(accepted_up, accepted_down)
+        left = set(left_up) | set(left_down)
+        targets = {rabbit[0]: (x, y) for rabbit, x, y in winners}
+
+        rabbits = []
+        for rabbit in self.rabbits:
+            _, x, y, _ = rabbit
+            if rabbit[0] in left:
+                grid[y - y0][x][1] += 1
+                continue
+            target = targets.get(rabbit[0], (x, y))
+            if target == (x, y):  # Rabbit is staying idle on his tile
+                rabbit[3] -= p.idle_cost
+            else:
+                grid[y - y0][x][1] += 1
+                rabbit[1], rabbit[2] = target
+                rabbit[3] -= p.move_cost
+                grid[target[1] - y0][target[0]][1] -= 1
+            rabbits.append(rabbit)
+        for rabbit, x, y in incoming:
+            rabbits.append([rabbit[0], x, y, rabbit[3] - p.move_cost])
+            grid[y - y0][x][1] -= 1
+        if incoming:
+            rabbits.sort()
+        self.rabbits = rabbits
+
+    def _eat(self) -> list:
+        """
+        Rabbits on grassy tiles eat, lowest id first, and set the regrow timer.
+        :return: list of eaten cells
+        """
+        p = self.params
+        grid, y0 = self.grid, self.y0
+        eaten = []
+        for rabbit in self.rabbits:
+            cell = grid[rabbit[2] - y0][rabbit[1]]
+            if cell[0] == 0:
+                cell[0] = p.regrow
+                rabbit[3] += p.eat_gain
+                eaten.append(cell)
+        return eaten
+
+    def _regrow(self, eaten) -> int:
+        """
+        Decrement every timer of the strip except on tiles eaten this tick.
+        :return: grassy cells of the strip
+        """
+        if self.params.regrow > 0:
+            for cell in eaten:  # cancel the decrement below; each eaten tile is listed once
+                cell[0] += 1
+        grass = 0
+        for row in self.grid:
+            for cell in row:
+                if cell[0] > 0:
+                    cell[0] -= 1
+                if cell[0] == 0:
+                    grass += 1
+        return grass
+
+    def _reproduce(self) -> None:
+        """
+        Parents pay the reproduction cost and claim a tile for their infant, in BIRTH_ROUNDS claim rounds.
+        """
+        p = self.params
+        grid, y0 = self.grid, self.y0
+        order_key = crng.stream(self.seed, self.tick, crng.BIRTH_ORDER)
+        claim_key = crng.stream(self.seed, self.tick, crng.BIRTH_CLAIM)
+
+        orders = self.birth_orders
+        pending = []
+        for rabbit in self.rabbits:
+            if rabbit[3] >= p.repro_threshold:
+                rabbit[3] -= p.repro_cost  # drain energy if either it successfully gives birth or fails
+                rabbit_id, x, y, _ = rabbit
+                order = orders[crng.below(order_key, rabbit_id, len(orders))]
+                pending.append((rabbit_id, birth_tiles(order, x, y)))
+
+        born = []
+        for attempt in range(BIRTH_ROUNDS):
+            claims, to_up, to_down = [], [], []
+            for rabbit_id, tiles in pending:
+                x, y = tiles[attempt]
+                self._route(y, (rabbit_id, x, y), claims, to_up, to_down)
+            from_up, from_down = self._exchange(to_up, to_down)
+
+            by_tile = {}
+            for claim in claims + from_up + from_down:
+                by_tile.setdefault(claim[1:], []).append(claim)
+            granted = set()
+            for (x, y), bucket in by_tile.items():
+                cell = grid[y - y0][x]
+                if cell[1] <= 0:
+                    continue
+                if len(bucket) > cell[1]:
+                    bucket = lowest_tickets(claim_key, bucket, cell[1], itemgetter(0))
+                for rabbit_id, _, _ in bucket:
+                    cell[1] -= 1  # consume 1 free slot
+                    born.append([crng.child_id(self.seed, self.tick, rabbit_id), x, y, p.spawn_energy])
+                    granted.add(rabbit_id)
+
+            granted_up = [rabbit_id for rabbit_id, _, _ in from_up if rabbit_id in granted]
+            granted_down = [rabbit_id for rabbit_id, _, _ in from_down if rabbit_id in granted]
+            from_up, from_down = self._exchange(granted_up, granted_down)
+            granted.update(from_up, from_down)
+            pending = [(rabbit_id, tiles) for rabbit_id, tiles in pending
+                       if rabbit_id not in granted and attempt + 1 < len(tiles)]
+
+        if born:
+            self.rabbits += born
+            self.rabbits.sort()
+
+    def _cull(self) -> None:
+        """
+        Remove rabbits whose energy reached 0 and free their slot.
+        """
+        grid, y0 = self.grid, self.y0
+        for rabbit in self.rabbits:
+            if rabbit[3] <= 0:
+                grid[rabbit[2] - y0][rabbit[1]][1] += 1
+        self.rabbits = [rabbit for rabbit in self.rabbits if rabbit[3] > 0]
+
+
+def _worker(params, seed, y0, y1, up, down, conn) -> None:
+    """
+    Worker process: own one strip and serve commands from the ShardedSimulation until told to close.
+    """
+    strip = Strip(params, seed, y0, y1, up, down)
+    while True:
+        command, arg = conn.recv()
+        if command == "run":
+            conn.send([strip.step() for _ in range(arg)])
+        elif command == "state":
+            conn.send((strip.grid, strip.rabbits))
+        else:
+            break
+    conn.close()
+
+
+class ShardedSimulation:
+    """
+    A Simulation-like run whose strips live in worker processes. Exposes the same run loop, accumulators and
+    summary as simulation.Simulation; the world itself is only collected on request (world()).
+    """
+
+    # ticks run per command, so the workers only synchronise with the coordinator once per batch
+    BATCH = 64
+
+    def __init__(self, params, workers=None):
+        """
+        :param params: SimParams of the run (engine, store and regrow_mode do not apply)
+        :param workers: number of worker processes (default: all cores), capped at the grid height
+        """
+        if params.boundary != "bounded":
+            raise ValueError("Sharded runs only support the bounded topology.")
+        self.params = params
+        self.seed = params.seed if params.seed is not None else random.randrange(1 << 63)
+        self.workers = max(1, min(workers or os.cpu_count() or 1, params.height))
+        self.profiler = None  # phase profiling is not available across processes
+        self.stats = None  # nor are streaming stats
+        self.extinct_at = None  # every tick is stepped here, extinct or not; no stop rules either
+        self.settled_at = None
+
+        links = [multiprocessing.Pipe() for _ in range(self.workers - 1)]  # links[i] joins strip i and i + 1
+        self._conns = []
+        self._procs = []
+        for i, (y0, y1) in enumerate(strip_bounds(params.height, self.workers)):
+            conn, child_conn = multiprocessing.Pipe()
+            up = links[i - 1][1] if i > 0 else None
+            down = links[i][0] if i < self.workers - 1 else None
+            proc = multiprocessing.Process(target=_worker, args=(params, self.seed, y0, y1, up, down, child_conn),
+                                           daemon=True)
+            proc.start()
+            self._conns.append(conn)
+            self._procs.append(proc)
+
+        self.tick = 0
+        self.total_cells = params.width * params.height
+        self.grass = self.total_cells
+        self.population = params.rabbits
+        self.sum_coverage = 0.0
+        self.min_cov = 1.0
+        self.max_cov = 0.0
+
+    @property
+    def done(self) -> bool:
+        """
+        True once the configured number of ticks has been simulated.
+        """
+        return self.tick >= self.params.ticks
+
+    def grass_count(self) -> int:
+        """
+        Number of grassy cells after the last tick.
+        """
+        return self.grass
+
+    def step(self) -> int:
+        """
+        Advance the world by one tick.
+        :return: grass count after the tick
+        """
+        self.run(1)
+        return self.grass
+
+    def run(self, n=None, on_tick=None) -> None:
+        """
+        Advance n ticks, or until the configured tick count is reached. Workers run BATCH ticks per command;
+        on_tick is called for every tick once its batch is back.
+        :param n: number of ticks to run (default: all remaining ticks)
+        :param on_tick: optional callback on_tick(sim, grass) after every tick
+        :return: None
+        """
+        end = self.params.ticks if n is None else min(self.params.ticks, self.tick + n)
+        while self.tick < end:
+            batch = min(self.BATCH, end - self.tick)
+            for conn in self._conns:
+                conn.send(("run", batch))
+            for per_strip in zip(*(conn.recv() for conn in self._conns)):
+                self.grass = sum(grass for grass, _ in per_strip)
+                self.population = sum(rabbits for _, rabbits in per_strip)
+                cov = self.grass / self.total_cells
+                self.sum_coverage += cov
+                self.min_cov = min(self.min_cov, cov)
+                self.max_cov = max(self.max_cov, cov)
+                self.tick += 1
+                if on_tick is not None:
+                    on_tick(self, self.grass)
+
+    def world(self) -> tuple:
+        """
+        Collect the full world from the workers.
+        :return: (grid, rabbits): the grid as nested [timer, free_slots] lists and the rabbits as
+                 [id, x, y, energy] lists in id order
+        """
+        for conn in self._conns:
+            conn.send(("state", None))
+        grid, rabbits = [], []
+        for conn in self._conns:
+            rows, strip_rabbits = conn.recv()
+            grid += rows
+            rabbits += strip_rabbits
+        rabbits.sort()
+        return grid, rabbits
+
+    def summary(self) -> dict:
+        """
+        Coverage statistics over the ticks simulated so far, plus the current population.
+        :return: dict with ticks, avg/min/max coverage (fractions) and rabbits
+        """
+        return {
+            "ticks": self.tick,
+            "avg_coverage": self.sum_coverage / self.tick if self.tick else 0.0,
+            "min_coverage": self.min_cov,
+            "max_coverage": self.max_cov,
+            "rabbits": self.population,
+        }
+
+    def close(self) -> None:
+        """
+        Stop the worker processes.
+        """
+        for conn in self._conns:
+            conn.send(("close", None))
+            conn.close()
+        for proc in self._procs:
+            proc.join()
+        self._conns = []
+        self._procs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
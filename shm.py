@@ -0,0 +1,350 @@
+# shm.py
+"""
+Live inspection of a headless run through shared memory (--shm publishes, --attach views).
+
+The publisher copies the world into one multiprocessing.shared_memory segment after a tick: the grid as
+int32 (timer, free slots) pairs in row-major order, i.e. the NumPy engine's (height, width, 2) layout, and the
+rabbit x / y / energy columns as int32. Other processes map the segment and read it in place as NumPy arrays,
+without copying and without any cooperation from the run.
+
+Consistency comes from a seqlock: the publisher makes the sequence counter odd before it writes and even
+again after, so a reader that saw the same even counter before and after using the arrays knows they held
+one whole tick (read() / valid()). Python issues no memory barriers, so the counter alone only guarantees that
+where the CPU keeps stores and loads in program order, i.e. on x86-64; on weakly ordered CPUs (ARM, POWER)
+valid() is best effort. snapshot() does not depend on it: inside the critical section the publisher also
+writes a CRC-32 of the tick's state and arrays, and snapshot() retries until its copy matches that checksum.
+
+Publishing costs a pass over the grid, so the publisher skips ticks to keep that below PUBLISH_SHARE of the
+run's time (and at least min_interval apart); the last tick is always published.
+
+The segment holds the grid (8 bytes a tile) and room for ROOM_GROWTH times the population (12 bytes a rabbit),
+not for the world's capacity, which on a large world is far more than any real population. A population that
+outgrows the room moves the run to a new, larger segment of the same name: the publisher marks the old one as
+moved (MOVED in the done word) and unlinks it, and readers map the new one on their next read().
+"""
+import struct
+import time
+import zlib
+from array import array
+from dataclasses import dataclass
+from itertools import chain
+from multiprocessing import shared_memory
+from operator import itemgetter
+from time import perf_counter
+
+MAGIC = b"ECOSHM02"
+# magic, sequence, width, height, capacity, done, max rabbits, tick, rabbits, grass, last tick, checksum
+HEADER = struct.Struct("=8sQIIIIQQQQQI")
+SEQ = struct.Struct("=Q")
+SEQ_OFFSET = 8
+STATE_OFFSET = 40  # tick, rabbits, grass
+STATE = struct.Struct("=QQQ")
+DONE_OFFSET = 28
+DONE = struct.Struct("=I")
+MOVED = 2  # done word of a segment replaced by a larger one of the same name
+CHECK_OFFSET = 72
+CHECK = struct.Struct("=I")
+GRID_OFFSET = 128
+PUBLISH_SHARE = 0.05  # most of the run's time that publishing may take
+WRITE_TIMEOUT = 1.0  # a publisher mid-write for longer than this is taken for dead...
+WRITE_RATE = 50e6  # ...or than it takes to write the segment at this many bytes per second, if longer
+ROOM_GROWTH = 2  # rabbit slots per living rabbit when the segment is (re-)created
+MIN_ROOM = 1024  # fewest rabbit slots of a segment
+
+
+def _room(width, height, capacity, population) -> int:
+    """
+    Rabbit slots for a segment: ROOM_GROWTH times the population, up to the world's capacity.
+    """
+    return min(width * height * capacity, max(MIN_ROOM, ROOM_GROWTH * population))
+
+
+def _layout(width, height, max_rabbits) -> tuple:
+    """
+    Byte offsets of the rabbit columns, the column length and the segment size.
+    :return: (x offset, y offset, energy offset, max rabbits, size)
+    """
+    x_offset = GRID_OFFSET + 8 * width * height
+    y_offset = x_offset + 4 * max_rabbits
+    e_offset = y_offset + 4 * max_rabbits
+    return x_offset, y_offset, e_offset, max_rabbits, e_offset + 4 * max_rabbits
+
+
+class ShmPublisher:
+    """
+    Owner of the segment: publish the Simulation into it with maybe_publish() after every tick, then close().
+    """
+
+    def __init__(self, sim, name=None, min_interval=0.05):
+        """
+        :param sim: Simulation to publish, in its current state (published right away)
+        :param name: segment name (default: a random one, see .name)
+        :param min_interval: minimum seconds between two publications
+        """
+        self.params = sim.params
+        self.width, self.height = sim.params.width, sim.params.height
+        self._seq = 0
+        self._create(name, _room(self.width, self.height, sim.params.capacity, len(sim.rabbits)))
+        self.name = self.shm.name
+        self.min_interval = min_interval
+        self._gap = min_interval
+        self._published_at = float("-inf")
+        self.published = 0
+        self.publish(sim)
+
+    def _create(self, name, max_rabbits) -> None:
+        """
+        Create the segment with room for max_rabbits and map its areas. Readers take it for mid-write until the
+        first publication.
+        """
+        p = self.params
+        x_offset, y_offset, e_offset, self.max_rabbits, size = _layout(p.width, p.height, max_rabbits)
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        buf = self.shm.buf
+        HEADER.pack_into(buf, 0, bytes(8), self._seq + 1, p.width, p.height, p.capacity, 0, max_rabbits, 0, 0, 0,
+                         p.ticks, 0)
+        buf[:len(MAGIC)] = MAGIC  # last, so a reader that sees the magic sees the whole header
+        self._grid = buf[GRID_OFFSET:x_offset].cast('i')
+        self._x = buf[x_offset:y_offset].cast('i')
+        self._y = buf[y_offset:e_offset].cast('i')
+        self._e = buf[e_offset:size].cast('i')
+        self._np_grid = None  # NumPy view of the grid area, for NumPy grids
+
+    def _move(self, population) -> None:
+        """
+        Replace the segment by a larger one of the same name, with room for population. Readers of the old one
+        see MOVED and map the new one.
+        """
+        self._seq += 2  # one whole write: readers holding views of the old segment see them invalidated
+        DONE.pack_into(self.shm.buf, DONE_OFFSET, MOVED)
+        SEQ.pack_into(self.shm.buf, SEQ_OFFSET, self._seq)
+        self._release()
+        self.shm.unlink()
+        self._create(self.name, _room(self.width, self.height, self.params.capacity, population))
+
+    def maybe_publish(self, sim) -> bool:
+        """
+        Publish sim unless the last publication was too recent.
+        :param sim: the published Simulation, right after a tick
+        :return: True if it was published
+        """
+        if perf_counter() - self._published_at < self._gap:
+            return False
+        self.publish(sim)
+        return True
+
+    def publish(self, sim, done=False) -> None:
+        """
+        Write the current tick into the segment.
+        :param sim: the published Simulation
+        :param done: mark the run as finished (nothing will be published after this)
+        :return: None
+        """
+        start = perf_counter()
+        grid, rabbits = sim.grid, sim.rabbits
+        if sim.wheel is not None:
+            sim.wheel.sync_timers(grid)  # the grid holds exact timers, as with the scan
+        n = len(rabbits)
+        if hasattr(rabbits, "energy"):
+            xs, ys, es = rabbits.x, rabbits.y, rabbits.energy
+        else:
+            xs, ys, es = (array('i', map(itemgetter(i), rabbits)) for i in range(3))
+        if not hasattr(grid, "shape"):
+            cells = array('i', chain.from_iterable(chain.from_iterable(grid)))
+        if n > self.max_rabbits:
+            self._move(n)
+
+        buf = self.shm.buf
+        self._seq += 1  # odd: writing
+        SEQ.pack_into(buf, SEQ_OFFSET, self._seq)
+        if hasattr(grid, "shape"):
+            if self._np_grid is None:
+                import numpy as np
+                self._np_grid = np.ndarray(grid.shape, dtype=np.int32, buffer=buf, offset=GRID_OFFSET)
+            self._np_grid[...] = grid
+        else:
+            self._grid[:] = cells
+        self._x[:n] = xs
+        self._y[:n] = ys
+        self._e[:n] = es
+        state = STATE.pack(sim.tick, n, sim.grass)
+        buf[STATE_OFFSET:STATE_OFFSET + STATE.size] = state
+        DONE.pack_into(buf, DONE_OFFSET, int(done))
+        CHECK.pack_into(buf, CHECK_OFFSET, checksum(state, self._grid, self._x[:n], self._y[:n], self._e[:n]))
+        self._seq += 1  # even: consistent
+        SEQ.pack_into(buf, SEQ_OFFSET, self._seq)
+
+        self.published += 1
+        self._published_at = perf_counter()
+        cost = self._published_at - start
+        self._gap = max(self.min_interval, cost * (1 - PUBLISH_SHARE) / PUBLISH_SHARE)
+
+    def _release(self) -> None:
+        for view in (self._grid, self._x, self._y, self._e):
+            view.release()
+        self._np_grid = None
+        self.shm.close()
+
+    def close(self) -> None:
+        """
+        Remove the segment. Readers that are attached keep their mapping of it.
+        """
+        self._release()
+        self.shm.unlink()
+
+
+def checksum(state, *arrays) -> int:
+    """
+    CRC-32 of the packed (tick, rabbits, grass) state followed by the bytes of the grid and rabbit columns.
+    """
+    crc = zlib.crc32(state)
+    for data in arrays:
+        crc = zlib.crc32(data, crc)
+    return crc
+
+
+class ShmRabbits:
+    """
+    The published rabbits as x / y / energy column views; iterates like a rabbit store.
+    """
+
+    def __init__(self, x, y, energy):
+        self.x = x
+        self.y = y
+        self.energy = energy
+
+    def __len__(self):
+        return len(self.energy)
+
+    def __iter__(self):
+        return zip(self.x.tolist(), self.y.tolist(), self.energy.tolist())
+
+
+@dataclass(frozen=True)
+class ShmFrame:
+    """
+    One read of the segment. grid and rabbits are views into shared memory unless the frame came from
+    snapshot(); version is the seqlock counter they were read under.
+    """
+    version: int
+    tick: int
+    grid: object  # (height, width, 2) int32 array: timer, free slots
+    rabbits: ShmRabbits
+    grass: int
+    done: bool
+
+
+def _attach(name) -> shared_memory.SharedMemory:
+    """
+    Map an existing segment without taking ownership of it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 registers every mapped segment and unlinks it when the reader exits
+        shm = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class ShmReader:
+    """
+    Reader of a segment written by ShmPublisher, in any process. Needs NumPy.
+    """
+
+    def __init__(self, name):
+        """
+        :param name: segment name given to the publisher (--shm)
+        """
+        self.name = name
+        self._retired = []  # segments the run moved away from, kept mapped for the frames read from them
+        self._map(_attach(name))
+
+    def _map(self, segment) -> None:
+        """
+        Map the areas of segment and make it the current one.
+        """
+        import numpy as np
+        buf = segment.buf
+        magic, _, self.width, self.height, self.capacity, _, max_rabbits, _, _, _, self.last_tick, _ = \
+            HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            segment.close()
+            raise ValueError(f"Shared memory segment {self.name!r} was not written by an EcoSim publisher.")
+        x_offset, y_offset, e_offset, _, size = _layout(self.width, self.height, max_rabbits)
+        self.shm = segment
+        self.write_timeout = max(WRITE_TIMEOUT, size / WRITE_RATE)
+        self._grid = np.ndarray((self.height, self.width, 2), dtype=np.int32, buffer=buf, offset=GRID_OFFSET)
+        self._x = np.ndarray((max_rabbits,), dtype=np.int32, buffer=buf, offset=x_offset)
+        self._y = np.ndarray((max_rabbits,), dtype=np.int32, buffer=buf, offset=y_offset)
+        self._e = np.ndarray((max_rabbits,), dtype=np.int32, buffer=buf, offset=e_offset)
+
+    def _follow(self) -> None:
+        """
+        Map the segment that replaced the current one (see MOVED), waiting for the publisher to create it.
+        """
+        self._retired.append(self.shm)  # closing it would pull the memory from under frames read from it
+        deadline = perf_counter() + self.write_timeout
+        while True:
+            try:
+                self._map(_attach(self.name))
+                return
+            except (FileNotFoundError, ValueError):  # not created yet, or its header not written yet
+                if perf_counter() > deadline:
+                    raise TimeoutError(f"The publisher of {self.name!r} did not re-create its segment.") from None
+                time.sleep(0.0002)
+
+    def _version(self) -> int:
+        return SEQ.unpack_from(self.shm.buf, SEQ_OFFSET)[0]
+
+    def read(self) -> ShmFrame:
+        """
+        The latest published tick as views into shared memory, with no copy. The publisher may overwrite
+        them at any time: check valid(frame) after using them and read again if it says False.
+        :return: ShmFrame
+        """
+        deadline = None
+        while True:
+            version = self._version()
+            if version % 2 == 0:
+                break
+            now = perf_counter()
+            deadline = deadline or now + self.write_timeout
+            if now > deadline:
+                raise TimeoutError(f"The publisher of {self.name!r} stopped in the middle of a write.")
+            time.sleep(0.0002)
+        (done,) = DONE.unpack_from(self.shm.buf, DONE_OFFSET)
+        if done == MOVED:
+            self._follow()
+            return self.read()
+        tick, n, grass = STATE.unpack_from(self.shm.buf, STATE_OFFSET)
+        rabbits = ShmRabbits(self._x[:n], self._y[:n], self._e[:n])
+        return ShmFrame(version, tick, self._grid, rabbits, grass, bool(done))
+
+    def valid(self, frame) -> bool:
+        """
+        True if nothing was published since frame was read, i.e. its views held one whole tick throughout.
+        """
+        return self._version() == frame.version
+
+    def snapshot(self) -> ShmFrame:
+        """
+        A consistent private copy of the latest published tick, checked against the publisher's checksum.
+        :return: ShmFrame whose arrays are copies
+        """
+        while True:
+            frame = self.read()
+            (check,) = CHECK.unpack_from(self.shm.buf, CHECK_OFFSET)
+            r = frame.rabbits
+            copy = ShmFrame(frame.version, frame.tick, frame.grid.copy(),
+                            ShmRabbits(r.x.copy(), r.y.copy(), r.energy.copy()), frame.grass, frame.done)
+            c = copy.rabbits
+            state = STATE.pack(copy.tick, len(c), copy.grass)
+            if self.valid(frame) and checksum(state, copy.grid, c.x, c.y, c.energy) == check:
+                return copy
+
+    def close(self) -> None:
+        self._grid = self._x = self._y = self._e = None
+        for segment in (*self._retired, self.shm):
+            segment.close()
+        self._retired = []
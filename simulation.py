@@ -0,0 +1,396 @@
+# simulation.py
+"""
+Importable simulation API.
+
+SimParams holds the validated settings of one run and Simulation owns its grid, rabbits, RNG and
+coverage accumulators, so any number of independent runs can live in one process:
+
+    sim = Simulation(SimParams(width=50, height=50, seed=7))
+    sim.run()
+    print(sim.summary())
+
+Once every rabbit is dead nothing but the grass timers changes, so run() jumps straight to the end and folds
+the remaining ticks into the coverage accumulators from the timer histogram; the result is exactly what
+stepping through them would give. A stop rule (see settle.py) can also end runs that settled into a steady
+state or a cycle.
+"""
+import math
+import random
+from dataclasses import dataclass, fields
+
+import config
+import crng
+import topology
+from regrow import RegrowWheel
+from settle import SettleDetector
+
+# tick pipeline, in order; each name is a Simulation method
+PHASES = ("decide_moves", "resolve_moves", "apply_moves", "eat", "regrow", "reproduce", "cull")
+
+# bump whenever a change alters the result of a seeded run; cached results (cache.py) of other versions are ignored
+ENGINE_VERSION = 1
+
+
+@dataclass
+class SimParams:
+    """
+    Settings of one simulation run. Field names and defaults match the CLI flags in config.py.
+    """
+    width: int = 30
+    height: int = 15
+    ticks: int = 200
+    capacity: int = 1
+    rabbits: int = 20
+    regrow: int = 10
+    seed: int | None = None
+    energy_start: int = 5
+    move_cost: int = 2
+    idle_cost: int = 0
+    eat_gain: int = 4
+    repro_threshold: int = 10
+    repro_cost: int = 5
+    infant_energy: int | None = None
+    engine: str = "list"
+    store: str = "list"
+    regrow_mode: str = "scan"
+    rng: str = "shared"
+    boundary: str = "bounded"
+    stop_rule: str = "none"
+    stop_window: int = 100
+    stop_tol: float = 0.01
+
+    def __post_init__(self):
+        error = config.world_error(self)
+        if error is not None:
+            raise ValueError(error)
+
+    @classmethod
+    def from_args(cls, args):
+        """
+        Build params from parsed CLI args, ignoring UI-only flags.
+        :param args: parsed args from config.get_args()
+        :return: SimParams
+        """
+        return cls(**{f.name: getattr(args, f.name) for f in fields(cls)})
+
+    @property
+    def spawn_energy(self) -> int:
+        """
+        Energy given to a newborn: infant_energy when set, otherwise the parent's reproduction cost.
+        """
+        return self.repro_cost if self.infant_energy is None else self.infant_energy
+
+
+def select_engine(name):
+    """
+    Pick the grid backend functions for the requested engine.
+    :param name: 'list' for the nested-list reference engine, 'numpy' for the array engine or 'chunked' for the
+                 sparse chunked engine
+    :return: tuple of (init_grid, grass_count, regrow_step, fast_forward_timers) functions
+    """
+    if name == "numpy":
+        import npgrid
+        return npgrid.init_grid, npgrid.grass_count, npgrid.regrow_step, npgrid.fast_forward_timers
+    if name == "chunked":
+        import chunked
+        return chunked.init_grid, chunked.grass_count, chunked.regrow_step, chunked.fast_forward_timers
+    import EcoSim
+    return EcoSim.init_grid, EcoSim.grass_count, EcoSim.regrow_step, EcoSim.fast_forward_timers
+
+
+def select_store(name, rng="shared"):
+    """
+    Pick the rabbit store. Both stores expose the same phase functions with the same RNG draws.
+    :param name: 'list' for [x, y, energy] lists or 'table' for the struct-of-arrays RabbitTable
+    :param rng: 'shared' for one random.Random drawn in loop order, 'keyed' for per-rabbit crng streams
+                (table store only)
+    :return: module providing place_rabbits, decide_moves, resolve_moves_lottery, apply_moves, eat_cells,
+             reproduce and remove_dead_bodies
+    """
+    if rng == "keyed":
+        import keyed
+        return keyed
+    if name == "table":
+        import population
+        return population
+    import EcoSim
+    return EcoSim
+
+
+class Simulation:
+    """
+    One simulation run: world state, RNG and the coverage accumulators printed in the summary.
+    """
+
+    def __init__(self, params, grid=None, rabbits=None):
+        """
+        :param params: SimParams of the run
+        :param grid: optional existing grid in the engine's format (e.g. a restored checkpoint)
+        :param rabbits: optional existing rabbits in the store's format, required with grid
+        """
+        self.params = params
+        self.rng = crng.Streams(params.seed) if params.rng == "keyed" else random.Random(params.seed)
+        make_grid, self._count_grass, self._regrow_grid, self._fast_forward_timers = select_engine(params.engine)
+        self.store = select_store(params.store, params.rng)
+        self.topology = topology.get(params.width, params.height, params.boundary)
+
+        if grid is None:
+            self.grid = make_grid(params.width, params.height, params.capacity)
+            self.rabbits = self.store.place_rabbits(self.grid, params.rabbits, self.rng, params.energy_start)
+        else:
+            self.grid = grid
+            self.rabbits = rabbits
+        self.wheel = RegrowWheel(self.grid, params.regrow) if params.regrow_mode == "wheel" else None
+
+        # optional profiler.PhaseProfiler; when set, step() runs through it
+        self.profiler = None
+        # optional stats.StreamingStats of the current rabbits; when set, the phases report their energy changes
+        # to it and every tick is added to its history
+        self.stats = None
+        self.settle = None
+        if params.stop_rule != "none":
+            self.settle = SettleDetector(params.stop_rule, params.stop_window, params.stop_tol,
+                                         params.width * params.height)
+        self.skip_extinct = True  # False makes run() step through extinct ticks too (e.g. to record them)
+        self.extinct_at = None  # tick run() fast-forwarded from after the last rabbit died
+        self.settled_at = None  # tick the stop rule ended the run on
+
+        # per-tick phase outputs, overwritten every tick
+        self.proposals = None
+        self.final_moves = None
+        self.eaten = []
+        self.born = []
+
+        self.tick = 0
+        self.total_cells = params.width * params.height
+        self.grass = self._count_grass(self.grid) if self.wheel is None else self.wheel.grass
+        self.sum_coverage = 0.0
+        self.min_cov = 1.0
+        self.max_cov = 0.0
+
+    @property
+    def done(self) -> bool:
+        """
+        True once the configured number of ticks has been simulated.
+        """
+        return self.tick >= self.params.ticks
+
+    @property
+    def population(self) -> int:
+        """
+        Number of living rabbits.
+        """
+        return len(self.rabbits)
+
+    def grass_count(self) -> int:
+        """
+        Number of grassy cells after the last tick. Kept by the regrow phase, so this is O(1).
+        """
+        return self.grass
+
+    def step(self) -> int:
+        """
+        Advance the world by one tick: propose moves -> resolve conflicts -> move -> eat -> regrow -> reproduce -> cull.
+        :return: grass count after the tick
+        """
+        if self.profiler is not None:
+            return self.profiler.profile_step(self)
+        self.decide_moves()
+        self.resolve_moves()
+        self.apply_moves()
+        self.eat()
+        self.regrow()
+        self.reproduce()
+        self.cull()
+        return self.finish_tick()
+
+    def phases(self) -> list[tuple]:
+        """
+        The tick pipeline as (name, bound method) pairs, in order. Calling them all and then finish_tick()
+        is exactly one step(); benchmarks use this to time each phase separately.
+        """
+        return [(name, getattr(self, name)) for name in PHASES]
+
+    # Phases. Each one leaves its output on the instance for the phases after it.
+    def decide_moves(self) -> None:
+        # Make every rabbit move in a random possible direction
+        p = self.params
+        self.proposals = self.store.decide_moves(p.width, p.height, self.rabbits, self.rng, self.topology)
+
+    def resolve_moves(self) -> None:
+        self.final_moves = self.store.resolve_moves_lottery(self.rabbits, self.proposals, self.params.capacity,
+                                                            self.rng)
+
+    def apply_moves(self) -> None:
+        p = self.params
+        self.store.apply_moves(self.grid, self.rabbits, self.final_moves, p.move_cost, p.idle_cost, self.stats)
+
+    def eat(self) -> None:
+        # after movement, rabbits can eat grass
+        p = self.params
+        self.eaten = self.store.eat_cells(self.grid, self.rabbits, p.regrow, p.eat_gain, self.stats)
+
+    def regrow(self) -> None:
+        p = self.params
+        if self.wheel is None:
+            self.grass = self._regrow_grid(self.grid, p.width, p.height, self.eaten)
+        else:
+            self.wheel.step(self.grid, self.eaten)
+            self.grass = self.wheel.grass
+
+    def reproduce(self) -> None:
+        # Rabbits can now reproduce if they meet the energy requirement
+        p = self.params
+        self.born = self.store.reproduce(self.grid, self.rabbits, self.rng, p.width, p.height, p.repro_threshold,
+                                         p.repro_cost, p.spawn_energy, self.topology, self.stats)
+        self.rabbits += self.born
+
+    def cull(self) -> None:
+        # clear any dead rabbits whose energy level reaches 0
+        self.store.remove_dead_bodies(self.grid, self.rabbits, self.stats)
+
+    def finish_tick(self) -> int:
+        """
+        Fold the tick's grass count into the coverage accumulators and advance the tick counter.
+        :return: grass count after the tick
+        """
+        g = self.grass
+        self._record(g)
+        self.tick += 1
+        self._sync_rng()
+        return g
+
+    def _record(self, g) -> None:
+        cov = g / self.total_cells
+        self.sum_coverage += cov
+        self.min_cov = min(self.min_cov, cov)
+        self.max_cov = max(self.max_cov, cov)
+        if self.stats is not None:
+            self.stats.record(len(self.rabbits), cov)
+
+    def _sync_rng(self) -> None:
+        if self.params.rng == "keyed":
+            self.rng.tick = self.tick  # the next tick draws from the next tick's streams
+
+    def run(self, n=None, on_tick=None) -> None:
+        """
+        Advance n ticks, or until the configured tick count is reached. An extinct world is fast-forwarded to the
+        end, and a stop rule that fires ends the whole run; on_tick is not called for the ticks skipped either way.
+        :param n: number of ticks to run (default: all remaining ticks)
+        :param on_tick: optional callback on_tick(sim, grass) after every simulated tick
+        :return: None
+        """
+        end = self.params.ticks if n is None else min(self.params.ticks, self.tick + n)
+        while self.tick < end:
+            if not self.population and self.skip_extinct:
+                self.fast_forward(end)
+                break
+            g = self.step()
+            if on_tick is not None:
+                on_tick(self, g)
+            if self.settle is not None:
+                period = self.settle.observe(g, self.population)
+                if period is not None:
+                    self.extrapolate(self.settle.pattern(period))
+                    break
+
+    def fast_forward(self, end=None) -> None:
+        """
+        Jump an extinct world to tick `end` in one go. With no rabbits left a tick only counts the grass timers
+        down, so the coverage of every skipped tick follows from the timer histogram; the accumulators and the
+        grid end up exactly as stepping would leave them.
+        :param end: tick to stop at (default: the configured tick count)
+        :return: None
+        """
+        if self.population:
+            raise ValueError("Only an extinct world can be fast-forwarded.")
+        end = self.params.ticks if end is None else end
+        skipped = end - self.tick
+        if skipped <= 0:
+            return
+        if self.wheel is not None:
+            self.wheel.sync_timers(self.grid)
+        timers = self._fast_forward_timers(self.grid, skipped)
+
+        # after k ticks, the tiles whose timer was above k are still regrowing
+        pending = sum(timers.values())
+        order = sorted(timers)
+        cells = self.total_cells
+        done = 0
+        while pending and done < skipped:
+            done += 1
+            if order[0] == done:
+                pending -= timers[order.pop(0)]
+            self._record(cells - pending)
+        if done < skipped:  # fully grown from here on
+            self.sum_coverage = _add_ones(self.sum_coverage, skipped - done)
+            self.min_cov = min(self.min_cov, 1.0)
+            self.max_cov = max(self.max_cov, 1.0)
+            if self.stats is not None:
+                self.stats.record(0, 1.0, skipped - done)
+
+        if self.extinct_at is None:
+            self.extinct_at = self.tick
+        self.tick = end
+        self._sync_rng()
+        self.grass = cells - pending
+        self.eaten = []
+        if self.wheel is not None:
+            self.wheel = RegrowWheel(self.grid, self.params.regrow)
+
+    def extrapolate(self, pattern) -> None:
+        """
+        End the run at the current tick and fill in the remaining ticks' coverage by repeating a settled pattern.
+        The world is left as it is, so only the accumulators and the tick counter describe the last tick.
+        :param pattern: grass counts of the settled ticks, oldest first (from SettleDetector.pattern())
+        :return: None
+        """
+        remaining = self.params.ticks - self.tick
+        self.settled_at = self.tick
+        if remaining <= 0:
+            return
+        covs = [g / self.total_cells for g in pattern]
+        repeats, rest = divmod(remaining, len(covs))
+        seen = covs if repeats else covs[:rest]
+        self.sum_coverage += repeats * sum(covs) + sum(covs[:rest])
+        self.min_cov = min(self.min_cov, min(seen))
+        self.max_cov = max(self.max_cov, max(seen))
+        self.tick = self.params.ticks
+        self._sync_rng()
+
+    def summary(self) -> dict:
+        """
+        Coverage statistics over the ticks simulated so far, plus the current population.
+        :return: dict with ticks, avg/min/max coverage (fractions) and rabbits
+        """
+        summary = {
+            "ticks": self.tick,
+            "avg_coverage": self.sum_coverage / self.tick if self.tick else 0.0,
+            "min_coverage": self.min_cov,
+            "max_coverage": self.max_cov,
+            "rabbits": len(self.rabbits),
+        }
+        if self.settle is not None:
+            summary["settled_at"] = self.settled_at
+        return summary
+
+
+def _add_ones(total, n) -> float:
+    """
+    Add 1.0 to total n times, rounding exactly like n separate float additions but in O(log n) steps: once an
+    addition has rounded, total lies on the float grid of its binade, and adding 1.0 stays exact until the next
+    power of two.
+    :param total: running float sum
+    :param n: number of 1.0 terms
+    :return: the sum
+    """
+    while n > 0:
+        total += 1.0
+        n -= 1
+        exp = math.frexp(total)[1]  # 2 ** (exp - 1) <= total < 2 ** exp
+        if exp > 53:
+            return total + n  # a float step is above 1 here; a run never gets this long
+        exact = min(n, math.ceil(2.0 ** exp - total) - 1)
+        total += exact
+        n -= exact
+    return total
@@ -0,0 +1,174 @@
+# stats.py
+"""
+Streaming statistics of a run: the energy distribution of the living rabbits and a short history of
+population and coverage.
+
+Energies are integers, so the distribution is kept as counts per energy value. The phase functions report
+the energies they change (apply_moves, eat_cells, reproduce and remove_dead_bodies take an optional stats
+argument), and each report only counts the values involved, so keeping the stats costs O(changes) per tick and
+reading them costs O(distinct energies), never O(population). Additions and removals are counted in two
+Counters at C speed and folded together when the stats are read.
+
+The history keeps the population and coverage of the last `history` ticks in ring buffers for sparklines.
+"""
+import math
+from collections import Counter, deque
+from dataclasses import dataclass
+from operator import itemgetter
+
+HISTORY = 120  # ticks of population / coverage history kept by default
+SPARK_BARS = "▁▂▃▅▇"  # fallback: ".:-=*#" if your terminal hates unicode
+HIST_BINS = 5
+
+
+@dataclass(frozen=True)
+class StatsSummary:
+    """
+    Read-only view of a StreamingStats at one tick.
+    """
+    count: int
+    mean: float
+    sd: float
+    min: int
+    max: int
+    p10: int
+    p50: int
+    p90: int
+    hist: tuple  # HIST_BINS counts across [min, max]
+    population: tuple  # history, oldest first
+    coverage: tuple
+
+
+class StreamingStats:
+    """
+    Energy value counts of the living rabbits plus ring buffers of population and coverage.
+    """
+
+    def __init__(self, rabbits=(), history=HISTORY):
+        """
+        :param rabbits: the current rabbits of either store, counted once
+        :param history: number of ticks of population / coverage history to keep
+        """
+        energies = rabbits.energy if hasattr(rabbits, "energy") else map(itemgetter(2), rabbits)
+        self._added = Counter(energies)
+        self._removed = Counter()
+        self.population = deque(maxlen=history)
+        self.coverage = deque(maxlen=history)
+
+    # energy changes, reported by the phase functions
+    def add(self, energies) -> None:
+        """
+        Count rabbits with the given energies (e.g. newborns).
+        """
+        self._added.update(energies)
+
+    def add_repeated(self, energy, n) -> None:
+        """
+        Count n rabbits with the same energy.
+        """
+        if n:
+            self._added[energy] += n
+
+    def remove(self, energies) -> None:
+        """
+        Forget rabbits with the given energies (e.g. the dead).
+        """
+        self._removed.update(energies)
+
+    def shift(self, energies, delta) -> None:
+        """
+        Rabbits that now have the given energies after each gaining delta (negative for a loss).
+        """
+        if energies:
+            self._removed.update([energy - delta for energy in energies])
+            self._added.update(energies)
+
+    def record(self, population, coverage, n=1) -> None:
+        """
+        Append ticks to the history.
+        :param population: living rabbits after the tick
+        :param coverage: grassy fraction of the grid after the tick
+        :param n: number of consecutive ticks with these values (e.g. fast-forwarded ones)
+        :return: None
+        """
+        n = min(n, self.population.maxlen)
+        self.population.extend([population] * n)
+        self.coverage.extend([coverage] * n)
+
+    # reading
+    def counts(self) -> Counter:
+        """
+        Number of living rabbits per energy value.
+        """
+        added = self._added
+        if self._removed:
+            for energy, n in self._removed.items():
+                left = added[energy] - n
+                if left:
+                    added[energy] = left
+                else:
+                    del added[energy]
+            self._removed.clear()
+        return added
+
+    def summary(self) -> StatsSummary:
+        """
+        Mean, spread, range, quantiles and histogram of the energies, plus the history.
+        :return: StatsSummary
+        """
+        values = sorted(self.counts().items())
+        count = sum(n for _, n in values)
+        history = (tuple(self.population), tuple(self.coverage))
+        if not count:
+            return StatsSummary(0, 0.0, 0.0, 0, 0, 0, 0, 0, (0,) * HIST_BINS, *history)
+        total = sum(energy * n for energy, n in values)
+        mean = total / count
+        variance = max(sum(energy * energy * n for energy, n in values) / count - mean * mean, 0.0)
+        emin, emax = values[0][0], values[-1][0]
+        p10, p50, p90 = (_quantile(values, count, q) for q in (0.1, 0.5, 0.9))
+        return StatsSummary(count, mean, math.sqrt(variance), emin, emax, p10, p50, p90,
+                            _histogram(values, count, emin, emax), *history)
+
+
+def _quantile(values, count, q) -> int:
+    """
+    Nearest-rank q-quantile of sorted (value, count) pairs.
+    """
+    rank = max(1, math.ceil(q * count))
+    seen = 0
+    for energy, n in values:
+        seen += n
+        if seen >= rank:
+            return energy
+    return values[-1][0]
+
+
+def _histogram(values, count, emin, emax) -> tuple:
+    """
+    HIST_BINS counts across [emin, emax]; everything in the middle bin when the range collapses.
+    """
+    counts = [0] * HIST_BINS
+    if emin == emax:
+        counts[HIST_BINS // 2] = count
+        return tuple(counts)
+    span = max(1, emax - emin)
+    for energy, n in values:
+        counts[min(int((energy - emin) * HIST_BINS / (span + 1e-9)), HIST_BINS - 1)] += n
+    return tuple(counts)
+
+
+def sparkline(values, width=None) -> str:
+    """
+    One SPARK_BARS character per value, scaled to the range of the values.
+    :param values: numbers to draw, oldest first
+    :param width: optional number of characters; only the last `width` values are drawn
+    :return: sparkline string ('' when there are no values)
+    """
+    values = list(values)[-width:] if width else list(values)
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    top = len(SPARK_BARS) - 1
+    if high == low:
+        return SPARK_BARS[top // 2] * len(values)
+    return "".join(SPARK_BARS[round((v - low) / (high - low) * top)] for v in values)
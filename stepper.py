@@ -0,0 +1,184 @@
+# stepper.py
+"""
+Background stepping for the interactive UI.
+
+A Stepper calls step_fn() on its own thread at the target tick rate and publishes immutable snapshots of what
+a frame needs: the tick, copies of the grid and the rabbits, and the grass count. Given a stats_fn, a snapshot
+holds the stats summary it returns instead of a copy of the rabbits. The live world is the back
+buffer and only the stepper thread touches it; the latest snapshot is the front buffer, swapped in with a single
+reference assignment. The renderer therefore never waits for a tick to finish and never sees half of one, and
+pause, speed and stop requests are answered between ticks without blocking input.
+
+A thread rather than a process: handing the world to another process every frame would cost more than the
+copy, and the renderer mostly sleeps, so the two share the interpreter well.
+
+Snapshots are taken of the ticks the UI would draw (every render_every-th tick, the last one and the one a pause
+lands on), at most once per min_interval (a frame) and rarely enough that copies take at most COPY_SHARE of
+the stepper's time, so a big world steps nearly as fast as it would without the UI.
+"""
+import threading
+from dataclasses import dataclass
+from time import perf_counter
+
+CATCH_UP_SECS = 2.0  # a stepper further behind schedule than this drops the backlog instead of racing
+COPY_SHARE = 0.2  # most of the stepper's time that snapshot copies may take
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    State of the world after one tick. The grid and rabbits are private copies; nothing mutates them.
+    """
+    tick: int
+    grid: object
+    rabbits: object  # None when the snapshot holds stats
+    grass: int | None  # None when no grass counter was given
+    stats: object = None  # stats.StatsSummary of the tick, when a stats_fn was given
+
+
+def copy_grid(grid):
+    """
+    Independent copy of a grid of any engine.
+    :param grid: nested-list grid, NumPy array or chunked.ChunkedGrid
+    :return: grid of the same kind
+    """
+    if isinstance(grid, list):
+        return [list(map(list.copy, row)) for row in grid]
+    return grid.copy()
+
+
+def copy_rabbits(rabbits):
+    """
+    Independent copy of the rabbits of either store.
+    :param rabbits: list of [x, y, energy] or population.RabbitTable
+    :return: rabbits of the same kind
+    """
+    if isinstance(rabbits, list):
+        return list(map(list.copy, rabbits))
+    return rabbits.copy()
+
+
+class Stepper:
+    """
+    Runs step_fn() on a background thread and publishes a Snapshot in `latest`.
+    """
+
+    def __init__(self, step_fn, init_state, ticks, tps, render_every=1, grass_fn=None, min_interval=0.0,
+                 stats_fn=None):
+        """
+        :param step_fn: advances the world by one tick and returns (tick, grid, rabbits)
+        :param init_state: optional (tick, grid, rabbits) of the starting tick, published as the first snapshot
+        :param ticks: tick to stop after
+        :param tps: target ticks per second
+        :param render_every: publish every K-th tick only
+        :param grass_fn: optional grass_fn(grid) counter stored in the snapshots
+        :param min_interval: minimum seconds between two published snapshots (the last tick is always published)
+        :param stats_fn: optional stats_fn() returning a stats.StatsSummary of the world, stored in the snapshots
+                         in place of a copy of the rabbits
+        """
+        self._step_fn = step_fn
+        self._grass_fn = grass_fn
+        self._stats_fn = stats_fn
+        self.ticks = ticks
+        self.tps = tps
+        self.render_every = render_every
+        self.min_interval = min_interval
+        self.latest = None
+        self.error = None  # exception raised by step_fn, if any
+        self.finished = False  # the stepper thread has exited
+        self._cond = threading.Condition()
+        self._paused = False
+        self._speed = 1.0
+        self._stopping = False
+        self._reschedule = False
+        self._published_at = float("-inf")
+        self._publish_gap = min_interval  # seconds to wait before the next snapshot
+        self._thread = threading.Thread(target=self._run, name="ecosim-stepper", daemon=True)
+        if init_state is not None:
+            self._publish(*init_state)
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def speed(self) -> float:
+        return self._speed
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def set_paused(self, paused) -> None:
+        """
+        Pause or resume stepping. Takes effect after the tick in flight, which is published.
+        """
+        with self._cond:
+            self._paused = paused
+            self._reschedule = True
+            self._cond.notify()
+
+    def set_speed(self, speed) -> None:
+        """
+        Step at `speed` times the target tick rate from now on.
+        """
+        with self._cond:
+            self._speed = speed
+            self._reschedule = True
+            self._cond.notify()
+
+    def stop(self) -> None:
+        """
+        Ask the thread to exit after the tick in flight. Does not wait; see join().
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+
+    def join(self, timeout=None) -> None:
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _publish(self, tick, grid, rabbits) -> None:
+        start = perf_counter()
+        grass = self._grass_fn(grid) if self._grass_fn is not None else None
+        if self._stats_fn is not None:
+            self.latest = Snapshot(tick, copy_grid(grid), None, grass, self._stats_fn())
+        else:
+            self.latest = Snapshot(tick, copy_grid(grid), copy_rabbits(rabbits), grass)
+        self._published_at = perf_counter()
+        cost = self._published_at - start
+        self._publish_gap = max(self.min_interval, cost * (1 - COPY_SHARE) / COPY_SHARE)
+
+    def _run(self) -> None:
+        try:
+            tick = self.latest.tick if self.latest is not None else 0
+            state = None  # (tick, grid, rabbits) of the last tick stepped
+            next_tick = perf_counter()
+            while tick < self.ticks:
+                with self._cond:
+                    if self._paused and state is not None and (self.latest is None or self.latest.tick != tick):
+                        self._publish(*state)  # show the tick the pause landed on
+                    while self._paused and not self._stopping:
+                        self._cond.wait()
+                    if self._stopping:
+                        return
+                    if self._reschedule:
+                        next_tick = perf_counter()
+                        self._reschedule = False
+                    delay = next_tick - perf_counter()
+                    if delay > 0:
+                        self._cond.wait(delay)  # woken early by pause, speed and stop requests
+                        continue
+                    tick_dt = 1.0 / (self.tps * self._speed)
+
+                state = self._step_fn()
+                tick = state[0]
+                now = perf_counter()
+                next_tick = max(next_tick + tick_dt, now - CATCH_UP_SECS)
+                if tick >= self.ticks or (tick % self.render_every == 0
+                                          and now - self._published_at >= self._publish_gap):
+                    self._publish(*state)
+        except Exception as e:  # handed to the UI thread, which re-raises it once curses is shut down
+            self.error = e
+        finally:
+            self.finished = True
@@ -0,0 +1,204 @@
+# sweep.py
+"""
+Parallel parameter sweeps.
+
+A sweep spec is a JSON file with fixed settings and a grid of values to combine:
+
+    {
+        "base": {"width": 60, "height": 30, "ticks": 500, "rabbits": 100},
+        "grid": {"regrow": [5, 10, 20], "eat_gain": [3, 4], "seed": [1, 2, 3, 4]}
+    }
+
+Every combination becomes one SimParams run. Runs are sent to a process pool in chunks, and each
+chunk's summaries are appended to one JSON Lines file as soon as the chunk finishes. Runs already
+present in the output file are skipped, so an interrupted sweep picks up where it stopped. With --cache,
+workers also look every run up in a shared result cache (cache.py) first and add the ones they simulate, so
+runs repeated across sweeps and output files are only simulated once.
+
+    python sweep.py spec.json --out results.jsonl --cache .ecosim-cache
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cache import ResultCache, run_cached
+from simulation import SimParams
+
+
+def expand_grid(spec) -> list[dict]:
+    """
+    Expand a sweep spec into the list of parameter dicts to run, in a stable order.
+    :param spec: dict with optional "base" settings and a "grid" of lists of values
+    :return: list of parameter dicts, one per combination
+    """
+    base = spec.get("base", {})
+    grid = spec.get("grid", {})
+    names = sorted(grid)
+    runs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(base)
+        params.update(zip(names, values))
+        runs.append(params)
+    return runs
+
+
+def run_key(params) -> str:
+    """
+    Canonical identity of a run, used to skip finished runs when resuming.
+    :param params: parameter dict of the run
+    :return: compact JSON string with sorted keys
+    """
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+def run_one(params, cache=None) -> dict:
+    """
+    Simulate one configuration to the end, or take its result from the cache.
+    :param params: parameter dict accepted by SimParams
+    :param cache: optional ResultCache
+    :return: summary record (params, avg/min/max coverage, final population)
+    """
+    record = {"key": run_key(params), "params": params}
+    record.update(run_cached(SimParams(**params), cache))
+    return record
+
+
+def run_chunk(chunk, cache_path=None, cache_max_bytes=None) -> list[dict]:
+    """
+    Worker task: simulate a chunk of configurations so pool overhead is paid once per chunk, not per run.
+    :param chunk: list of parameter dicts
+    :param cache_path: optional result cache directory shared by all workers
+    :param cache_max_bytes: size cap of the result cache
+    :return: list of summary records
+    """
+    cache = None if cache_path is None else ResultCache(cache_path, cache_max_bytes)
+    return [run_one(params, cache) for params in chunk]
+
+
+def completed_keys(path) -> set:
+    """
+    Keys of the runs already written to an output file. A torn last line from a crash is ignored.
+    :param path: JSON Lines output file
+    :return: set of run keys
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["key"])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def trim_torn_tail(path) -> None:
+    """
+    Cut a torn last line (a crash in the middle of a write) off an output file, so the next append starts on a
+    line of its own instead of being glued to the garbage.
+    :param path: JSON Lines output file
+    :return: None
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        # the torn line is the only unterminated one, so read back from the end to the newline before it
+        pos = end
+        while pos > 0:
+            step = min(pos, 64 * 1024)
+            f.seek(pos - step)
+            cut = f.read(step).rfind(b"\n")
+            if cut >= 0:
+                f.truncate(pos - step + cut + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+def run_sweep(runs, out_path, workers=None, chunk_size=None, progress=None, cache_path=None,
+              cache_max_bytes=256 * 1024 * 1024) -> int:
+    """
+    Run every configuration not yet in out_path across a process pool, appending summaries as chunks finish.
+    :param runs: list of parameter dicts
+    :param out_path: JSON Lines file to append results to
+    :param workers: number of worker processes (default: all cores)
+    :param chunk_size: runs per task (default: spread the work into ~4 chunks per worker)
+    :param progress: optional callback progress(finished, total)
+    :param cache_path: optional result cache directory; cached runs are not simulated again
+    :param cache_max_bytes: size cap of the result cache
+    :return: number of runs executed (simulated or taken from the cache) by this call
+    """
+    done = completed_keys(out_path)
+    pending = [params for params in runs if run_key(params) not in done]
+    for params in pending:
+        SimParams(**params)  # fail fast on an invalid config instead of inside a worker
+    if not pending:
+        return 0
+
+    trim_torn_tail(out_path)
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, len(pending) // (workers * 4))
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+
+    finished = 0
+    with open(out_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_chunk, chunk, cache_path, cache_max_bytes) for chunk in chunks]
+        for future in as_completed(futures):
+            records = future.result()
+            for record in records:
+                out.write(json.dumps(record, separators=(",", ":")) + "\n")
+            out.flush()  # a finished chunk survives a crash of the rest of the sweep
+            finished += len(records)
+            if progress is not None:
+                progress(finished, len(pending))
+    return len(pending)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run a parameter sweep across all cores.")
+    parser.add_argument('spec', type=str, help="JSON sweep spec with 'base' settings and a 'grid' of value lists.")
+    parser.add_argument('--out', default='sweep_results.jsonl', type=str,
+                        help="JSON Lines file results are appended to; existing runs are skipped (default: sweep_results.jsonl).")
+    parser.add_argument('--workers', default=None, type=int, help="Worker processes (default: number of cores).")
+    parser.add_argument('--chunk-size', default=None, type=int,
+                        help="Runs per dispatched task (default: about 4 tasks per worker).")
+    parser.add_argument('--cache', default=None, type=str,
+                        help="Result cache directory shared by the workers; seeded runs found in it are not "
+                             "simulated again (default: None, off).")
+    parser.add_argument('--cache-max-mb', default=256.0, type=float,
+                        help="Size cap of the result cache; least recently used entries are evicted (default: 256).")
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("workers must be at least 1.")
+    if args.chunk_size is not None and args.chunk_size < 1:
+        parser.error("chunk size must be at least 1.")
+    if args.cache_max_mb <= 0:
+        parser.error("cache size cap must be greater than 0.")
+
+    with open(args.spec, encoding="utf-8") as f:
+        spec = json.load(f)
+    try:
+        runs = expand_grid(spec)
+        for params in runs:
+            SimParams(**params)
+    except (TypeError, ValueError) as e:  # unknown setting name or invalid value in the spec
+        parser.error(str(e))
+    executed = run_sweep(runs, args.out, args.workers, args.chunk_size,
+                         progress=lambda n, total: print(f"\r{n}/{total} runs", end="", file=sys.stderr),
+                         cache_path=args.cache, cache_max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    print(f"\ndone: {executed} runs executed, {len(runs) - executed} already in {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# telemetry.py
+"""
+Buffered per-tick stats output.
+
+Records are queued in memory and written in batches, either when the batch is full or when the flush
+interval has passed, instead of one print() per tick. Formats:
+
+- text:  the classic `tick=.. rabbits=.. grass=../.. coverage=..%` status lines
+- csv:   header row + one row per record
+- jsonl: one JSON object per record
+- bin:   magic + struct format header, then fixed-size little-endian records (see BIN_RECORD)
+
+A sink opened with replicas=True (ensemble runs) puts a leading replica field on every record.
+"""
+import json
+import struct
+import sys
+from time import monotonic
+
+FIELDS = ("tick", "rabbits", "grass", "cells", "coverage")
+FORMATS = ("text", "csv", "jsonl", "bin")
+BIN_MAGIC = b"ECOSTAT1"
+BIN_RECORD = struct.Struct("<QQQQd")
+BIN_REPLICA_RECORD = struct.Struct("<QQQQQd")
+
+
+class TelemetrySink:
+    """
+    Batches (tick, rabbits, grass, cells, coverage) records and writes them in the chosen format.
+    """
+
+    def __init__(self, path="-", fmt="text", batch=4096, flush_secs=1.0, replicas=False):
+        """
+        :param path: output file, or '-' for stdout
+        :param fmt: one of FORMATS
+        :param batch: number of queued records that forces a flush
+        :param flush_secs: maximum seconds a record waits in the buffer
+        :param replicas: prefix every record with the replica it belongs to
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown stats format {fmt!r}, expected one of {', '.join(FORMATS)}.")
+        self.fmt = fmt
+        self.batch = batch
+        self.flush_secs = flush_secs
+        self.replicas = replicas
+        self._bin_record = BIN_REPLICA_RECORD if replicas else BIN_RECORD
+        self._records = []
+        self._last_flush = monotonic()
+
+        binary = fmt == "bin"
+        if path == "-":
+            self._out = sys.stdout.buffer if binary else sys.stdout
+            self._owns_out = False
+        else:
+            self._out = open(path, "wb") if binary else open(path, "w", encoding="utf-8", newline="")
+            self._owns_out = True
+
+        if fmt == "csv":
+            self._out.write(",".join(("replica",) + FIELDS if replicas else FIELDS) + "\n")
+        elif binary:
+            layout = self._bin_record.format.encode("ascii")
+            self._out.write(BIN_MAGIC + struct.pack("<H", len(layout)) + layout)
+
+    def write(self, tick, rabbits, grass, cells, replica=None) -> None:
+        """
+        Queue one record; flushes when the batch is full or the flush interval has passed.
+        :param tick: tick the record describes
+        :param rabbits: population after the tick
+        :param grass: grassy cells after the tick
+        :param cells: total number of cells
+        :param replica: replica the record belongs to (sinks opened with replicas=True only)
+        :return: None
+        """
+        if self.replicas:
+            self._records.append((replica, tick, rabbits, grass, cells))
+        else:
+            self._records.append((tick, rabbits, grass, cells))
+        if len(self._records) >= self.batch or monotonic() - self._last_flush >= self.flush_secs:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Format every queued record in one go and hand it to the output with a single write.
+        :return: None
+        """
+        records = self._records
+        if records and self.replicas:
+            self._out.write(self._format_replicas(records))
+            self._records = []
+        elif records:
+            if self.fmt == "text":
+                data = "".join(f"tick={t} rabbits={r} grass={g}/{c} coverage={(g / c * 100):.1f}%\n"
+                               for t, r, g, c in records)
+            elif self.fmt == "csv":
+                data = "".join(f"{t},{r},{g},{c},{g / c!r}\n" for t, r, g, c in records)
+            elif self.fmt == "jsonl":
+                data = "".join(json.dumps(dict(zip(FIELDS, (t, r, g, c, g / c)))) + "\n" for t, r, g, c in records)
+            else:
+                data = b"".join(BIN_RECORD.pack(t, r, g, c, g / c) for t, r, g, c in records)
+            self._out.write(data)
+            self._records = []
+        self._out.flush()
+        self._last_flush = monotonic()
+
+    def _format_replicas(self, records):
+        """
+        flush() formatting for (replica, tick, rabbits, grass, cells) records.
+        """
+        if self.fmt == "text":
+            return "".join(f"replica={p} tick={t} rabbits={r} grass={g}/{c} coverage={(g / c * 100):.1f}%\n"
+                           for p, t, r, g, c in records)
+        if self.fmt == "csv":
+            return "".join(f"{p},{t},{r},{g},{c},{g / c!r}\n" for p, t, r, g, c in records)
+        if self.fmt == "jsonl":
+            return "".join(json.dumps(dict(zip(("replica",) + FIELDS, (p, t, r, g, c, g / c)))) + "\n"
+                           for p, t, r, g, c in records)
+        return b"".join(BIN_REPLICA_RECORD.pack(p, t, r, g, c, g / c) for p, t, r, g, c in records)
+
+    def close(self) -> None:
+        """
+        Flush what is left and close the output file (stdout is left open).
+        :return: None
+        """
+        self.flush()
+        if self._owns_out:
+            self._out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_bin(path) -> list[tuple]:
+    """
+    Read a binary stats file back.
+    :param path: file written with fmt='bin'
+    :return: list of (tick, rabbits, grass, cells, coverage) tuples, with a leading replica for ensemble runs
+    """
+    with open(path, "rb") as f:
+        if f.read(len(BIN_MAGIC)) != BIN_MAGIC:
+            raise ValueError(f"{path} is not an EcoSim binary stats file.")
+        (layout_len,) = struct.unpack("<H", f.read(2))
+        record = struct.Struct(f.read(layout_len).decode("ascii"))
+        return list(record.iter_unpack(f.read()))
@@ -0,0 +1,83 @@
+# topology.py
+"""
+World topology: where a step in each direction leads, precomputed per boundary mode.
+
+- bounded: a step off the edge stays on the tile (the reference rule)
+- torus:   a step off one edge comes back on the opposite edge
+- reflect: a step off the edge bounces back, to the neighbour on the inward side
+
+A move only changes one coordinate, so the tables are kept per axis: steps[d] is an (x table, y table) pair and
+a step in direction d from (x, y) goes to (steps[d][0][x], steps[d][1][y]). The tables cost O(width + height)
+memory, which keeps them usable for the huge worlds of the chunked engine. Phase functions look the target up
+instead of adding offsets and bounds-checking every rabbit. A step that leads back to the tile itself (off the
+edge in bounded mode, or around a one-tile-wide torus) is not a neighbour for births.
+"""
+from functools import lru_cache
+
+BOUNDARIES = ("bounded", "torus", "reflect")
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))  # same order as crng.DIRECTIONS
+
+
+def _axis(n, delta, boundary) -> list[int]:
+    """
+    Where a step of delta (-1, 0 or 1) leads from every coordinate 0..n-1 of one axis.
+    """
+    table = []
+    for i in range(n):
+        j = i + delta
+        if not 0 <= j < n:
+            if boundary == "torus":
+                j %= n
+            elif boundary == "reflect" and 0 <= i - delta < n:
+                j = i - delta
+            else:
+                j = i
+        table.append(j)
+    return table
+
+
+class Topology:
+    """
+    Step tables of a width x height world. Immutable once built; get() shares them between runs.
+    """
+
+    def __init__(self, width, height, boundary="bounded"):
+        """
+        :param width: width of grid
+        :param height: height of grid
+        :param boundary: one of BOUNDARIES
+        """
+        if boundary not in BOUNDARIES:
+            raise ValueError(f"Unknown boundary {boundary!r}, expected one of {', '.join(BOUNDARIES)}.")
+        self.width = width
+        self.height = height
+        self.boundary = boundary
+        axes = {}
+        for dx, dy in DIRECTIONS:
+            axes[dx, dy] = (_axis(width, dx, boundary), _axis(height, dy, boundary))
+        self.step = axes  # (dx, dy) -> (x table, y table)
+        self.steps = [axes[d] for d in DIRECTIONS]  # in DIRECTIONS order, for draws that pick an index
+        self._arrays = None
+
+    def step_arrays(self) -> tuple:
+        """
+        The step tables as two NumPy arrays for bulk lookups: x_to[d, x] and y_to[d, y], d in DIRECTIONS order.
+        :return: (x_to, y_to), built on first use
+        """
+        if self._arrays is None:
+            import numpy as np
+            self._arrays = (np.array([x_to for x_to, _ in self.steps], dtype=np.int32),
+                            np.array([y_to for _, y_to in self.steps], dtype=np.int32))
+        return self._arrays
+
+
+@lru_cache(maxsize=16)
+def get(width, height, boundary="bounded") -> Topology:
+    """
+    The shared Topology of a world size and boundary mode, built on first use.
+    :param width: width of grid
+    :param height: height of grid
+    :param boundary: one of BOUNDARIES
+    :return: Topology
+    """
+    return Topology(width, height, boundary)
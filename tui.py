@@ -1,212 +1,593 @@
 # tui.py
 import curses
+from operator import itemgetter
 from time import perf_counter
 
+from stats import SPARK_BARS, StreamingStats, sparkline
+
 GRID_Y0 = 1
 GRID_X0 = 2
 
 # right-side panel config
 PANEL_MIN_WIDTH = 24  # approx columns needed for the panel
-SPARK_BARS = "▁▂▃▅▇"  # fallback: ".:-=*#" if your terminal hates unicode
+STATS_PANEL_LINES = 10
+HISTORY_COLS = 14  # ticks shown by the population / coverage sparklines
+
+# grid characters: index = has_grass + 2 * has_rabbit
+TILE_CHARS = '."rR'
+DENSITY_CHARS = " .:-=+*#"  # zoomed-out blocks, by share of grassy tiles (no grass .. all grass)
+MIN_VIEW_COLS = 20  # narrowest grid view worth keeping the side panel for
 
 
-def run_curses_loop(cfg, step_fn, init_state) -> None:
+def run_curses_loop(cfg, step_fn, init_state, grass_fn=None, profiler=None, replay=None, stats_fn=None,
+                    shm=None, ticks=None) -> None:
     """
-    Setup curses and run the main loop.
+    Setup curses and run the main loop. The simulation is stepped on a background thread (see stepper.py), so
+    input and frames never wait for a tick; once curses is shut down the tick in flight is waited for.
     - cfg: parsed args (width, height, fps, render_every, etc.)
-    - step_fn(): advances the sim by 1 tick and returns (tick, grid, rabbits)
-    - init_state: optional (grid, rabbits) to draw tick 0 immediately
+    - step_fn(): advances the sim by 1 tick and returns (tick, grid, rabbits); only called from the stepper thread
+    - init_state: optional (tick, grid, rabbits) to draw the starting tick immediately (not 0 after --resume)
+    - grass_fn(grid): optional engine-specific grass counter used for the status line
+    - profiler: optional PhaseProfiler whose timers and counters are shown under the energy panel
+    - replay: optional replay.Replay to play back instead of stepping (step_fn and init_state are ignored)
+    - stats_fn(): optional stats.StatsSummary of the world for the side panel; without it the panel is computed
+      from the rabbits
+    - shm: optional shm.ShmReader of a headless run to show instead of stepping (step_fn and init_state are
+      ignored)
+    - ticks: tick the stepper stops after, i.e. the driven simulation's params.ticks (default: cfg.ticks)
     """
-    curses.wrapper(_main, cfg, step_fn, init_state)
+    if replay is not None:
+        curses.wrapper(_replay_main, cfg, replay)
+        return
+    if shm is not None:
+        curses.wrapper(_attach_main, cfg, shm)
+        return
+    from stepper import Stepper
+    ticks = cfg.ticks if ticks is None else ticks
+    stepper = Stepper(step_fn, init_state, ticks, cfg.tps, cfg.render_every, grass_fn, min_interval=1.0 / cfg.fps,
+                      stats_fn=stats_fn)
+    try:
+        curses.wrapper(_main, cfg, stepper, profiler)
+    finally:
+        stepper.stop()
+        stepper.join()
+    if stepper.error is not None:
+        raise stepper.error
 
 
-def _main(stdscr, cfg, step_fn, init_state):
+def _main(stdscr, cfg, stepper, profiler=None):
+    """
+    UI loop: handles keys and draws the stepper's latest snapshot at cfg.fps.
+    Keys: p/space pause, > and < double / halve the tick rate, q quits; the view keys work as usual.
+    """
     curses.curs_set(0)
     stdscr.nodelay(True)
+    stdscr.keypad(True)  # arrow keys arrive as KEY_* codes
     stdscr.timeout(0)
 
-    tick_dt = 1.0 / cfg.tps  # simulation cadence
     frame_dt = 1.0 / cfg.fps  # render cadence
+    now = perf_counter()
+    next_frame = now
+    prev_frame = now
+    view = Viewport()
+    drawn = None  # snapshot on screen
+    view_changed = False
+    stepper.start()
+
+    while True:
+        now = perf_counter()
+
+        # input, answered right away: the stepper picks requests up between ticks
+        key = stdscr.getch()
+        if key in (ord('q'), ord('Q')):
+            break
+        if key in (ord('p'), ord('P'), ord(' ')):
+            stepper.set_paused(not stepper.paused)
+            view_changed = True
+        elif key == ord('>'):
+            stepper.set_speed(min(stepper.speed * 2, 4096.0))
+            view_changed = True
+        elif key == ord('<'):
+            stepper.set_speed(max(stepper.speed / 2, 1 / 64))
+            view_changed = True
+        elif key == curses.KEY_RESIZE or view.handle_key(key, cfg):
+            view_changed = True
+
+        # frame schedule (independent of ticks): the latest finished snapshot, when it or the view changed
+        snap = stepper.latest
+        if now >= next_frame and snap is not None and (snap is not drawn or view_changed):
+            fps_est = 1.0 / max(now - prev_frame, 1e-6)
+            _draw_snapshot(stdscr, cfg, snap, fps_est, stepper, profiler, view)
+            drawn = snap
+            view_changed = False
+            prev_frame = now
+            next_frame = max(next_frame + frame_dt, now)
+        if stepper.finished and snap is drawn:
+            break  # last tick drawn, or the stepper failed
+
+        # gentle sleep until next frame
+        curses.napms(max(1, min(10, int((next_frame - now) * 1000))))
+
+    # final frame
+    snap = stepper.latest
+    if snap is not None and stepper.error is None:
+        _draw_snapshot(stdscr, cfg, snap, cfg.fps, stepper, profiler, view)
+
+
+def _draw_snapshot(stdscr, cfg, snap, fps_est, stepper, profiler, view) -> None:
+    grass_fn = None if snap.grass is None else (lambda _grid: snap.grass)
+    note = None if stepper.speed == 1.0 else f"speed x{stepper.speed:g}"
+    draw_frame(stdscr, cfg, snap.tick, snap.grid, snap.rabbits, fps_est, stepper.paused, grass_fn, profiler, view,
+               note=note, stats=snap.stats)
+
+
+def run_remote(cfg, client) -> None:
+    """
+    Show a server's run (see server.py) until q is pressed; the last tick stays on screen after the run ends.
+    - cfg: parsed args, with the world flags taken from the server
+    - client: server.StreamClient connected to the server; started here and closed on the way out
+    """
+    client.start()
+    try:
+        curses.wrapper(_remote_main, cfg, client)
+    finally:
+        client.close()
+    if client.error is not None:
+        raise client.error
 
+
+def _remote_main(stdscr, cfg, client):
+    """
+    Viewer loop: draws the latest tick received from the server at cfg.fps. Keys: q quits; the view keys work
+    as usual. The server sets the pace, so there is no pause or speed control.
+    """
+    curses.curs_set(0)
+    stdscr.nodelay(True)
+    stdscr.keypad(True)
+    stdscr.timeout(0)
+
+    frame_dt = 1.0 / cfg.fps
     now = perf_counter()
-    next_tick = now  # first tick "now"
-    next_frame = now + frame_dt
+    next_frame = now
     prev_frame = now
+    view = Viewport()
+    drawn = None  # (snapshot, note) on screen
+    view_changed = False
 
-    paused = False
-    tick = 0
-    grid = None
-    rabbits = None
+    while True:
+        now = perf_counter()
+        key = stdscr.getch()
+        if key in (ord('q'), ord('Q')):
+            break
+        if key == curses.KEY_RESIZE or view.handle_key(key, cfg):
+            view_changed = True
+        if client.error is not None:
+            break
 
-    # draw tick 0 if provided
-    if init_state is not None:
-        grid, rabbits = init_state
-        draw_frame(stdscr, cfg, tick, grid, rabbits, fps_est=cfg.fps, paused=paused)
+        snap = client.latest
+        note = f"remote {client.host}:{client.port}"
+        if client.skipped:
+            note += f" skipped {client.skipped}"
+        if client.finished:
+            note += " [ended]"
+        if now >= next_frame and snap is not None and (drawn != (snap, note) or view_changed):
+            fps_est = 1.0 / max(now - prev_frame, 1e-6)
+            draw_frame(stdscr, cfg, snap.tick, snap.grid, None, fps_est, False, lambda _grid: snap.grass,
+                       view=view, note=note, stats=snap.stats)
+            drawn = (snap, note)
+            view_changed = False
+            prev_frame = now
+            next_frame = max(next_frame + frame_dt, now)
+        curses.napms(max(1, min(10, int((next_frame - now) * 1000))))
+
+
+def _attach_main(stdscr, cfg, reader):
+    """
+    Attach loop: draws the latest tick a headless run published to shared memory at cfg.fps, straight from the
+    segment. A frame the publisher overwrote while it was being drawn is drawn again. Keys: q quits; the view
+    keys work as usual. The run sets the pace, so there is no pause or speed control.
+    """
+    curses.curs_set(0)
+    stdscr.nodelay(True)
+    stdscr.keypad(True)
+    stdscr.timeout(0)
 
-    last_drawn_tick = -1
-    running = True
+    frame_dt = 1.0 / cfg.fps
+    now = perf_counter()
+    next_frame = now
+    prev_frame = now
+    view = Viewport()
+    drawn = None  # seqlock version on screen
+    view_changed = False
 
-    while running:
+    while True:
         now = perf_counter()
+        key = stdscr.getch()
+        if key in (ord('q'), ord('Q')):
+            break
+        if key == curses.KEY_RESIZE or view.handle_key(key, cfg):
+            view_changed = True
+
+        if now >= next_frame:
+            frame = reader.read()
+            if frame.version != drawn or view_changed:
+                fps_est = 1.0 / max(now - prev_frame, 1e-6)
+                note = f"attached {reader.name}" + (" [done]" if frame.done else "")
+                draw_frame(stdscr, cfg, frame.tick, frame.grid, frame.rabbits, fps_est, False,
+                           lambda _grid: frame.grass, view=view, note=note)
+                if reader.valid(frame):
+                    drawn = frame.version
+                else:  # torn: draw the next tick in full
+                    drawn = view.drawn_tick = None
+                view_changed = False
+                prev_frame = now
+            next_frame = max(next_frame + frame_dt, now)
+        curses.napms(max(1, min(10, int((next_frame - now) * 1000))))
+
+
+def _replay_main(stdscr, cfg, replay):
+    """
+    Replay loop: plays the log at cfg.tps ticks per second times a speed factor, forwards or backwards.
+    Keys: p/space pause, > and < double / halve the speed, r reverses, . and , step one tick (and pause),
+    ] and [ jump a twentieth of the run, g / G go to the first / last tick; the view keys work as usual.
+    """
+    curses.curs_set(0)
+    stdscr.nodelay(True)
+    stdscr.keypad(True)
+    stdscr.timeout(0)
+
+    frame_dt = 1.0 / cfg.fps
+    now = perf_counter()
+    next_frame = now
+    prev_frame = now
+    last_advance = now
+    carry = 0.0  # fraction of a tick owed to the next frame
+    speed = 1.0
+    direction = 1
+    paused = False
+    jump = max(1, (replay.last_tick - replay.first_tick) // 20)
+    view = Viewport()
+    dirty = True
 
-        # input
+    while True:
+        now = perf_counter()
         key = stdscr.getch()
+        target = None
         if key in (ord('q'), ord('Q')):
             break
-        if key in (ord('p'), ord('P')):
+        if key in (ord('p'), ord('P'), ord(' ')):
             paused = not paused
-            if paused:
-                next_frame = now + frame_dt
-            else:
-                next_tick = now + tick_dt
-                next_frame = now + frame_dt
-
-        # ticks (catch up), only when not paused
-        if not paused:
-            max_catchup = int(cfg.tps * 2)  # cap bursts to ~2s worth
-            caught = 0
-            while now >= next_tick and tick < cfg.ticks and caught < max_catchup:
-                tick, grid, rabbits = step_fn()
-                next_tick += tick_dt
-                caught += 1
-                if tick >= cfg.ticks:
-                    running = False
-                    break
-
-        # frame schedule (independent of ticks)
-        should_draw = (now >= next_frame) and (
-                paused or (tick % cfg.render_every == 0 and last_drawn_tick != tick)
-        )
-        if should_draw:
-            dt = max(now - prev_frame, 1e-6)
-            fps_est = 1.0 / dt
-            draw_frame(stdscr, cfg, tick, grid, rabbits, fps_est, paused)
-            if not paused:
-                last_drawn_tick = tick
+        elif key == ord('>'):
+            speed = min(speed * 2, 4096.0)
+        elif key == ord('<'):
+            speed = max(speed / 2, 1 / 64)
+        elif key in (ord('r'), ord('R')):
+            direction = -direction
+        elif key in (ord('.'), ord(',')):
+            paused = True
+            target = replay.tick + (1 if key == ord('.') else -1)
+        elif key in (ord(']'), ord('[')):
+            target = replay.tick + (jump if key == ord(']') else -jump)
+        elif key == ord('g'):
+            target = replay.first_tick
+        elif key == ord('G'):
+            target = replay.last_tick
+        elif key == curses.KEY_RESIZE or view.handle_key(key, cfg):
+            dirty = True
+
+        # advance by the ticks due since the last frame, as one seek
+        if not paused and target is None:
+            carry += (now - last_advance) * cfg.tps * speed
+            due = int(carry)
+            if due:
+                carry -= due
+                target = replay.tick + direction * due
+        last_advance = now
+        if target is not None:
+            before = replay.tick
+            replay.seek(target)
+            dirty = dirty or replay.tick != before
+
+        if now >= next_frame and dirty:
+            fps_est = 1.0 / max(now - prev_frame, 1e-6)
+            note = f"replay {replay.tick}/{replay.last_tick} {'<<' if direction < 0 else '>>'} x{speed:g}"
+            draw_frame(stdscr, cfg, replay.tick, replay.grid, replay.rabbits, fps_est, paused,
+                       grass_fn=lambda _grid: replay.grass, view=view, note=note)
+            dirty = False
             prev_frame = now
-            next_frame += frame_dt
+            next_frame = now + frame_dt
+        curses.napms(max(1, min(10, int((next_frame - now) * 1000))))
 
-        # gentle sleep until next event
-        wait_until = min(next_tick if not paused else next_frame, next_frame)
-        delay_ms = max(0, int((wait_until - now) * 1000))
-        curses.napms(min(delay_ms, 10))
 
-    # final frame
-    draw_frame(stdscr, cfg, tick, grid, rabbits, fps_est=cfg.fps, paused=paused)
+class Viewport:
+    """
+    The part of the world shown on screen, and what was drawn there by the previous frame.
+    - x0, y0: world tile at the top-left character
+    - zoom: side of the square block of tiles behind one character (1 = one tile per character);
+      above 1 the grid is drawn in density mode
+    - rows: last drawn screen row of every grid line, used to redraw only the characters that changed
+    """
+
+    def __init__(self):
+        self.x0 = 0
+        self.y0 = 0
+        self.zoom = 1
+        self.cols = 0  # grid characters on screen in the last frame
+        self.lines = 0
+        self.room_cols = 0  # grid characters the terminal had room for in the last frame
+        self.room_lines = 0
+        self.rows = []
+        self.layout = None  # (terminal size, origin, zoom, panel) the cached rows belong to
+        self.drawn_tick = None
+
+    def handle_key(self, key, cfg) -> bool:
+        """
+        Pan with the arrow keys / hjkl (a quarter screen per press), zoom with + and -, 'f' fits the whole
+        world on screen and '1' goes back to one tile per character.
+        :return: True if the key moved or zoomed the view
+        """
+        step_x = max(1, self.cols // 4) * self.zoom
+        step_y = max(1, self.lines // 4) * self.zoom
+        if key in (curses.KEY_LEFT, ord('h')):
+            self.x0 -= step_x
+        elif key in (curses.KEY_RIGHT, ord('l')):
+            self.x0 += step_x
+        elif key in (curses.KEY_UP, ord('k')):
+            self.y0 -= step_y
+        elif key in (curses.KEY_DOWN, ord('j')):
+            self.y0 += step_y
+        elif key in (ord('+'), ord('=')):
+            self._set_zoom(max(1, self.zoom // 2))
+        elif key in (ord('-'), ord('_')):
+            self._set_zoom(min(self.zoom * 2, max(cfg.width, cfg.height)))
+        elif key in (ord('f'), ord('F')):
+            self.x0 = self.y0 = 0
+            self.zoom = max(1, -(-cfg.width // max(1, self.room_cols)), -(-cfg.height // max(1, self.room_lines)))
+        elif key == ord('1'):
+            self._set_zoom(1)
+        else:
+            return False
+        self.clamp(cfg)
+        return True
+
+    def _set_zoom(self, zoom) -> None:
+        """
+        Change the zoom, keeping the world tile at the centre of the view where it is.
+        """
+        center_x = self.x0 + self.cols * self.zoom // 2
+        center_y = self.y0 + self.lines * self.zoom // 2
+        self.zoom = zoom
+        self.x0 = center_x - self.cols * zoom // 2
+        self.y0 = center_y - self.lines * zoom // 2
+
+    def clamp(self, cfg) -> None:
+        """
+        Keep the view inside the world.
+        """
+        self.x0 = max(0, min(self.x0, cfg.width - self.cols * self.zoom))
+        self.y0 = max(0, min(self.y0, cfg.height - self.lines * self.zoom))
 
 
-def draw_frame(stdscr, cfg, tick, grid, rabbits, fps_est, paused):
+def draw_frame(stdscr, cfg, tick, grid, rabbits, fps_est, paused, grass_fn=None, profiler=None, view=None,
+               note=None, stats=None):
     """
-    Draw one full frame: status, grid, legend, and the right-side energy panel (if room).
+    Draw one frame: status, the visible part of the grid, legend, and the right-side energy panel (if room).
+    With a Viewport carried over from the previous frame only the grid characters that changed are written,
+    and the grid and panels are skipped entirely while the tick and the view stay the same (e.g. paused).
+    Grids larger than the terminal are clipped to the viewport; zoom > 1 aggregates blocks of tiles.
+    note is an optional extra field for the status line (e.g. the replay position).
+    stats is an optional stats.StatsSummary of the tick for the panel; rabbits may be None when it is given.
     """
-    # guard: ensure terminal is tall/wide enough for the GRID itself
+    if view is None:
+        view = Viewport()
     max_y, max_x = stdscr.getmaxyx()
-    needed_y = GRID_Y0 + cfg.height + 2
-    needed_x = GRID_X0 + cfg.width + 1
-    stdscr.erase()
-    if max_y < needed_y or max_x < needed_x:
-        stdscr.addstr(0, 0, f"Terminal too small: need {needed_x}x{needed_y}, have {max_x}x{max_y}")
+    if max_y < GRID_Y0 + 3 or max_x < GRID_X0 + MIN_VIEW_COLS + 1:
+        stdscr.erase()
+        stdscr.addnstr(0, 0, f"Terminal too small: have {max_x}x{max_y}", max_x - 1)
         stdscr.refresh()
+        view.layout = None
         return
 
-    # status line (row 0)
+    # layout: the grid gets what is left after the legend row and, if it still fits, the side panel
+    zoom = view.zoom
+    world_cols = -(-cfg.width // zoom)
+    world_lines = -(-cfg.height // zoom)
+    view.room_lines = max_y - GRID_Y0 - 2
+    with_panel = max_x - GRID_X0 - 4 - PANEL_MIN_WIDTH
+    view.room_cols = with_panel if with_panel >= MIN_VIEW_COLS else max_x - GRID_X0 - 1
+    view.cols = min(world_cols, view.room_cols)
+    view.lines = min(world_lines, view.room_lines)
+    view.clamp(cfg)
+    panel_x = GRID_X0 + view.cols + 4
+    show_panel = panel_x + PANEL_MIN_WIDTH <= max_x
+
+    layout = (max_y, max_x, view.x0, view.y0, zoom, view.cols, view.lines, show_panel)
+    if layout != view.layout:
+        stdscr.erase()
+        view.rows = [None] * view.lines
+        view.layout = layout
+        view.drawn_tick = None
+
+    # status line (row 0), padded so a shorter line overwrites the previous one
     total = cfg.width * cfg.height
-    # compute grass count from timers
-    grass = sum(1 for y in range(cfg.height) for x in range(cfg.width) if grid[y][x][0] == 0)
-    if paused:
-        status = (
-            f'EcoSim | tick: {tick:>4} | rabbits: {len(rabbits):>3} | '
-            f'grass: {grass}/{total} | fps≈{fps_est:04.1f} | [PAUSED]'
-        )
+    # compute grass count from timers (engines may provide a faster counter)
+    if grass_fn is not None:
+        grass = grass_fn(grid)
     else:
-        status = (
-            f'EcoSim | tick: {tick:>4} | rabbits: {len(rabbits):>3} | '
-            f'grass: {grass}/{total} | fps≈{fps_est:04.1f}'
-        )
-    stdscr.addstr(0, 0, status)
-
-    # grid (rows 1..H, cols start at GRID_X0)
-    rabbit_set = {(rx, ry) for [rx, ry, _] in (rabbits or [])}
-    for y in range(cfg.height):
-        for x in range(cfg.width):
-            timer = grid[y][x][0]
-            has_grass = (timer == 0)
-            has_rabbit = (x, y) in rabbit_set
-            if has_rabbit and has_grass:
-                ch = "R"
-            elif has_rabbit and not has_grass:
-                ch = "r"
-            elif has_grass:
-                ch = '"'
-            else:
-                ch = "."
-            stdscr.addstr(GRID_Y0 + y, GRID_X0 + x, ch)
+        grass = sum(1 for y in range(cfg.height) for x in range(cfg.width) if grid[y][x][0] == 0)
+    status = (
+        f'EcoSim | tick: {tick:>4} | rabbits: {stats.count if stats is not None else len(rabbits):>3} | '
+        f'grass: {grass}/{total} | fps≈{fps_est:04.1f}'
+    )
+    if view.cols < world_cols or view.lines < world_lines or zoom > 1:
+        status += f' | view {view.x0},{view.y0} 1:{zoom}'
+    if note is not None:
+        status += f' | {note}'
+    if paused:
+        status += ' | [PAUSED]'
+    stdscr.addnstr(0, 0, status.ljust(max_x - 1), max_x - 1)
+
+    if view.drawn_tick != tick:
+        # grid (rows 1.., cols start at GRID_X0): write only the characters that differ from the last frame
+        for i, line in enumerate(_grid_lines(grid, cfg, view)):
+            prev = view.rows[i]
+            if prev is None:
+                stdscr.addstr(GRID_Y0 + i, GRID_X0, line)
+            elif line != prev:
+                for j, (ch, old) in enumerate(zip(line, prev)):
+                    if ch != old:
+                        stdscr.addstr(GRID_Y0 + i, GRID_X0 + j, ch)
+            view.rows[i] = line
 
-    # legend (one line under grid)
-    stdscr.addstr(GRID_Y0 + cfg.height + 1, 0, 'Legend: " grass  . dirt  r rabbit(dirt)  R rabbit(grass)')
+        # legend (one line under grid)
+        legend_y = GRID_Y0 + view.lines + 1
+        if zoom == 1:
+            legend = 'Legend: " grass  . dirt  r rabbit(dirt)  R rabbit(grass)'
+        else:
+            legend = f'Legend (1:{zoom}): {DENSITY_CHARS} grass share  r/R rabbits on sparse/dense grass'
+        stdscr.addnstr(legend_y, 0, legend, max_x - 1)
 
-    # energy panel on the right (only if there is room)
-    panel_x = GRID_X0 + cfg.width + 4
-    panel_y = GRID_Y0
-    if panel_x + PANEL_MIN_WIDTH <= max_x:
-        _draw_energy_panel(stdscr, rabbits or [], panel_x, panel_y)
+        # energy panel on the right (only if there is room)
+        if show_panel:
+            if stats is None:
+                stats = StreamingStats(rabbits or []).summary()
+            _draw_energy_panel(stdscr, stats, panel_x, GRID_Y0)
+            if profiler is not None:
+                _draw_profile_panel(stdscr, profiler, panel_x, GRID_Y0 + STATS_PANEL_LINES, max_y, skip_y=legend_y)
+        view.drawn_tick = tick
 
     # flip
     stdscr.refresh()
 
 
-def _draw_energy_panel(stdscr, rabbits, x0, y0):
+def _grid_lines(grid, cfg, view) -> list[str]:
     """
-    Draw a compact energy panel:
+    Screen lines of the visible part of the grid. A tile holds a rabbit when it has fewer free slots than
+    the capacity, so the population itself is never scanned. At zoom > 1 each character is a block of
+    tiles: its grass share picks a DENSITY_CHARS level, and any rabbit in the block shows as r / R.
+    """
+    zoom, cap = view.zoom, cfg.capacity
+    x0, y0 = view.x0, view.y0
+    x1 = min(cfg.width, x0 + view.cols * zoom)
+    y1 = min(cfg.height, y0 + view.lines * zoom)
+    top = len(DENSITY_CHARS) - 1
+
+    if hasattr(grid, "shape"):  # NumPy grid: select every character of the view at once
+        import numpy as np
+        block = grid[y0:y1, x0:x1]
+        grass = block[:, :, 0] == 0
+        occupied = block[:, :, 1] < cap
+        if zoom == 1:
+            chars = np.array(list(TILE_CHARS))[grass + 2 * occupied]
+        else:
+            row_starts = np.arange(0, y1 - y0, zoom)
+            col_starts = np.arange(0, x1 - x0, zoom)
+            tiles = np.add.reduceat(np.add.reduceat(np.ones(grass.shape, dtype=np.int32), row_starts, axis=0),
+                                    col_starts, axis=1)
+            grass_tiles = np.add.reduceat(np.add.reduceat(grass.astype(np.int32), row_starts, axis=0),
+                                          col_starts, axis=1)
+            occupied = np.logical_or.reduceat(np.logical_or.reduceat(occupied, row_starts, axis=0),
+                                              col_starts, axis=1)
+            share = grass_tiles / tiles
+            levels = np.rint(share * top).astype(np.intp)
+            chars = np.where(occupied, np.where(share >= 0.5, "R", "r"), np.array(list(DENSITY_CHARS))[levels])
+        return ["".join(row) for row in chars.tolist()]
+
+    lines = []
+    if zoom == 1:
+        for y in range(y0, y1):
+            row = grid[y]
+            lines.append("".join(TILE_CHARS[(row[x][0] == 0) + 2 * (row[x][1] < cap)] for x in range(x0, x1)))
+        return lines
+    starts = range(0, x1 - x0, zoom)
+    for by in range(y0, y1, zoom):
+        # per block column: grassy tiles and the fewest free slots, counted with list slices (C speed)
+        grass_tiles = [0] * len(starts)
+        min_slots = [cap] * len(starts)
+        rows = grid[by:min(by + zoom, y1)]
+        for row in rows:
+            cells = row[x0:x1]
+            timers = list(map(itemgetter(0), cells))
+            slots = list(map(itemgetter(1), cells))
+            for b, s in enumerate(starts):
+                grass_tiles[b] += timers[s:s + zoom].count(0)
+                min_slots[b] = min(min_slots[b], min(slots[s:s + zoom]))
+        chars = []
+        for b, s in enumerate(starts):
+            share = grass_tiles[b] / (len(rows) * (min(s + zoom, x1 - x0) - s))
+            if min_slots[b] < cap:
+                chars.append("R" if share >= 0.5 else "r")
+            else:
+                chars.append(DENSITY_CHARS[round(share * top)])
+        lines.append("".join(chars))
+    return lines
+
+
+def _draw_energy_panel(stdscr, stats, x0, y0):
+    """
+    Draw a compact stats panel from a stats.StatsSummary:
       - population
-      - mean energy, min/max
+      - mean and spread of the energies, min/max with the 10th and 90th percentiles, median
       - 5-bin histogram sparkline
+      - population and coverage over the last HISTORY_COLS ticks (when a history is kept)
     """
-    # gather energies
-    energies = [e for [_, _, e] in rabbits]
-    pop = len(energies)
-    if pop == 0:
-        mean = 0.0
-        emin = 0
-        emax = 0
+    if stats.count == 0:
         spark = "-----"
     else:
-        emin = min(energies)
-        emax = max(energies)
-        mean = sum(energies) / pop
-
-        # 5-bin histogram across [emin, emax]
-        bins = 5
-        counts = [0] * bins
-        if emin == emax:
-            # put everything in the middle bin when range collapses
-            mid = bins // 2
-            counts[mid] = pop
-        else:
-            span = max(1, emax - emin)  # avoid div by zero
-            for e in energies:
-                idx = int((e - emin) * bins / (span + 1e-9))
-                if idx == bins:  # rare case when e == emax
-                    idx = bins - 1
-                counts[idx] += 1
-
-        # map counts to sparkline characters
-        if max(counts) == 0:
-            spark = "-----"
-        else:
-            levels = []
-            top = max(counts)
-            for c in counts:
-                # scale to 0..len(SPARK_BARS)-1
-                lvl = int(round((len(SPARK_BARS) - 1) * (c / top)))
-                levels.append(lvl)
-            spark = "".join(SPARK_BARS[lvl] for lvl in levels)
-
-    # render lines
-    stdscr.addstr(y0 + 0, x0, "── Stats ───────────────")
-    stdscr.addstr(y0 + 1, x0, f"pop:     {pop:>5}")
-    stdscr.addstr(y0 + 2, x0, f"E μ:     {mean:>5.1f}")
-    stdscr.addstr(y0 + 3, x0, f"E min:   {emin:>5}")
-    stdscr.addstr(y0 + 4, x0, f"E max:   {emax:>5}")
-    stdscr.addstr(y0 + 5, x0, f"E hist:  {spark}")
-    stdscr.addstr(y0 + 6, x0, "────────────────────────")
+        # map bin counts to sparkline characters, scaled to 0..len(SPARK_BARS)-1
+        top = max(stats.hist)
+        spark = "".join(SPARK_BARS[int(round((len(SPARK_BARS) - 1) * (c / top)))] for c in stats.hist)
+    pop_spark = sparkline(stats.population, HISTORY_COLS) or "-"
+    cov_spark = sparkline(stats.coverage, HISTORY_COLS) or "-"
+
+    # render lines, padded so a shorter value overwrites the previous one
+    width = PANEL_MIN_WIDTH - 1
+    lines = [
+        "── Stats ───────────────",
+        f"pop:     {stats.count:>5}",
+        f"E μ:     {stats.mean:>5.1f}  σ {stats.sd:>4.1f}",
+        f"E min:   {stats.min:>5}  p10 {stats.p10:>3}",
+        f"E p50:   {stats.p50:>5}",
+        f"E max:   {stats.max:>5}  p90 {stats.p90:>3}",
+        f"E hist:  {spark}",
+        f"pop ~:   {pop_spark}",
+        f"cov ~:   {cov_spark}",
+        "────────────────────────",
+    ]
+    for i, line in enumerate(lines):
+        stdscr.addstr(y0 + i, x0, line.ljust(width))
+
+
+# short labels for the profile panel, in pipeline order
+PROFILE_LABELS = {
+    "decide_moves": "decide", "resolve_moves": "lottery", "apply_moves": "move", "eat": "eat",
+    "regrow": "regrow", "reproduce": "breed", "cull": "cull",
+}
+
+
+def _draw_profile_panel(stdscr, profiler, x0, y0, max_y, skip_y):
+    """
+    Draw the profiling section under the energy panel:
+      - per-phase time per tick and share of the tick
+      - lottery contests, births, deaths and regrown cells per tick
+    The legend row (skip_y) is stepped over; lines that would fall off the terminal are dropped.
+    """
+    ticks = profiler.ticks or 1
+    total = profiler.total_secs() or 1.0
+    lines = ["── Profile ─────────────"]
+    for name, secs in profiler.secs.items():
+        lines.append(f"{PROFILE_LABELS[name]:<8}{secs * 1000 / ticks:>6.2f}ms {secs / total * 100:>4.0f}%")
+    counts = profiler.counts
+    lines.append(f"contest: {counts['contests'] / ticks:>7.1f}/t")
+    lines.append(f"births:  {counts['births'] / ticks:>7.1f}/t")
+    lines.append(f"deaths:  {counts['deaths'] / ticks:>7.1f}/t")
+    lines.append(f"regrown: {counts['regrown'] / ticks:>7.1f}/t")
+    lines.append("────────────────────────")
+    y = y0
+    for line in lines:
+        if y == skip_y:
+            y += 1
+        if y >= max_y - 1:
+            break
+        stdscr.addstr(y, x0, line)
+        y += 1